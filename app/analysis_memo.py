@@ -0,0 +1,143 @@
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from . import logic
+from .config import settings
+from .metrics import CACHE_REQUESTS
+
+# Partes do resultado que dependem de cada chamada e são recalculadas sobre o resultado memorizado
+PER_CALL_KEYS = ("satellite_analysis", "ndvi_insight", "forecast_stale", "forecast_fetched_at")
+
+
+class AnalysisMemo:
+    """
+    Memoização de logic.analyze_forecast para fazendas que compartilham a célula da previsão e a configuração.
+    A chave combina o hash da previsão normalizada, o do histórico (quando é ele que alimenta o GDD) e a
+    impressão digital dos limites efetivos (o perfil de cultura compilado, ver app.profiles). Os motores "python" e
+    "numpy" produzem o mesmo resultado e compartilham as entradas. Satélite, NDVI, indicação de previsão
+    desatualizada e GDD desde o plantio são refeitos a cada chamada, pois são baratos e variam por fazenda.
+    Nível 1: LRU em memória; nível 2 (opcional, 'redis_ttl_seconds' > 0): Redis, compartilhado entre processos.
+    Os resultados memorizados são compartilhados entre chamadas e não devem ser modificados.
+    """
+
+    def __init__(self, max_entries: int, redis_ttl_seconds: int = 0, digest_entries: int = 256):
+        self.max_entries = max_entries
+        self.redis_ttl_seconds = redis_ttl_seconds
+        self.digest_entries = digest_entries
+        self._local: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # id(previsão) -> (previsão, hash): a mesma previsão do cache em memória não é normalizada de novo
+        self._digests: "OrderedDict[int, Tuple[Dict[str, Any], str]]" = OrderedDict()
+        self._redis = None
+
+    def bind_redis(self, redis):
+        """Associa o cliente Redis do segundo nível (ignorado se o nível estiver desativado)."""
+        if self.redis_ttl_seconds > 0:
+            self._redis = redis
+
+    def forecast_digest(self, forecast_data: Dict[str, Any]) -> str:
+        """Hash estável da previsão normalizada (campos usados pela análise)."""
+        entry = self._digests.get(id(forecast_data))
+        if entry is not None and entry[0] is forecast_data:
+            self._digests.move_to_end(id(forecast_data))
+            return entry[1]
+        digest = hashlib.sha1(repr(logic.normalize_forecast(forecast_data["list"])).encode()).hexdigest()[:20]
+        self._digests[id(forecast_data)] = (forecast_data, digest)
+        while len(self._digests) > self.digest_entries:
+            self._digests.popitem(last=False)
+        return digest
+
+    @staticmethod
+    def history_digest(historical_data: Dict[str, Any]) -> str:
+        return hashlib.sha1(json.dumps(historical_data.get("daily"), sort_keys=True).encode()).hexdigest()[:20]
+
+    def _prepare(self, forecast_data: Dict[str, Any], historical_data: Dict[str, Any], config: Dict[str, Any], gdd_series) -> Tuple[str, Mapping[str, Any], bool]:
+        """Retorna (chave, limites efetivos, se o GDD vem da série desde o plantio)."""
+        profile = logic.crop_profiles.compile_config(config)
+        use_series = bool(gdd_series is not None and config.get("planting_date"))
+        history = "-" if use_series else self.history_digest(historical_data)
+        key = f"analysis:{self.forecast_digest(forecast_data)}:{history}:{profile.fingerprint}"
+        return key, profile.thresholds, use_series
+
+    @staticmethod
+    def _complete(memoized: Dict[str, Any], forecast_data: Dict[str, Any], config: Dict[str, Any], thresholds: Mapping[str, Any], satellite_analysis_data: Dict[str, Any], gdd_series, use_series: bool) -> Dict[str, Any]:
+        """Acrescenta ao resultado memorizado as partes que dependem da chamada."""
+        result = {
+            **memoized,
+            "satellite_analysis": satellite_analysis_data,
+            "ndvi_insight": logic.analyze_ndvi_insight(satellite_analysis_data),
+            **logic.forecast_freshness(forecast_data),
+        }
+        if use_series:
+            result["gdd_insight"] = gdd_series.gdd_insight(config["planting_date"], thresholds["gdd_base_temp"])
+        return result
+
+    @staticmethod
+    def _memoizable(result: Dict[str, Any], use_series: bool) -> Dict[str, Any]:
+        return {key: value for key, value in result.items() if key not in PER_CALL_KEYS and not (use_series and key == "gdd_insight")}
+
+    def _get_local(self, key: str) -> Optional[Dict[str, Any]]:
+        memoized = self._local.get(key)
+        if memoized is not None:
+            self._local.move_to_end(key)
+        return memoized
+
+    def _set_local(self, key: str, memoized: Dict[str, Any]):
+        self._local[key] = memoized
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    def analyze_local(self, forecast_data: Dict[str, Any], historical_data: Dict[str, Any], config: Dict[str, Any], satellite_analysis_data: Dict[str, Any], backend: str = "python", gdd_series=None) -> Dict[str, Any]:
+        """Como logic.analyze_forecast, usando apenas o nível em memória (para chamadores síncronos)."""
+        if not settings.ANALYSIS_MEMO_ENABLED or "list" not in forecast_data:
+            return logic.analyze_forecast(forecast_data, historical_data, config, satellite_analysis_data, backend=backend, gdd_series=gdd_series)
+
+        key, thresholds, use_series = self._prepare(forecast_data, historical_data, config, gdd_series)
+        memoized = self._get_local(key)
+        if memoized is not None:
+            CACHE_REQUESTS.labels("analysis", "local_hit").inc()
+            return self._complete(memoized, forecast_data, config, thresholds, satellite_analysis_data, gdd_series, use_series)
+
+        CACHE_REQUESTS.labels("analysis", "miss").inc()
+        result = logic.analyze_forecast(forecast_data, historical_data, config, satellite_analysis_data, backend=backend, gdd_series=gdd_series)
+        if not result.get("error"):
+            self._set_local(key, self._memoizable(result, use_series))
+        return result
+
+    async def analyze(self, forecast_data: Dict[str, Any], historical_data: Dict[str, Any], config: Dict[str, Any], satellite_analysis_data: Dict[str, Any], backend: str = "python", gdd_series=None) -> Dict[str, Any]:
+        """Como logic.analyze_forecast, consultando a memória e depois o Redis (se ativado) antes de calcular."""
+        if not settings.ANALYSIS_MEMO_ENABLED or self._redis is None or "list" not in forecast_data:
+            return self.analyze_local(forecast_data, historical_data, config, satellite_analysis_data, backend=backend, gdd_series=gdd_series)
+
+        key, thresholds, use_series = self._prepare(forecast_data, historical_data, config, gdd_series)
+        memoized = self._get_local(key)
+        if memoized is not None:
+            CACHE_REQUESTS.labels("analysis", "local_hit").inc()
+            return self._complete(memoized, forecast_data, config, thresholds, satellite_analysis_data, gdd_series, use_series)
+
+        try:
+            raw = await self._redis.get(key)
+        except Exception as e:
+            print(f"Erro ao ler análise memorizada do Redis: {e}")
+            raw = None
+        if raw:
+            CACHE_REQUESTS.labels("analysis", "redis_hit").inc()
+            memoized = json.loads(raw)
+            self._set_local(key, memoized)
+            return self._complete(memoized, forecast_data, config, thresholds, satellite_analysis_data, gdd_series, use_series)
+
+        CACHE_REQUESTS.labels("analysis", "miss").inc()
+        result = logic.analyze_forecast(forecast_data, historical_data, config, satellite_analysis_data, backend=backend, gdd_series=gdd_series)
+        if not result.get("error"):
+            memoized = self._memoizable(result, use_series)
+            self._set_local(key, memoized)
+            try:
+                await self._redis.set(key, json.dumps(memoized), ex=self.redis_ttl_seconds)
+            except Exception as e:
+                print(f"Erro ao gravar análise memorizada no Redis: {e}")
+        return result
+
+
+analysis_memo = AnalysisMemo(settings.ANALYSIS_MEMO_MAX_ENTRIES, settings.ANALYSIS_MEMO_REDIS_TTL_SECONDS)
@@ -0,0 +1,189 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .metrics import CACHE_REQUESTS
+from .rate_limit import SharedPriority, current_priority, shared_priority
+
+
+def snap_to_grid(lat: float, lon: float, grid_deg: float) -> Tuple[float, float]:
+    """
+    Ajusta as coordenadas ao centro da célula de uma grade regular de 'grid_deg' graus.
+    Pontos próximos (ex.: fazendas do mesmo município) caem na mesma célula.
+    """
+    if grid_deg <= 0:
+        return lat, lon
+    cell_lat = round(round(lat / grid_deg) * grid_deg, 6)
+    cell_lon = round(round(lon / grid_deg) * grid_deg, 6)
+    return cell_lat, cell_lon
+
+
+def cadence_aligned_ttl(cadence_seconds: int, now: Optional[float] = None, min_ttl: int = 60) -> int:
+    """
+    Calcula o TTL até a próxima atualização do provedor, assumindo que ele publica
+    novos dados em múltiplos de 'cadence_seconds' (UTC).
+    """
+    now = time.time() if now is None else now
+    ttl = int(cadence_seconds - (now % cadence_seconds))
+    return max(min_ttl, ttl)
+
+
+class TwoTierCache:
+    """
+    Cache de dois níveis: LRU em memória (por processo) + Redis (compartilhado entre processos).
+    Falhas simultâneas para a mesma chave são agrupadas em uma única busca (single-flight).
+
+    Com 'stale_seconds' > 0, a última resposta válida é mantida por esse tempo além do TTL
+    (stale-while-revalidate): enquanto uma única atualização roda em segundo plano, com até
+    'refresh_attempts' tentativas, ou se o provedor falhar, o valor antigo é servido marcado
+    com "stale": True e "fetched_at" (epoch da busca original).
+
+    A busca compartilhada roda com a maior prioridade entre as requisições que a aguardam (ver
+    rate_limit.SharedPriority): um lote em BACKGROUND não atrasa a requisição interativa que pega carona nele.
+    """
+
+    def __init__(self, namespace: str, cadence_seconds: int, max_entries: int, stale_seconds: int = 0, refresh_attempts: int = 1, retry_backoff_seconds: float = 1.0):
+        self.namespace = namespace
+        self.cadence_seconds = cadence_seconds
+        self.max_entries = max_entries
+        self.stale_seconds = stale_seconds
+        self.refresh_attempts = max(1, refresh_attempts)
+        self.retry_backoff_seconds = retry_backoff_seconds
+        # chave -> (expira em, buscado em, valor)
+        self._local: "OrderedDict[str, Tuple[float, float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._inflight_priority: Dict[str, SharedPriority] = {}
+        self._redis = None
+
+    def bind_redis(self, redis):
+        """Associa o cliente Redis usado como segundo nível do cache."""
+        self._redis = redis
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:v2:{key}"
+
+    def _get_local(self, key: str) -> Optional[Tuple[Dict[str, Any], float, bool]]:
+        """Retorna (valor, buscado em, se ainda está dentro do TTL) ou None."""
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        expires_at, fetched_at, value = entry
+        now = time.time()
+        if expires_at + self.stale_seconds <= now:
+            del self._local[key]
+            return None
+        self._local.move_to_end(key)
+        return value, fetched_at, expires_at > now
+
+    def _set_local(self, key: str, value: Dict[str, Any], fetched_at: float, expires_at: float):
+        self._local[key] = (expires_at, fetched_at, value)
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    async def _get_remote(self, key: str) -> Optional[Tuple[Dict[str, Any], float, float]]:
+        """Retorna (valor, buscado em, expira em) do Redis, mesmo que já vencido (mas ainda servível como stale)."""
+        if self._redis is None:
+            return None
+        try:
+            raw = await self._redis.get(self._redis_key(key))
+            if raw is None:
+                return None
+            entry = json.loads(raw)
+            return entry["value"], entry["fetched_at"], entry["expires_at"]
+        except Exception as e:
+            print(f"Erro ao ler o cache '{self.namespace}' no Redis: {e}")
+            return None
+
+    async def _set_remote(self, key: str, value: Dict[str, Any], fetched_at: float, expires_at: float):
+        if self._redis is None:
+            return
+        try:
+            entry = json.dumps({"value": value, "fetched_at": fetched_at, "expires_at": expires_at})
+            await self._redis.set(self._redis_key(key), entry, ex=max(1, int(expires_at - time.time())) + self.stale_seconds)
+        except Exception as e:
+            print(f"Erro ao gravar o cache '{self.namespace}' no Redis: {e}")
+
+    async def _fetch(self, fetcher: Callable[[], Awaitable[Dict[str, Any]]], attempts: int) -> Dict[str, Any]:
+        """Executa 'fetcher' até obter uma resposta sem erro, com espera exponencial entre as tentativas."""
+        for attempt in range(attempts):
+            if attempt:
+                await asyncio.sleep(self.retry_backoff_seconds * 2 ** (attempt - 1))
+            value = await fetcher()
+            if not value.get("error"):
+                break
+        return value
+
+    async def _load(self, key: str, fetcher: Callable[[], Awaitable[Dict[str, Any]]], attempts: int) -> Tuple[Dict[str, Any], float, bool]:
+        remote = await self._get_remote(key)
+        if remote is not None and remote[2] > time.time():
+            CACHE_REQUESTS.labels(self.namespace, "redis_hit").inc()
+            value, fetched_at, expires_at = remote
+            self._set_local(key, value, fetched_at, expires_at)
+            return value, fetched_at, True
+
+        CACHE_REQUESTS.labels(self.namespace, "miss").inc()
+        value = await self._fetch(fetcher, attempts)
+        if value.get("error"):
+            # Respostas de erro não são armazenadas; a última resposta válida (se houver) é servida no lugar
+            if remote is not None and self.stale_seconds > 0:
+                stale_value, fetched_at, expires_at = remote
+                self._set_local(key, stale_value, fetched_at, expires_at)
+                return stale_value, fetched_at, False
+            return value, time.time(), True
+
+        fetched_at = time.time()
+        expires_at = fetched_at + cadence_aligned_ttl(self.cadence_seconds, now=fetched_at)
+        await self._set_remote(key, value, fetched_at, expires_at)
+        self._set_local(key, value, fetched_at, expires_at)
+        return value, fetched_at, True
+
+    @staticmethod
+    def _mark_stale(value: Dict[str, Any], fetched_at: float) -> Dict[str, Any]:
+        return {**value, "stale": True, "fetched_at": int(fetched_at)}
+
+    def _on_load_done(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        self._inflight_priority.pop(key, None)
+        # Atualizações em segundo plano podem terminar sem ninguém aguardando: consome a exceção para registrá-la
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Erro ao atualizar o cache '{self.namespace}' ({key}): {task.exception()}")
+
+    async def get_or_fetch(self, key: str, fetcher: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Retorna o valor em cache para 'key' ou executa 'fetcher' para obtê-lo.
+        Apenas uma busca por chave fica em andamento por processo; as demais aguardam o mesmo resultado.
+        Se houver um valor vencido (mas dentro de 'stale_seconds'), ele é devolvido na hora e a busca segue em segundo plano.
+        """
+        local = self._get_local(key)
+        if local is not None and local[2]:
+            CACHE_REQUESTS.labels(self.namespace, "local_hit").inc()
+            return local[0]
+
+        task = self._inflight.get(key)
+        if task is None:
+            # Ninguém aguarda uma atualização em segundo plano, então ela pode tentar mais vezes
+            attempts = self.refresh_attempts if local is not None else 1
+            with shared_priority() as priority:
+                task = asyncio.ensure_future(self._load(key, fetcher, attempts))
+            self._inflight[key] = task
+            self._inflight_priority[key] = priority
+            task.add_done_callback(lambda done: self._on_load_done(key, done))
+        elif local is None:
+            CACHE_REQUESTS.labels(self.namespace, "coalesced").inc()
+            # Quem aguarda a busca em andamento pode elevar a prioridade dela (quem recebe o valor antigo não aguarda)
+            self._inflight_priority[key].join(current_priority())
+
+        if local is not None:
+            CACHE_REQUESTS.labels(self.namespace, "stale_hit").inc()
+            return self._mark_stale(local[0], local[1])
+
+        # shield: o cancelamento de uma requisição não cancela a busca compartilhada
+        value, fetched_at, fresh = await asyncio.shield(task)
+        return value if fresh else self._mark_stale(value, fetched_at)
+
+    def clear(self):
+        """Limpa o nível em memória (o Redis expira sozinho pelo TTL)."""
+        self._local.clear()
@@ -0,0 +1,129 @@
+import gzip
+from typing import List, Optional, Tuple
+
+from .http_cache import encoded_etag
+
+try:
+    import brotli
+except ImportError:  # Sem o pacote brotli, apenas gzip é oferecido
+    brotli = None
+
+# Tipos de conteúdo comprimidos; streams (NDJSON, SSE) seguem sem compressão para não atrasar os eventos
+COMPRESSIBLE_TYPES = ("application/json", "text/plain", "text/html")
+
+
+def select_encoding(accept_encoding: str) -> Optional[str]:
+    """Escolhe a codificação a partir do Accept-Encoding: brotli (se disponível), depois gzip; None se nenhuma."""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    wildcard = accepted.get("*", 0.0)
+    for encoding in (("br", "gzip") if brotli is not None else ("gzip",)):
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI de compressão (gzip/brotli) para respostas JSON de corpo único acima de 'minimum_size'.
+    Respostas em streaming passam sem compressão. Com uma codificação negociada, o ETag recebe o sufixo
+    dela em qualquer resposta (inclusive 304 e corpos pequenos demais para comprimir), para que a
+    revalidação devolva o mesmo ETag da resposta 200; app.http_cache.etag_matches aceita as duas formas
+    no If-None-Match.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 5):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+        encoding = select_encoding(accept_encoding) if accept_encoding else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        # O início da resposta é retido até o primeiro corpo, quando se sabe se ele será comprimido
+        pending_start = None
+
+        async def send_compressed(message):
+            nonlocal pending_start
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                if self._compressible(headers):
+                    pending_start = message
+                    return
+                updated = self._etag_headers(headers, encoding)
+                if updated is not headers:
+                    message = {**message, "headers": updated}
+            elif message["type"] == "http.response.body" and pending_start is not None:
+                start, pending_start = pending_start, None
+                body = message.get("body", b"")
+                if message.get("more_body") or len(body) < self.minimum_size:
+                    await send({**start, "headers": self._etag_headers(start.get("headers", []), encoding)})
+                else:
+                    body = self._compress(body, encoding)
+                    await send({**start, "headers": self._headers(start.get("headers", []), encoding, len(body))})
+                    message = {**message, "body": body}
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def _compressible(headers: List[Tuple[bytes, bytes]]) -> bool:
+        content_type = b""
+        for name, value in headers:
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value
+        return content_type.split(b";")[0].strip().decode("latin-1") in COMPRESSIBLE_TYPES
+
+    def _compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    @classmethod
+    def _etag_headers(cls, headers: List[Tuple[bytes, bytes]], encoding: str) -> List[Tuple[bytes, bytes]]:
+        """Sufixo da codificação no ETag (e Vary: Accept-Encoding, já que o ETag passa a depender dele)."""
+        if not any(name == b"etag" for name, _ in headers):
+            return headers
+        return cls._vary([
+            (name, encoded_etag(value.decode("latin-1"), encoding).encode("latin-1") if name == b"etag" else value)
+            for name, value in headers
+        ])
+
+    @staticmethod
+    def _vary(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+        vary = [value for name, value in headers if name == b"vary"]
+        if any(b"accept-encoding" in value.lower() for value in vary):
+            return headers
+        updated = [(name, value) for name, value in headers if name != b"vary"]
+        updated.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+        return updated
+
+    @classmethod
+    def _headers(cls, headers: List[Tuple[bytes, bytes]], encoding: str, length: int) -> List[Tuple[bytes, bytes]]:
+        updated = [(name, str(length).encode() if name == b"content-length" else value) for name, value in headers]
+        updated = cls._vary(cls._etag_headers(updated, encoding))
+        updated.append((b"content-encoding", encoding.encode()))
+        return updated
@@ -1,9 +1,104 @@
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 
 class Settings(BaseSettings):
     OPENWEATHER_API_KEY: str
     GOOGLE_PROJECT_ID: Optional[str] = None
     REDIS_DSN: str = "redis://localhost:6379/0"
 
+    # Endpoints dos provedores de clima (sobrescritos em testes de carga para apontar para stubs locais)
+    FORECAST_API_URL: str = "http://api.openweathermap.org/data/2.5/forecast" # Documentação: https://openweathermap.org/forecast5
+    HISTORICAL_API_URL: str = "https://api.open-meteo.com/v1/forecast"
+
+    # Cliente HTTP compartilhado para os provedores de clima (pool keep-alive por provedor)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_READ_TIMEOUT: float = 10.0
+    HTTP_WRITE_TIMEOUT: float = 10.0
+    HTTP_POOL_TIMEOUT: float = 5.0
+    HTTP2_ENABLED: bool = False
+
+    # Cache da previsão do tempo por célula de grade (memória + Redis)
+    FORECAST_CACHE_ENABLED: bool = True
+    FORECAST_CACHE_GRID_DEG: float = 0.05 # ~5,5 km de lado
+    FORECAST_CACHE_CADENCE_SECONDS: int = 3 * 3600 # Intervalo de atualização da previsão de 3 em 3 horas
+    FORECAST_CACHE_MAX_ENTRIES: int = 10000
+    FORECAST_STALE_SECONDS: int = 24 * 3600 # Por quanto tempo a última previsão válida pode ser servida (marcada como desatualizada)
+    FORECAST_REFRESH_ATTEMPTS: int = 3 # Tentativas da atualização em segundo plano enquanto a previsão antiga é servida
+    FORECAST_REFRESH_BACKOFF_SECONDS: float = 1.0
+
+    # Proteção contra provedores lentos ou fora do ar
+    FORECAST_LATENCY_BUDGET_SECONDS: float = 4.0 # Tempo máximo total de uma chamada à previsão
+    HISTORICAL_LATENCY_BUDGET_SECONDS: float = 3.0
+    CIRCUIT_FAILURE_THRESHOLD: int = 5 # Falhas seguidas que abrem o circuito do provedor
+    CIRCUIT_RECOVERY_SECONDS: float = 30.0 # Tempo com o circuito aberto antes de uma chamada de teste
+
+    # Limite de chamadas por minuto a cada provedor, somando todos os processos (0 = sem limite)
+    UPSTREAM_RATE_LIMITS: Dict[str, float] = {"openweather": 55, "open_meteo": 500}
+    RATE_LIMIT_BURST_SECONDS: float = 10 # Tamanho do balde, em segundos de cota
+    RATE_LIMIT_INTERACTIVE_RESERVE: float = 0.2 # Fração do balde reservada às requisições interativas
+    RATE_LIMIT_INTERACTIVE_MAX_WAIT_SECONDS: float = 2.0 # Espera máxima na fila antes de desistir
+    RATE_LIMIT_BACKGROUND_MAX_WAIT_SECONDS: float = 30.0
+
+    # GDD desde o plantio: série diária de temperaturas por localização (Redis + memória)
+    GDD_HISTORY_API_URL: str = "https://historical-forecast-api.open-meteo.com/v1/forecast" # Aceita start_date/end_date sem o limite de 92 dias de past_days
+    GDD_STORE_GRID_DEG: float = 0.1 # ~11 km, próximo da resolução dos modelos do Open-Meteo
+    GDD_STORE_MAX_DAYS: int = 400 # Dias mantidos por localização (uma safra longa, com folga)
+    GDD_STORE_MAX_ENTRIES: int = 1000 # Séries mantidas em memória por processo
+
+    # Memoização de analyze_forecast (mesma previsão normalizada + mesmos limites efetivos)
+    ANALYSIS_MEMO_ENABLED: bool = True
+    ANALYSIS_MEMO_MAX_ENTRIES: int = 4096 # Resultados mantidos em memória por processo
+    ANALYSIS_MEMO_REDIS_TTL_SECONDS: int = 0 # Nível compartilhado no Redis (0 = desativado)
+
+    # Snapshots dos dados de /insights/, para recalcular com novos limites sem chamar os provedores
+    INSIGHT_SNAPSHOT_TTL_SECONDS: int = 3600
+    INSIGHT_SNAPSHOT_MAX_ENTRIES: int = 256 # Snapshots mantidos em memória por processo
+
+    # Perfis de cultura personalizados (Redis), recarregados sem reiniciar a API
+    CROP_PROFILE_RELOAD_SECONDS: float = 10
+
+    # Compressão das respostas (gzip, ou brotli se o cliente aceitar e o pacote estiver instalado)
+    COMPRESSION_MIN_SIZE: int = 1024 # Respostas menores (em bytes) são enviadas sem compressão
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 5 # 0-11; acima de ~6 o ganho é pequeno para o custo de CPU
+
+    # Insights em lote (carteiras de fazendas)
+    BATCH_MAX_ITEMS: int = 5000
+    BATCH_MAX_CONCURRENCY: int = 16 # Células de grade buscadas simultaneamente nos provedores externos
+    BATCH_STREAM_BUFFER: int = 64 # Linhas NDJSON aguardando envio antes de pausar as buscas
+
+    # Worker de satélite (ARQ + Google Earth Engine)
+    WORKER_MAX_JOBS: int = 200 # Deve comportar ao menos um lote de NDVI inteiro (NDVI_BATCH_MAX_SIZE)
+    EE_MAX_CONCURRENCY: int = 8 # Chamadas bloqueantes ao Earth Engine em andamento por processo
+    NDVI_BATCH_WINDOW_SECONDS: float = 2.0 # Tempo que um job aguarda outros pontos para formar um lote
+    NDVI_BATCH_MAX_SIZE: int = 100
+    NDVI_STORE_GRID_DEG: float = 0.001 # ~110 m; pontos na mesma célula compartilham o NDVI calculado
+    NDVI_STORE_TTL_DAYS: int = 90
+    WORKER_METRICS_PORT: int = 9101 # Porta do endpoint Prometheus do worker (0 desativa)
+
+    # Pré-cálculo de insights das fazendas cadastradas (cron do worker)
+    FARM_REFRESH_ENABLED: bool = True
+    FARM_REFRESH_TICK_MINUTES: int = 5 # Divide o intervalo de atualização da previsão em fatias; deve dividir 60
+
+    # Tracing distribuído (OpenTelemetry): "otlp", "file" ou "none"
+    TRACING_EXPORTER: str = "none"
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+    TRACING_FILE_PATH: str = "traces.jsonl"
+
+    # Entrega dos resultados de satélite por push (SSE)
+    SATELLITE_STREAM_TIMEOUT_SECONDS: float = 300
+    SATELLITE_STREAM_KEEPALIVE_SECONDS: float = 15
+
+    @field_validator("FARM_REFRESH_TICK_MINUTES")
+    @classmethod
+    def _tick_divides_hour(cls, value: int) -> int:
+        # O cron do worker dispara nos minutos múltiplos da fatia; sem dividir 60, a última fatia da hora fica curta
+        if value <= 0 or 60 % value:
+            raise ValueError("FARM_REFRESH_TICK_MINUTES deve ser um divisor de 60 (1, 2, 3, 4, 5, 6, 10, 12, 15, 20, 30 ou 60).")
+        return value
+
 settings = Settings()
@@ -0,0 +1,114 @@
+import json
+from typing import Any, Dict, List, Optional, Union
+
+try:
+    import msgspec
+except ImportError:  # Sem msgspec, as respostas são lidas com json e reduzidas em Python
+    msgspec = None
+
+
+class InvalidPayloadError(ValueError):
+    """A resposta do provedor não tem os campos esperados pela análise."""
+
+
+# Números mantêm o tipo da resposta (20 continua 20, e não 20.0, nas mensagens da análise)
+Number = Union[int, float]
+
+
+# Formato das respostas dos provedores, restrito aos campos lidos por app.logic. Os demais
+# (cidade, 'sys', nuvens, visibilidade, descrições etc.) são ignorados já na decodificação,
+# então não são alocados nem guardados no cache de previsão e nos snapshots.
+if msgspec is not None:
+    class StepMain(msgspec.Struct):
+        temp: Number
+        temp_min: Number
+        temp_max: Number
+        humidity: Number
+
+    class StepWind(msgspec.Struct):
+        speed: Number
+
+    class StepCondition(msgspec.Struct):
+        id: int
+
+    class ForecastStepPayload(msgspec.Struct):
+        dt: int
+        main: StepMain
+        wind: StepWind
+        weather: List[StepCondition]
+        pop: Number = 0
+
+    class ForecastPayload(msgspec.Struct):
+        list: List[ForecastStepPayload]
+
+    class DailyTemperatures(msgspec.Struct):
+        time: List[str]
+        temperature_2m_max: List[Optional[Number]]
+        temperature_2m_min: List[Optional[Number]]
+
+    class DailyPayload(msgspec.Struct, omit_defaults=True):
+        daily: Optional[DailyTemperatures] = None
+
+    _forecast_decoder = msgspec.json.Decoder(ForecastPayload)
+    _daily_decoder = msgspec.json.Decoder(DailyPayload)
+
+
+def _number(value: Any) -> Number:
+    """Valida um número como os Structs do msgspec: int ou float, no tipo original (bool e texto são recusados)."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise TypeError(f"Esperado um número, recebido {type(value).__name__}.")
+    return value
+
+
+def _compact_step(step: Dict[str, Any]) -> Dict[str, Any]:
+    main = step["main"]
+    return {
+        "dt": int(step["dt"]),
+        "main": {"temp": _number(main["temp"]), "temp_min": _number(main["temp_min"]), "temp_max": _number(main["temp_max"]), "humidity": _number(main["humidity"])},
+        "wind": {"speed": _number(step["wind"]["speed"])},
+        "weather": [{"id": int(condition["id"])} for condition in step["weather"]],
+        "pop": _number(step.get("pop", 0)),
+    }
+
+
+def _optional_numbers(values: List[Any]) -> List[Optional[Number]]:
+    return [None if value is None else _number(value) for value in values]
+
+
+def decode_forecast(content: bytes) -> Dict[str, Any]:
+    """
+    Decodifica a resposta da previsão (OpenWeatherMap) mantendo apenas os campos usados pela análise,
+    no mesmo formato da resposta original ({"list": [{"dt", "main", "wind", "weather", "pop"}]}).
+    """
+    if msgspec is not None:
+        try:
+            return msgspec.to_builtins(_forecast_decoder.decode(content))
+        except msgspec.DecodeError as e:  # Inclui msgspec.ValidationError (campo ausente ou de tipo errado)
+            raise InvalidPayloadError(str(e)) from e
+    try:
+        return {"list": [_compact_step(step) for step in json.loads(content)["list"]]}
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidPayloadError(str(e)) from e
+
+
+def decode_daily(content: bytes) -> Dict[str, Any]:
+    """
+    Decodifica uma resposta diária do Open-Meteo mantendo apenas as temperaturas máx/mín e as datas
+    ({"daily": {"time", "temperature_2m_max", "temperature_2m_min"}}, ou {} se não houver 'daily').
+    """
+    if msgspec is not None:
+        try:
+            return msgspec.to_builtins(_daily_decoder.decode(content))
+        except msgspec.DecodeError as e:
+            raise InvalidPayloadError(str(e)) from e
+    try:
+        daily = json.loads(content).get("daily")
+        if daily is None:
+            return {}
+        return {"daily": {
+            "time": [str(day) for day in daily["time"]],
+            "temperature_2m_max": _optional_numbers(daily["temperature_2m_max"]),
+            "temperature_2m_min": _optional_numbers(daily["temperature_2m_min"]),
+        }}
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise InvalidPayloadError(str(e)) from e
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import time
+import uuid
+import zlib
+from typing import Any, Dict, List, Optional
+
+FARM_REGISTRY_KEY = "farms:registry"
+FARM_REFRESH_FUNCTION = "refresh_farm_insight"
+
+
+def config_fingerprint(config: Dict[str, Any]) -> str:
+    """Impressão digital estável de uma configuração de análise (independe da ordem das chaves)."""
+    return hashlib.sha1(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def refresh_slot(farm_id: str, slots: int) -> int:
+    """Fatia do intervalo de atualização em que a fazenda é recalculada (estável entre processos)."""
+    return zlib.crc32(farm_id.encode()) % slots
+
+
+def current_slot(cadence_seconds: int, tick_seconds: int, now: Optional[float] = None) -> int:
+    """Fatia do intervalo de atualização correspondente ao instante atual."""
+    now = time.time() if now is None else now
+    return int(now % cadence_seconds) // tick_seconds
+
+
+def refresh_job_id(farm_id: str, cadence_seconds: int, config: Optional[Dict[str, Any]] = None, now: Optional[float] = None) -> str:
+    """
+    ID do job de atualização: um por fazenda e por ciclo, para não duplicar o trabalho. Com 'config', o ID
+    inclui a impressão digital da configuração, para que recadastrar a fazenda com outra configuração no
+    mesmo ciclo enfileire um novo cálculo em vez de ser descartado como duplicado.
+    """
+    now = time.time() if now is None else now
+    job_id = f"{FARM_REFRESH_FUNCTION}:{farm_id}:{int(now // cadence_seconds)}"
+    return f"{job_id}:{config_fingerprint(config)}" if config is not None else job_id
+
+
+class FarmRegistry:
+    """Cadastro de fazendas no Redis (hash farm_id -> {farm_id, location, config}), usado no pré-cálculo de insights."""
+
+    def __init__(self, redis):
+        self._redis = redis
+
+    async def register(self, lat: float, lon: float, config: Dict[str, Any], farm_id: Optional[str] = None) -> Dict[str, Any]:
+        """Cadastra (ou atualiza, se 'farm_id' já existir) uma fazenda e retorna o registro gravado."""
+        farm = {"farm_id": farm_id or uuid.uuid4().hex, "location": {"lat": lat, "lon": lon}, "config": config}
+        await self._redis.hset(FARM_REGISTRY_KEY, farm["farm_id"], json.dumps(farm))
+        return farm
+
+    async def get(self, farm_id: str) -> Optional[Dict[str, Any]]:
+        raw = await self._redis.hget(FARM_REGISTRY_KEY, farm_id)
+        return json.loads(raw) if raw else None
+
+    async def list_farms(self) -> List[Dict[str, Any]]:
+        return [json.loads(raw) for raw in (await self._redis.hgetall(FARM_REGISTRY_KEY)).values()]
+
+    async def farm_ids(self) -> List[str]:
+        return [farm_id.decode() if isinstance(farm_id, bytes) else farm_id for farm_id in await self._redis.hkeys(FARM_REGISTRY_KEY)]
+
+    async def remove(self, farm_id: str) -> bool:
+        return bool(await self._redis.hdel(FARM_REGISTRY_KEY, farm_id))
+
+
+class InsightStore:
+    """
+    Insights pré-calculados no Redis, indexados pela localização exata e pela configuração de análise,
+    para que POST /insights/ com os mesmos parâmetros de uma fazenda cadastrada responda sem recalcular.
+    """
+
+    def __init__(self, redis, ttl_seconds: Optional[int] = None):
+        self._redis = redis
+        self._ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def key(lat: float, lon: float, config: Dict[str, Any]) -> str:
+        return f"insights:precomputed:{lat:.6f}:{lon:.6f}:{config_fingerprint(config)}"
+
+    async def get(self, lat: float, lon: float, config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        try:
+            raw = await self._redis.get(self.key(lat, lon, config))
+        except Exception as e:
+            print(f"Erro ao ler insight pré-calculado: {e}")
+            return None
+        return json.loads(raw) if raw else None
+
+    async def put(self, lat: float, lon: float, config: Dict[str, Any], insight: Dict[str, Any]):
+        await self._redis.set(self.key(lat, lon, config), json.dumps(insight), ex=self._ttl_seconds)
@@ -0,0 +1,281 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Union
+
+from .cache import snap_to_grid
+from .config import settings
+from .metrics import CACHE_REQUESTS
+from . import services
+
+# Intervalo mínimo entre tentativas de completar uma série que o provedor não conseguiu estender
+SYNC_RETRY_SECONDS = 3600
+# Intervalo mínimo entre tentativas de preencher uma localização sem série, depois de uma falha do provedor
+FAILED_SYNC_RETRY_SECONDS = 300
+
+
+def daily_gdd(temp_max: float, temp_min: float, base_temp: float) -> float:
+    """GDD de um dia pela fórmula padrão (mesma de logic.calculate_gdd)."""
+    return max(0.0, (temp_max + temp_min) / 2 - base_temp)
+
+
+class DailyTemperatureSeries:
+    """
+    Temperaturas máx/mín diárias e contíguas de uma localização, a partir de 'start'.
+    O GDD acumulado entre duas datas sai de somas de prefixo, calculadas uma vez por temperatura
+    base e estendidas (sem recalcular a série) quando novos dias são acrescentados.
+    """
+
+    def __init__(self, start: date, temp_max: Optional[List[float]] = None, temp_min: Optional[List[float]] = None):
+        self.start = start
+        self.temp_max = list(temp_max or [])
+        self.temp_min = list(temp_min or [])
+        self._prefix: Dict[float, List[float]] = {}
+        self.synced_at = 0.0 # Última tentativa de completar a série com o provedor (epoch)
+
+    def __len__(self) -> int:
+        return len(self.temp_max)
+
+    @property
+    def end(self) -> date:
+        """Último dia da série (o dia anterior a 'start' se a série estiver vazia)."""
+        return self.start + timedelta(days=len(self) - 1)
+
+    def covers(self, since: date, until: date) -> bool:
+        return since > until or (self.start <= since and self.end >= until)
+
+    def append(self, temp_max: float, temp_min: float):
+        """Acrescenta o dia seguinte ao último, estendendo as somas de prefixo já calculadas."""
+        self.temp_max.append(temp_max)
+        self.temp_min.append(temp_min)
+        for base_temp, prefix in self._prefix.items():
+            prefix.append(prefix[-1] + daily_gdd(temp_max, temp_min, base_temp))
+
+    def prepend(self, start: date, temp_max: List[float], temp_min: List[float]):
+        """Acrescenta os dias de 'start' até o dia anterior ao início atual da série."""
+        self.start = start
+        self.temp_max = list(temp_max) + self.temp_max
+        self.temp_min = list(temp_min) + self.temp_min
+        self._prefix.clear()
+
+    def trim(self, start: date):
+        """Descarta os dias anteriores a 'start'."""
+        drop = (start - self.start).days
+        if drop > 0:
+            self.start = start
+            self.temp_max = self.temp_max[drop:]
+            self.temp_min = self.temp_min[drop:]
+            self._prefix.clear()
+
+    def prefix_sums(self, base_temp: float) -> List[float]:
+        """prefix[i] = GDD acumulado nos 'i' primeiros dias da série."""
+        prefix = self._prefix.get(base_temp)
+        if prefix is None:
+            prefix = [0.0]
+            for temp_max, temp_min in zip(self.temp_max, self.temp_min):
+                prefix.append(prefix[-1] + daily_gdd(temp_max, temp_min, base_temp))
+            self._prefix[base_temp] = prefix
+        return prefix
+
+    def _index(self, day: date) -> int:
+        return min(len(self), max(0, (day - self.start).days))
+
+    def gdd_insight(self, since: Union[date, str], base_temp: float) -> Dict[str, Any]:
+        """GDD acumulado desde 'since' (ex.: data de plantio) até o último dia da série, no formato de GDDInsight."""
+        since = date.fromisoformat(since) if isinstance(since, str) else since
+        prefix = self.prefix_sums(base_temp)
+        first, last = self._index(since), len(self)
+        if last <= first:
+            return {
+                "gdd_calculated": False,
+                "message": f"Ainda não há dias completos com dados desde {since.strftime('%d/%m/%Y')} para calcular o GDD."
+            }
+
+        total_gdd = prefix[last] - prefix[first]
+        days = last - first
+        # A série pode começar depois de 'since' (limite de dias armazenados): o total é parcial e a mensagem diz desde quando
+        counted_since = max(since, self.start)
+        partial = f" Dados disponíveis apenas a partir de {counted_since.strftime('%d/%m/%Y')}; o plantio foi em {since.strftime('%d/%m/%Y')}." if counted_since > since else ""
+        if total_gdd > 0:
+            return {
+                "gdd_calculated": True,
+                "message": f"GDD acumulado desde {counted_since.strftime('%d/%m/%Y')} ({days} dias): {total_gdd:.2f}.{partial}",
+                "total_gdd": total_gdd,
+                "details": [
+                    {"date": (self.start + timedelta(days=i)).isoformat(), "gdd_value": prefix[i + 1] - prefix[i]}
+                    for i in range(first, last)
+                ]
+            }
+        return {
+            "gdd_calculated": False,
+            "message": f"Nenhum GDD acumulado desde {counted_since.strftime('%d/%m/%Y')} (Temp. Base: {base_temp}°C).{partial}"
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"start": self.start.isoformat(), "temp_max": self.temp_max, "temp_min": self.temp_min}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DailyTemperatureSeries":
+        return cls(date.fromisoformat(data["start"]), data["temp_max"], data["temp_min"])
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_json(cls, raw) -> "DailyTemperatureSeries":
+        return cls.from_dict(json.loads(raw))
+
+
+def complete_days(daily_data: Dict[str, Any], start: date) -> tuple:
+    """
+    Extrai da resposta diária do Open-Meteo as temperaturas dos dias contíguos a partir de 'start',
+    parando no primeiro dia ausente ou sem valor (ex.: o dia corrente, ainda incompleto).
+    """
+    daily = daily_data.get("daily") or {}
+    temp_max, temp_min = [], []
+    expected = start
+    for day, day_max, day_min in zip(daily.get("time", []), daily.get("temperature_2m_max", []), daily.get("temperature_2m_min", [])):
+        if day != expected.isoformat() or day_max is None or day_min is None:
+            break
+        temp_max.append(day_max)
+        temp_min.append(day_min)
+        expected += timedelta(days=1)
+    return temp_max, temp_min
+
+
+class GDDStore:
+    """
+    Série diária de temperaturas por localização (ajustada à grade), para o GDD desde o plantio.
+    Cada localização é preenchida uma vez desde a data pedida e depois só recebe os dias que faltam;
+    a série fica no Redis (compartilhada entre processos) e num LRU em memória que guarda também
+    as somas de prefixo, de modo que consultas cobertas pela série não chamam o provedor.
+    """
+
+    def __init__(self, redis, grid_deg: float, max_days: int, max_entries: int):
+        self._redis = redis
+        self._grid_deg = grid_deg
+        self._max_days = max_days
+        self._max_entries = max_entries
+        self._local: "OrderedDict[str, DailyTemperatureSeries]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # Localizações sem série cuja última tentativa de preenchimento falhou -> momento da falha (epoch)
+        self._failed: "OrderedDict[str, float]" = OrderedDict()
+
+    @staticmethod
+    def key(lat: float, lon: float) -> str:
+        return f"gdd:daily:{lat:.6f}:{lon:.6f}"
+
+    async def get_series(self, lat: float, lon: float, since: date) -> Optional[DailyTemperatureSeries]:
+        """
+        Retorna a série da localização cobrindo de 'since' (limitado a 'max_days' atrás) até ontem,
+        buscando no provedor apenas os dias que ainda não estão armazenados. Se o provedor falhar,
+        retorna a série parcial já armazenada (ou None, se não houver nenhuma; nesse caso a localização
+        só volta ao provedor depois de FAILED_SYNC_RETRY_SECONDS). Com 'since' depois de ontem (plantio
+        sem dias completos), retorna uma série vazia sem chamar o provedor.
+        Buscas simultâneas para a mesma localização são agrupadas em uma única atualização.
+        """
+        until = date.today() - timedelta(days=1)
+        if since > until:
+            return DailyTemperatureSeries(since)
+        since = max(since, until - timedelta(days=self._max_days - 1))
+        cell = snap_to_grid(lat, lon, self._grid_deg)
+        key = self.key(*cell)
+
+        while True:
+            series = self._local.get(key)
+            recently_synced = series is not None and time.time() - series.synced_at < SYNC_RETRY_SECONDS
+            if series is not None and (series.covers(since, until) or (recently_synced and series.start <= since)):
+                self._local.move_to_end(key)
+                CACHE_REQUESTS.labels("gdd", "local_hit").inc()
+                return series
+            task = self._inflight.get(key)
+            if task is None:
+                failed_at = self._failed.get(key)
+                if series is None and failed_at is not None and time.time() - failed_at < FAILED_SYNC_RETRY_SECONDS:
+                    CACHE_REQUESTS.labels("gdd", "failed_hit").inc()
+                    return None
+                break
+            # Outra requisição já está atualizando esta localização; ao terminar, confere a cobertura de novo
+            await asyncio.shield(task)
+
+        CACHE_REQUESTS.labels("gdd", "miss").inc()
+        task = asyncio.create_task(self._sync(key, cell, since, until))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None) if self._inflight.get(key) is task else None)
+        return await asyncio.shield(task)
+
+    async def _sync(self, key: str, cell: tuple, since: date, until: date) -> Optional[DailyTemperatureSeries]:
+        """Completa a série com os dias faltantes (antes do início e depois do fim) e a grava."""
+        series = self._local.get(key) or await self._load(key)
+        changed = False
+
+        if series is None or since < series.start:
+            # Preenchimento inicial, ou uma data de plantio anterior ao início armazenado
+            fetch_until = until if series is None else series.start - timedelta(days=1)
+            temp_max, temp_min = await self._fetch(cell, since, fetch_until)
+            if series is None:
+                if not temp_max:
+                    # Sem nenhum dia, não adianta tentar estender a série agora: registra a falha para espaçar as tentativas
+                    self._set_failed(key)
+                    return None
+                series = DailyTemperatureSeries(since, temp_max, temp_min)
+                changed = True
+            elif len(temp_max) == (series.start - since).days:
+                series.prepend(since, temp_max, temp_min)
+                changed = True
+
+        if series.end < until:
+            fetch_since = series.end + timedelta(days=1)
+            temp_max, temp_min = await self._fetch(cell, fetch_since, until)
+            for day_max, day_min in zip(temp_max, temp_min):
+                series.append(day_max, day_min)
+            changed = changed or bool(temp_max)
+
+        series.trim(until - timedelta(days=self._max_days - 1))
+        series.synced_at = time.time()
+        if not len(series):
+            return None
+        if changed:
+            await self._save(key, series)
+        self._failed.pop(key, None)
+        self._set_local(key, series)
+        return series
+
+    async def _fetch(self, cell: tuple, since: date, until: date) -> tuple:
+        data = await services.get_daily_temperatures(cell[0], cell[1], since, until)
+        if data.get("error"):
+            print(f"Alerta: Não foi possível completar a série de GDD de {cell}. {data['error']}")
+            return [], []
+        return complete_days(data, since)
+
+    async def _load(self, key: str) -> Optional[DailyTemperatureSeries]:
+        try:
+            raw = await self._redis.get(key)
+        except Exception as e:
+            print(f"Erro ao ler a série de GDD do Redis: {e}")
+            return None
+        return DailyTemperatureSeries.from_json(raw) if raw else None
+
+    async def _save(self, key: str, series: DailyTemperatureSeries):
+        try:
+            await self._redis.set(key, series.to_json(), ex=self._max_days * 86400)
+        except Exception as e:
+            print(f"Erro ao gravar a série de GDD no Redis: {e}")
+
+    def _set_failed(self, key: str):
+        self._failed[key] = time.time()
+        self._failed.move_to_end(key)
+        while len(self._failed) > self._max_entries:
+            self._failed.popitem(last=False)
+
+    def _set_local(self, key: str, series: DailyTemperatureSeries):
+        self._local[key] = series
+        self._local.move_to_end(key)
+        while len(self._local) > self._max_entries:
+            self._local.popitem(last=False)
+
+
+def create_gdd_store(redis) -> GDDStore:
+    return GDDStore(redis, settings.GDD_STORE_GRID_DEG, settings.GDD_STORE_MAX_DAYS, settings.GDD_STORE_MAX_ENTRIES)
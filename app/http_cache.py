@@ -0,0 +1,31 @@
+import hashlib
+from typing import Any, Optional
+
+# Sufixos acrescentados ao ETag pela compressão (app.compression): cada codificação é uma representação diferente
+ENCODING_SUFFIXES = ("gzip", "br")
+
+
+def make_etag(*parts: Any) -> str:
+    """ETag forte derivado das partes que determinam a resposta (ex.: snapshot, limites, formato)."""
+    digest = hashlib.sha1("\x1f".join(str(part) for part in parts).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """ETag da representação comprimida (ex.: "abc" -> "abc-gzip")."""
+    if etag.endswith('"'):
+        return f'{etag[:-1]}-{encoding}"'
+    return etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Compara o cabeçalho If-None-Match com o ETag da resposta (comparação fraca, como pede a RFC 9110
+    para If-None-Match), aceitando também as variantes comprimidas do mesmo ETag.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {etag, *(encoded_etag(etag, encoding) for encoding in ENCODING_SUFFIXES)}
+    return any(tag.strip().removeprefix("W/") in candidates for tag in if_none_match.split(","))
@@ -0,0 +1,73 @@
+import httpx
+from typing import Dict, Optional
+from .config import settings
+
+# Provedores externos conhecidos. Cada um recebe seu próprio pool de conexões,
+# para que um provedor lento não esgote as conexões do outro.
+OPENWEATHER = "openweather"
+OPEN_METEO = "open_meteo"
+
+DEFAULT_PROVIDERS = (OPENWEATHER, OPEN_METEO)
+
+
+def _http2_available() -> bool:
+    """Verifica se o pacote 'h2' (necessário para HTTP/2 no httpx) está instalado."""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class UpstreamClients:
+    """
+    Gerencia um httpx.AsyncClient por provedor externo durante toda a vida da aplicação.
+    Os clientes mantêm conexões keep-alive, evitando um novo handshake TCP+TLS a cada requisição.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def _build_client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        )
+        timeout = httpx.Timeout(
+            connect=settings.HTTP_CONNECT_TIMEOUT,
+            read=settings.HTTP_READ_TIMEOUT,
+            write=settings.HTTP_WRITE_TIMEOUT,
+            pool=settings.HTTP_POOL_TIMEOUT,
+        )
+        http2 = settings.HTTP2_ENABLED
+        if http2 and not _http2_available():
+            print("Alerta: HTTP2_ENABLED=True, mas o pacote 'h2' não está instalado. Usando HTTP/1.1.")
+            http2 = False
+        return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+
+    async def start(self, providers=DEFAULT_PROVIDERS):
+        """Cria os clientes dos provedores conhecidos (chamado no startup da aplicação)."""
+        for provider in providers:
+            self.get(provider)
+
+    def get(self, provider: str) -> httpx.AsyncClient:
+        """
+        Retorna o cliente do provedor. Se ainda não existir (ex.: uso fora da API, no worker),
+        ele é criado sob demanda e reutilizado nas chamadas seguintes.
+        """
+        client: Optional[httpx.AsyncClient] = self._clients.get(provider)
+        if client is None or client.is_closed:
+            client = self._build_client()
+            self._clients[provider] = client
+        return client
+
+    async def aclose(self):
+        """Fecha todos os clientes e seus pools de conexão (chamado no shutdown da aplicação)."""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+
+upstream_clients = UpstreamClients()
@@ -0,0 +1,50 @@
+from typing import Any, Dict, List, Tuple
+
+from arq.constants import job_key_prefix, result_key_prefix
+from arq.jobs import serialize_job
+from arq.utils import timestamp_ms
+
+
+SATELLITE_ANALYSIS_FUNCTION = "analyze_satellite_image"
+# Canal Redis (pub/sub) em que o worker anuncia a conclusão de cada análise de satélite
+SATELLITE_RESULT_CHANNEL_PREFIX = "satellite:done:"
+
+
+def satellite_job_id(lat: float, lon: float) -> str:
+    """ID customizado da análise de satélite, para fácil recuperação do resultado."""
+    return f"satellite_analysis_{lat}_{lon}"
+
+
+def satellite_result_channel(task_id: str) -> str:
+    """Canal pub/sub em que a conclusão da tarefa 'task_id' é publicada."""
+    return f"{SATELLITE_RESULT_CHANNEL_PREFIX}{task_id}"
+
+
+async def enqueue_jobs(redis, function: str, jobs: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+    """
+    Enfileira vários jobs do ARQ usando pipelines do Redis: uma ida para verificar quais jobs
+    já existem e outra para gravar os novos, independentemente do tamanho do lote.
+    Grava os jobs no mesmo formato de ArqRedis.enqueue_job. Jobs já enfileirados ou com
+    resultado não são duplicados, e seus IDs também são retornados, pois o resultado
+    ficará disponível sob o mesmo ID.
+    """
+    if not jobs:
+        return []
+
+    async with redis.pipeline(transaction=False) as pipe:
+        for job_id, _ in jobs:
+            pipe.exists(job_key_prefix + job_id, result_key_prefix + job_id)
+        existing = await pipe.execute()
+
+    enqueue_time_ms = timestamp_ms()
+    new_jobs = [(job_id, kwargs) for (job_id, kwargs), exists in zip(jobs, existing) if not exists]
+    if new_jobs:
+        async with redis.pipeline(transaction=True) as pipe:
+            for job_id, kwargs in new_jobs:
+                job = serialize_job(function, (), kwargs, None, enqueue_time_ms, serializer=redis.job_serializer)
+                # NX: se outro processo enfileirou o mesmo job nesse meio-tempo, o job dele é mantido
+                pipe.set(job_key_prefix + job_id, job, px=redis.expires_extra_ms, nx=True)
+                pipe.zadd(redis.default_queue_name, {job_id: enqueue_time_ms})
+            await pipe.execute()
+
+    return [job_id for job_id, _ in jobs]
@@ -1,5 +1,8 @@
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from functools import lru_cache
+from typing import List, Dict, Any, NamedTuple, Callable
+from .metrics import timed
+from .profiles import ProfileRegistry
 
 # --- Constantes de Análise (valores padrão, serão sobrescritos pela configuração) ---
 WIND_SPEED_THRESHOLD_MS = 2.8
@@ -120,71 +123,255 @@ CROP_PROFILES = {
     }
 }
 
+# Registro dos perfis (embutidos + personalizados no Redis), com as combinações perfil/limites já compiladas
+crop_profiles = ProfileRegistry(CROP_PROFILES)
+
 def mps_to_kmh(mps: float) -> float:
     """Converte metros por segundo para quilômetros por hora."""
     return mps * 3.6
 
-def analyze_forecast(forecast_data: Dict[str, Any], historical_data: Dict[str, Any], config: Dict[str, Any], satellite_analysis_data: Dict[str, Any]) -> Dict[str, Any]:
+def analyze_forecast(forecast_data: Dict[str, Any], historical_data: Dict[str, Any], config: Dict[str, Any], satellite_analysis_data: Dict[str, Any], backend: str = "python", gdd_series=None) -> Dict[str, Any]:
     """
     Analisa os dados de previsão do tempo para gerar insights, usando configurações dinâmicas.
+    'backend' escolhe o motor dos detectores: "python" (padrão) ou "numpy" (vetorizado, se instalado).
+    Com 'planting_date' na configuração e a série diária da localização ('gdd_series', de app.gdd_store),
+    o GDD é acumulado desde o plantio em vez de sobre 'historical_data'.
     """
     if "list" not in forecast_data:
         return {"error": "Formato de dados de previsão inválido."}
 
     forecast_list = forecast_data["list"]
 
-    # Carregar perfil da cultura se especificado
-    crop_profile_name = config.get("crop_profile")
-    if crop_profile_name and crop_profile_name in CROP_PROFILES:
-        profile_config = CROP_PROFILES[crop_profile_name]
-        # Sobrescrever configurações padrão com as do perfil
-        for key, value in profile_config.items():
-            # Apenas sobrescreve se o valor não foi explicitamente fornecido na config
-            if key not in config or config[key] is None: 
-                config[key] = value
-
-    # Usar valores da configuração ou constantes padrão
-    wind_speed_threshold_ms = config.get("wind_speed_threshold_ms", WIND_SPEED_THRESHOLD_MS)
-    precipitation_prob_threshold = config.get("precipitation_prob_threshold", PRECIPITATION_PROB_THRESHOLD)
-    fungal_risk_humidity = config.get("fungal_risk_humidity", FUNGAL_RISK_HUMIDITY)
-    fungal_risk_temp_min = config.get("fungal_risk_temp_min", FUNGAL_RISK_TEMP_MIN)
-    fungal_risk_temp_max = config.get("fungal_risk_temp_max", FUNGAL_RISK_TEMP_MAX)
-    min_window_hours = config.get("min_window_hours", MIN_WINDOW_HOURS)
-    frost_temp_threshold = config.get("frost_temp_threshold", FROST_TEMP_THRESHOLD)
-    heat_stress_temp_threshold = config.get("heat_stress_temp_threshold", HEAT_STRESS_TEMP_THRESHOLD)
-    planting_temp_min = config.get("planting_temp_min", PLANTING_TEMP_MIN)
-    planting_temp_max = config.get("planting_temp_max", PLANTING_TEMP_MAX)
-    planting_rain_prob_threshold = config.get("planting_rain_prob_threshold", PLANTING_RAIN_PROB_THRESHOLD)
-    harvest_rain_prob_threshold = config.get("harvest_rain_prob_threshold", HARVEST_RAIN_PROB_THRESHOLD)
-    harvest_humidity_threshold = config.get("harvest_humidity_threshold", HARVEST_HUMIDITY_THRESHOLD)
-    irrigation_no_rain_threshold = config.get("irrigation_no_rain_threshold", IRRIGATION_NO_RAIN_THRESHOLD)
-    irrigation_temp_threshold = config.get("irrigation_temp_threshold", IRRIGATION_TEMP_THRESHOLD)
-    irrigation_min_hours = config.get("irrigation_min_hours", IRRIGATION_MIN_HOURS)
-    gdd_base_temp = config.get("gdd_base_temp", GDD_BASE_TEMP)
-
-    spraying_window = find_spraying_window(forecast_list, wind_speed_threshold_ms, precipitation_prob_threshold, min_window_hours)
-    fungal_risk = find_fungal_risk_window(forecast_list, fungal_risk_humidity, fungal_risk_temp_min, fungal_risk_temp_max, min_window_hours)
-    frost_alert = find_frost_risk(forecast_list, frost_temp_threshold)
-    heat_stress_alert = find_heat_stress_risk(forecast_list, heat_stress_temp_threshold)
-    planting_window_alert = find_planting_window(forecast_list, planting_temp_min, planting_temp_max, planting_rain_prob_threshold)
-    harvesting_window_alert = find_harvesting_window(forecast_list, harvest_rain_prob_threshold, harvest_humidity_threshold, min_window_hours)
-    irrigation_recommendation = find_irrigation_recommendation(forecast_list, irrigation_no_rain_threshold, irrigation_temp_threshold, irrigation_min_hours)
-    gdd_insight = calculate_gdd(historical_data, gdd_base_temp)
-    ndvi_insight = analyze_ndvi_insight(satellite_analysis_data)
+    # Limites efetivos: perfil da cultura (se especificado) + limites explícitos, compilados uma vez por combinação
+    thresholds = crop_profiles.compile_config(config).thresholds
+
+    # Normaliza a previsão uma única vez e avalia todos os detectores em uma só passada
+    # Cada etapa é medida (métricas Prometheus + Server-Timing); os detectores de alerta
+    # rodam juntos na passada única, então são medidos como uma etapa por motor
+    with timed("analysis.normalize"):
+        steps = normalize_forecast(forecast_list)
+    with timed(f"analysis.detectors.{backend}"):
+        alerts = prepare_evaluator(steps, backend)(thresholds)
+    with timed("analysis.gdd"):
+        if gdd_series is not None and config.get("planting_date"):
+            gdd_insight = gdd_series.gdd_insight(config["planting_date"], thresholds["gdd_base_temp"])
+        else:
+            gdd_insight = calculate_gdd(historical_data, thresholds["gdd_base_temp"])
+    with timed("analysis.ndvi"):
+        ndvi_insight = analyze_ndvi_insight(satellite_analysis_data)
 
     return {
-        "spraying_alert": spraying_window,
-        "fungal_risk_alert": fungal_risk,
-        "frost_alert": frost_alert,
-        "heat_stress_alert": heat_stress_alert,
-        "planting_window_alert": planting_window_alert,
-        "harvesting_window_alert": harvesting_window_alert,
-        "irrigation_recommendation": irrigation_recommendation,
+        **alerts,
         "gdd_insight": gdd_insight,
         "satellite_analysis": satellite_analysis_data, # Inclui os dados brutos da análise de satélite
-        "ndvi_insight": ndvi_insight # Inclui o insight textual do NDVI
+        "ndvi_insight": ndvi_insight, # Inclui o insight textual do NDVI
+        **forecast_freshness(forecast_data),
     }
 
+# --- Motor de análise em passada única ---
+
+class ForecastStep(NamedTuple):
+    """Registro compacto de um passo de 3h da previsão, com os campos já extraídos e formatados."""
+    dt: int
+    time: str
+    temp: float
+    temp_min: float
+    temp_max: float
+    humidity: float
+    wind_speed: float
+    pop: float
+    is_raining: bool
+
+@lru_cache(maxsize=4096)
+def format_step_time(dt: int) -> str:
+    """
+    Formata o horário de um passo como '%d/%m %H:%M'. Os passos da previsão caem na mesma grade
+    de 3h para todas as fazendas, então o cache evita refazer a formatação a cada requisição.
+    """
+    return datetime.fromtimestamp(dt).strftime('%d/%m %H:%M')
+
+def normalize_forecast(forecast_list: List[Dict[str, Any]]) -> List[ForecastStep]:
+    """Converte a lista da previsão (formato OpenWeatherMap) em registros compactos, uma única vez."""
+    steps = []
+    for forecast in forecast_list:
+        main = forecast["main"]
+        steps.append(ForecastStep(
+            forecast["dt"],
+            format_step_time(forecast["dt"]),
+            main["temp"],
+            main["temp_min"],
+            main["temp_max"],
+            main["humidity"],
+            forecast["wind"]["speed"],
+            forecast.get("pop", 0),
+            any(w["id"] < 600 for w in forecast["weather"]),
+        ))
+    return steps
+
+def prepare_evaluator(steps: List[ForecastStep], backend: str = "python") -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Retorna uma função que avalia os detectores para um conjunto de limites, sobre os passos dados.
+    No backend "numpy" a conversão colunar é feita uma vez e reaproveitada em cada chamada.
+    """
+    if backend == "numpy":
+        from . import logic_numpy
+        if logic_numpy.is_available():
+            columns = logic_numpy.to_columns(steps) if steps else None
+            return lambda thresholds: logic_numpy.evaluate_forecast(steps, thresholds, columns)
+        print("Alerta: backend 'numpy' solicitado, mas o NumPy não está instalado. Usando o backend em Python.")
+    elif backend != "python":
+        raise ValueError(f"Backend de análise desconhecido: {backend}")
+    return lambda thresholds: evaluate_forecast(steps, thresholds)
+
+def evaluate_forecast(steps: List[ForecastStep], thresholds: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Avalia todos os detectores baseados na previsão em uma única passada sobre os passos normalizados.
+    O resultado é idêntico ao das funções find_* individuais.
+    """
+    wind_speed_threshold_ms = thresholds["wind_speed_threshold_ms"]
+    precipitation_prob_threshold = thresholds["precipitation_prob_threshold"]
+    fungal_risk_humidity = thresholds["fungal_risk_humidity"]
+    fungal_risk_temp_min = thresholds["fungal_risk_temp_min"]
+    fungal_risk_temp_max = thresholds["fungal_risk_temp_max"]
+    min_window_hours = thresholds["min_window_hours"]
+    frost_temp_threshold = thresholds["frost_temp_threshold"]
+    heat_stress_temp_threshold = thresholds["heat_stress_temp_threshold"]
+    planting_temp_min = thresholds["planting_temp_min"]
+    planting_temp_max = thresholds["planting_temp_max"]
+    planting_rain_prob_threshold = thresholds["planting_rain_prob_threshold"]
+    harvest_rain_prob_threshold = thresholds["harvest_rain_prob_threshold"]
+    harvest_humidity_threshold = thresholds["harvest_humidity_threshold"]
+    irrigation_no_rain_threshold = thresholds["irrigation_no_rain_threshold"]
+    irrigation_temp_threshold = thresholds["irrigation_temp_threshold"]
+    irrigation_min_hours = thresholds["irrigation_min_hours"]
+
+    optimal_temp_midpoint = (fungal_risk_temp_min + fungal_risk_temp_max) / 2
+    temp_range = fungal_risk_temp_max - fungal_risk_temp_min
+
+    # Estado de cada detector. As janelas são guardadas como (início, tamanho) e só
+    # viram listas de dicionários no final, para as janelas que de fato são válidas.
+    spraying_start, spraying_len, spraying_done = 0, 0, False
+    total_risk_hours, risk_score = 0, 0.0
+    frost_periods, heat_stress_periods, planting_periods = [], [], []
+    harvest_windows, harvest_start, harvest_len = [], 0, 0
+    irrigation_windows, irrigation_start, irrigation_len = [], 0, 0
+    previous, previous_wet = None, False
+
+    for i, step in enumerate(steps):
+        temp = step.temp
+        humidity = step.humidity
+        rain_prob = step.pop
+        is_raining = step.is_raining
+
+        # Pulverização: para na primeira janela válida
+        if not spraying_done:
+            if step.wind_speed < wind_speed_threshold_ms and rain_prob < precipitation_prob_threshold and not is_raining:
+                if spraying_len == 0:
+                    spraying_start = i
+                spraying_len += 1
+            elif spraying_len * 3 >= min_window_hours:
+                spraying_done = True
+            else:
+                spraying_len = 0
+
+        # Risco fúngico
+        if humidity >= fungal_risk_humidity and fungal_risk_temp_min <= temp <= fungal_risk_temp_max:
+            total_risk_hours += 3
+            distance_from_optimal = abs(temp - optimal_temp_midpoint)
+            temp_score_factor = 1.0 - (distance_from_optimal / (temp_range / 2))
+            humidity_score_factor = (humidity - fungal_risk_humidity) / (100 - fungal_risk_humidity)
+            risk_score += (1 + temp_score_factor + humidity_score_factor) * 1.5
+
+        # Geada e estresse por calor
+        if step.temp_min <= frost_temp_threshold:
+            frost_periods.append({"time": step.time, "temp_min": step.temp_min})
+        if step.temp_max >= heat_stress_temp_threshold:
+            heat_stress_periods.append({"time": step.time, "temp_max": step.temp_max})
+
+        # Plantio: o passo anterior é decidido agora, pois depende da chuva no passo seguinte
+        wet = rain_prob >= planting_rain_prob_threshold or is_raining
+        if previous is not None and planting_temp_min <= previous.temp <= planting_temp_max and (previous_wet or wet):
+            planting_periods.append({"time": previous.time, "temp": previous.temp, "rain_prob": previous.pop})
+        previous, previous_wet = step, wet
+
+        # Colheita
+        if rain_prob < harvest_rain_prob_threshold and not is_raining and humidity < harvest_humidity_threshold:
+            if harvest_len == 0:
+                harvest_start = i
+            harvest_len += 1
+        else:
+            if harvest_len * 3 >= min_window_hours:
+                harvest_windows.append((harvest_start, harvest_len))
+            harvest_len = 0
+
+        # Irrigação
+        if rain_prob < irrigation_no_rain_threshold and not is_raining and temp >= irrigation_temp_threshold:
+            if irrigation_len == 0:
+                irrigation_start = i
+            irrigation_len += 1
+        else:
+            if irrigation_len * 3 >= irrigation_min_hours:
+                irrigation_windows.append((irrigation_start, irrigation_len))
+            irrigation_len = 0
+
+    if previous is not None and planting_temp_min <= previous.temp <= planting_temp_max and previous_wet:
+        planting_periods.append({"time": previous.time, "temp": previous.temp, "rain_prob": previous.pop})
+    if harvest_len * 3 >= min_window_hours:
+        harvest_windows.append((harvest_start, harvest_len))
+    if irrigation_len * 3 >= irrigation_min_hours:
+        irrigation_windows.append((irrigation_start, irrigation_len))
+
+    spraying_window = steps[spraying_start:spraying_start + spraying_len] if spraying_len * 3 >= min_window_hours else []
+
+    return {
+        "spraying_alert": _spraying_result([s.dt for s in spraying_window], [s.wind_speed for s in spraying_window], min_window_hours),
+        "fungal_risk_alert": _fungal_risk_result(total_risk_hours, risk_score, fungal_risk_humidity, fungal_risk_temp_min, fungal_risk_temp_max),
+        "frost_alert": _frost_result(frost_periods),
+        "heat_stress_alert": _heat_stress_result(heat_stress_periods),
+        "planting_window_alert": _planting_result(planting_periods),
+        "harvesting_window_alert": _harvesting_result([
+            [{"time": s.time, "temp": s.temp, "humidity": s.humidity, "wind_speed": s.wind_speed} for s in steps[start:start + length]]
+            for start, length in harvest_windows
+        ]),
+        "irrigation_recommendation": _irrigation_result([
+            [{"time": s.time, "temp": s.temp, "rain_prob": s.pop} for s in steps[start:start + length]]
+            for start, length in irrigation_windows
+        ]),
+    }
+
+def forecast_freshness(forecast_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Indica se a previsão usada é uma cópia antiga servida durante uma falha do provedor."""
+    return {"forecast_stale": bool(forecast_data.get("stale")), "forecast_fetched_at": forecast_data.get("fetched_at")}
+
+def analyze_profiles(forecast_data: Dict[str, Any], historical_data: Dict[str, Any], profiles: List[str], overrides: Dict[str, Any], satellite_analysis_data: Dict[str, Any], backend: str = "python") -> Dict[str, Any]:
+    """
+    Avalia vários perfis de cultura sobre a mesma previsão e o mesmo histórico.
+    A previsão é normalizada uma única vez e compartilhada por todos os perfis; 'overrides'
+    contém limites fornecidos explicitamente, que prevalecem sobre os de cada perfil.
+    """
+    if "list" not in forecast_data:
+        return {"error": "Formato de dados de previsão inválido."}
+
+    evaluate = prepare_evaluator(normalize_forecast(forecast_data["list"]), backend)
+    ndvi_insight = analyze_ndvi_insight(satellite_analysis_data)
+    freshness = forecast_freshness(forecast_data)
+    gdd_by_base_temp = {}
+
+    results = {}
+    for profile_name in profiles:
+        thresholds = crop_profiles.compile(profile_name, overrides).thresholds
+        base_temp = thresholds["gdd_base_temp"]
+        if base_temp not in gdd_by_base_temp:
+            gdd_by_base_temp[base_temp] = calculate_gdd(historical_data, base_temp)
+        results[profile_name] = {
+            **evaluate(thresholds),
+            "gdd_insight": gdd_by_base_temp[base_temp],
+            "satellite_analysis": satellite_analysis_data,
+            "ndvi_insight": ndvi_insight,
+            **freshness,
+        }
+    return {"profiles": results}
+
 def analyze_ndvi_insight(satellite_analysis_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Analisa o valor do NDVI e retorna um insight textual.
@@ -238,17 +425,21 @@ def find_spraying_window(forecast_list: List[Dict[str, Any]], wind_speed_thresho
     if not best_window and len(current_window) * 3 >= min_window_hours:
         best_window = current_window
 
-    duration_hours = len(best_window) * 3
+    return _spraying_result([f["dt"] for f in best_window], [f["wind"]["speed"] for f in best_window], min_window_hours)
+
+def _spraying_result(window_dts: List[int], window_winds: List[float], min_window_hours: float) -> Dict[str, Any]:
+    """Monta o alerta de pulverização a partir dos horários e ventos da janela encontrada."""
+    duration_hours = len(window_dts) * 3
     if duration_hours < min_window_hours:
         return {
             "ideal_window_found": False,
             "message": f"Nenhuma janela ideal para pulverização (mín. {min_window_hours}h) encontrada nos próximos 5 dias."
         }
 
-    start_time = datetime.fromtimestamp(best_window[0]["dt"]).strftime('%d/%m %H:%M')
-    end_time = (datetime.fromtimestamp(best_window[-1]["dt"]) + timedelta(hours=3)).strftime('%d/%m %H:%M')
+    start_time = datetime.fromtimestamp(window_dts[0]).strftime('%d/%m %H:%M')
+    end_time = (datetime.fromtimestamp(window_dts[-1]) + timedelta(hours=3)).strftime('%d/%m %H:%M')
     
-    avg_wind = mps_to_kmh(sum(f["wind"]["speed"] for f in best_window) / len(best_window))
+    avg_wind = mps_to_kmh(sum(window_winds) / len(window_winds))
 
     return {
         "ideal_window_found": True,
@@ -287,6 +478,10 @@ def find_fungal_risk_window(forecast_list: List[Dict[str, Any]], fungal_risk_hum
             # O valor 1.5 é um peso para dar mais impacto às horas de risco.
             risk_score += (1 + temp_score_factor + humidity_score_factor) * 1.5
 
+    return _fungal_risk_result(total_risk_hours, risk_score, fungal_risk_humidity, fungal_risk_temp_min, fungal_risk_temp_max)
+
+def _fungal_risk_result(total_risk_hours: int, risk_score: float, fungal_risk_humidity: float, fungal_risk_temp_min: float, fungal_risk_temp_max: float) -> Dict[str, Any]:
+    """Normaliza o escore de risco fúngico e monta o alerta correspondente."""
     # Normalizar o escore para uma escala de 0 a 100
     # O máximo de horas é 120 (5 dias * 24h). O escore máximo teórico é ajustado.
     max_possible_score = 120 / 3 * 3.5 # Ajustado para a fórmula acima
@@ -325,6 +520,10 @@ def find_frost_risk(forecast_list: List[Dict[str, Any]], frost_temp_threshold: f
                 "temp_min": temp_min
             })
     
+    return _frost_result(frost_periods)
+
+def _frost_result(frost_periods: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Monta o alerta de geada a partir dos períodos de risco encontrados."""
     if not frost_periods:
         return {
             "frost_risk_found": False,
@@ -349,6 +548,10 @@ def find_heat_stress_risk(forecast_list: List[Dict[str, Any]], heat_stress_temp_
                 "temp_max": temp_max
             })
     
+    return _heat_stress_result(heat_stress_periods)
+
+def _heat_stress_result(heat_stress_periods: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Monta o alerta de estresse por calor a partir dos períodos de risco encontrados."""
     if not heat_stress_periods:
         return {
             "heat_stress_found": False,
@@ -387,6 +590,10 @@ def find_planting_window(forecast_list: List[Dict[str, Any]], planting_temp_min:
                 "rain_prob": rain_prob
             })
     
+    return _planting_result(ideal_periods)
+
+def _planting_result(ideal_periods: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Monta o alerta de plantio a partir dos períodos ideais encontrados."""
     if not ideal_periods:
         return {
             "planting_window_found": False,
@@ -428,6 +635,10 @@ def find_harvesting_window(forecast_list: List[Dict[str, Any]], harvest_rain_pro
     if len(current_window) * 3 >= min_window_hours:
         ideal_periods.append(current_window)
 
+    return _harvesting_result(ideal_periods)
+
+def _harvesting_result(ideal_periods: List[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Monta o alerta de colheita a partir das janelas ideais encontradas."""
     if not ideal_periods:
         return {
             "harvesting_window_found": False,
@@ -509,6 +720,10 @@ def find_irrigation_recommendation(forecast_list: List[Dict[str, Any]], irrigati
     if len(current_dry_hot_window) * 3 >= irrigation_min_hours:
         irrigation_needed_periods.append(current_dry_hot_window)
 
+    return _irrigation_result(irrigation_needed_periods)
+
+def _irrigation_result(irrigation_needed_periods: List[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Monta a recomendação de irrigação a partir das janelas secas e quentes encontradas."""
     if not irrigation_needed_periods:
         return {
             "irrigation_recommended": False,
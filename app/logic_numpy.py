@@ -0,0 +1,138 @@
+"""
+Backend vetorizado (NumPy) para os detectores baseados na previsão.
+
+Converte os passos normalizados em colunas, calcula as máscaras de cada condição com
+operações de array e encontra as janelas contínuas por codificação de sequências (RLE).
+O resultado é idêntico ao de logic.evaluate_forecast; os detalhes são montados a partir
+dos próprios passos normalizados, preservando os valores originais da previsão.
+"""
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional; sem ele, a análise usa o backend em Python puro
+    np = None
+
+from . import logic
+
+
+def is_available() -> bool:
+    """Indica se o NumPy está instalado e o backend vetorizado pode ser usado."""
+    return np is not None
+
+
+class ForecastColumns(NamedTuple):
+    """Previsão em formato colunar: um array por campo usado pelos detectores."""
+    temp: Any
+    temp_min: Any
+    temp_max: Any
+    humidity: Any
+    wind_speed: Any
+    pop: Any
+    is_raining: Any
+
+
+def to_columns(steps: List[logic.ForecastStep]) -> ForecastColumns:
+    """Converte os passos normalizados em colunas float64 (e uma coluna booleana de chuva)."""
+    _, _, temp, temp_min, temp_max, humidity, wind_speed, pop, is_raining = zip(*steps)
+    return ForecastColumns(
+        temp=np.array(temp, dtype=np.float64),
+        temp_min=np.array(temp_min, dtype=np.float64),
+        temp_max=np.array(temp_max, dtype=np.float64),
+        humidity=np.array(humidity, dtype=np.float64),
+        wind_speed=np.array(wind_speed, dtype=np.float64),
+        pop=np.array(pop, dtype=np.float64),
+        is_raining=np.array(is_raining, dtype=bool),
+    )
+
+
+def find_runs(mask) -> Tuple[Any, Any]:
+    """Retorna (inícios, tamanhos) das sequências contínuas de True em uma máscara booleana."""
+    padded = np.concatenate(([0], mask.astype(np.int8), [0]))
+    edges = np.diff(padded)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return starts, ends - starts
+
+
+def _needs_python_fallback(thresholds: Dict[str, Any]) -> bool:
+    """
+    Limites degenerados (ausentes, janelas mínimas <= 0 ou faixas que causam divisão por zero)
+    têm comportamento de borda específico no backend em Python; nesses casos ele é usado.
+    """
+    if any(value is None for value in thresholds.values()):
+        return True
+    if thresholds["min_window_hours"] <= 0 or thresholds["irrigation_min_hours"] <= 0:
+        return True
+    return thresholds["fungal_risk_temp_max"] == thresholds["fungal_risk_temp_min"] or thresholds["fungal_risk_humidity"] == 100
+
+
+def evaluate_forecast(steps: List[logic.ForecastStep], thresholds: Dict[str, Any], columns: Optional[ForecastColumns] = None) -> Dict[str, Any]:
+    """
+    Versão vetorizada de logic.evaluate_forecast, com o mesmo contrato e o mesmo resultado.
+    'columns' permite reaproveitar a conversão colunar ao avaliar vários conjuntos de limites.
+    """
+    if not steps or _needs_python_fallback(thresholds):
+        return logic.evaluate_forecast(steps, thresholds)
+
+    t = thresholds
+    c = columns if columns is not None else to_columns(steps)
+    dry = ~c.is_raining
+    min_window_hours = t["min_window_hours"]
+
+    # Pulverização: primeira sequência com duração mínima
+    spraying_mask = (c.wind_speed < t["wind_speed_threshold_ms"]) & (c.pop < t["precipitation_prob_threshold"]) & dry
+    starts, lengths = find_runs(spraying_mask)
+    valid = np.flatnonzero(lengths * 3 >= min_window_hours)
+    spraying_window = steps[starts[valid[0]]:starts[valid[0]] + lengths[valid[0]]] if valid.size else []
+
+    # Risco fúngico: a soma acumulada é sequencial, como o laço em Python
+    fungal_risk_humidity = t["fungal_risk_humidity"]
+    fungal_risk_temp_min = t["fungal_risk_temp_min"]
+    fungal_risk_temp_max = t["fungal_risk_temp_max"]
+    fungal_mask = (c.humidity >= fungal_risk_humidity) & (fungal_risk_temp_min <= c.temp) & (c.temp <= fungal_risk_temp_max)
+    risk_temp = c.temp[fungal_mask]
+    risk_humidity = c.humidity[fungal_mask]
+    optimal_temp_midpoint = (fungal_risk_temp_min + fungal_risk_temp_max) / 2
+    temp_range = fungal_risk_temp_max - fungal_risk_temp_min
+    temp_score_factor = 1.0 - (np.abs(risk_temp - optimal_temp_midpoint) / (temp_range / 2))
+    humidity_score_factor = (risk_humidity - fungal_risk_humidity) / (100 - fungal_risk_humidity)
+    scores = (1 + temp_score_factor + humidity_score_factor) * 1.5
+    risk_score = float(np.cumsum(scores)[-1]) if scores.size else 0.0
+    total_risk_hours = int(fungal_mask.sum()) * 3
+
+    # Geada e estresse por calor
+    frost_idx = np.flatnonzero(c.temp_min <= t["frost_temp_threshold"])
+    heat_idx = np.flatnonzero(c.temp_max >= t["heat_stress_temp_threshold"])
+
+    # Plantio: chuva no passo atual ou no seguinte
+    wet = (c.pop >= t["planting_rain_prob_threshold"]) | c.is_raining
+    wet_ahead = wet.copy()
+    wet_ahead[:-1] |= wet[1:]
+    planting_idx = np.flatnonzero((t["planting_temp_min"] <= c.temp) & (c.temp <= t["planting_temp_max"]) & wet_ahead)
+
+    # Colheita e irrigação: todas as sequências com duração mínima
+    harvest_mask = (c.pop < t["harvest_rain_prob_threshold"]) & dry & (c.humidity < t["harvest_humidity_threshold"])
+    harvest_starts, harvest_lengths = find_runs(harvest_mask)
+    harvest_keep = harvest_lengths * 3 >= min_window_hours
+    irrigation_mask = (c.pop < t["irrigation_no_rain_threshold"]) & dry & (c.temp >= t["irrigation_temp_threshold"])
+    irrigation_starts, irrigation_lengths = find_runs(irrigation_mask)
+    irrigation_keep = irrigation_lengths * 3 >= t["irrigation_min_hours"]
+
+    return {
+        "spraying_alert": logic._spraying_result([s.dt for s in spraying_window], [s.wind_speed for s in spraying_window], min_window_hours),
+        "fungal_risk_alert": logic._fungal_risk_result(total_risk_hours, risk_score, fungal_risk_humidity, fungal_risk_temp_min, fungal_risk_temp_max),
+        "frost_alert": logic._frost_result([{"time": steps[i].time, "temp_min": steps[i].temp_min} for i in frost_idx.tolist()]),
+        "heat_stress_alert": logic._heat_stress_result([{"time": steps[i].time, "temp_max": steps[i].temp_max} for i in heat_idx.tolist()]),
+        "planting_window_alert": logic._planting_result([
+            {"time": steps[i].time, "temp": steps[i].temp, "rain_prob": steps[i].pop} for i in planting_idx.tolist()
+        ]),
+        "harvesting_window_alert": logic._harvesting_result([
+            [{"time": s.time, "temp": s.temp, "humidity": s.humidity, "wind_speed": s.wind_speed} for s in steps[start:start + length]]
+            for start, length in zip(harvest_starts[harvest_keep].tolist(), harvest_lengths[harvest_keep].tolist())
+        ]),
+        "irrigation_recommendation": logic._irrigation_result([
+            [{"time": s.time, "temp": s.temp, "rain_prob": s.pop} for s in steps[start:start + length]]
+            for start, length in zip(irrigation_starts[irrigation_keep].tolist(), irrigation_lengths[irrigation_keep].tolist())
+        ]),
+    }
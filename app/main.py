@@ -1,11 +1,28 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, status
 from fastapi.middleware.cors import CORSMiddleware
-from .schemas import FarmLocation, DemeterInsight, AnalysisConfig, SatelliteAnalysis, Feedback
+from fastapi.responses import Response, StreamingResponse
+from .schemas import FarmLocation, DemeterInsight, AnalysisConfig, GDDInsight, SatelliteAnalysis, Feedback, ProfileComparisonRequest, ProfileComparisonInsight, BatchInsightItem, BatchInsightRequest, BatchInsightResult, BatchInsightResponse, FarmRegistration, Farm, InsightRecomputeRequest, InsightRequest, CropProfile
 from . import services
 from . import logic
 from .config import settings
+from .http_client import upstream_clients
+from .jobs import enqueue_jobs, satellite_job_id, SATELLITE_ANALYSIS_FUNCTION
+from .satellite_events import satellite_results
+from .rate_limit import BACKGROUND, upstream_priority, upstream_rate_limiter
+from .farms import FARM_REFRESH_FUNCTION, FarmRegistry, InsightStore, refresh_job_id
+from .gdd_store import create_gdd_store
+from .snapshots import InsightSnapshotStore
+from .analysis_memo import analysis_memo
+from .profiles import CustomProfileStore
+from .serialization import JSON_MEDIA_TYPE, encode_insight, parse_fields
+from .compression import CompressionMiddleware
+from .http_cache import etag_matches, make_etag
+from .metrics import ServerTimingMiddleware, render_latest, timed, timed_handler
+from . import tracing
 import asyncio
 import json
+from datetime import date
+from typing import Any, Dict, List, Literal, Optional
 from arq import create_pool
 from arq.connections import RedisSettings
 import os
@@ -31,22 +48,52 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"], # Para o frontend guardar o ETag e enviá-lo em If-None-Match
 )
 
+# --- Compressão: respostas JSON acima do limite seguem em gzip/brotli (redes rurais lentas) ---
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_SIZE, gzip_level=settings.COMPRESSION_GZIP_LEVEL, brotli_quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+# --- Métricas: tempos por etapa no cabeçalho Server-Timing e histogramas em /metrics ---
+app.add_middleware(ServerTimingMiddleware)
+
+# --- Tracing: um span por requisição, propagado até os jobs do worker ---
+if tracing.configure_tracing("demeter-api"):
+    tracing.instrument_fastapi(app)
+
 # --- ARQ Redis Pool ---
 redis_pool = None
+farm_registry = None
+insight_store = None
+gdd_store = None
+snapshot_store = None
+custom_profiles = CustomProfileStore(logic.crop_profiles)
 
 @app.on_event("startup")
 async def startup_event():
-    global redis_pool
+    global redis_pool, farm_registry, insight_store, gdd_store, snapshot_store
     redis_settings = RedisSettings.from_dsn(settings.REDIS_DSN)
     redis_pool = await create_pool(redis_settings)
+    farm_registry = FarmRegistry(redis_pool)
+    insight_store = InsightStore(redis_pool) # Somente leitura na API; quem grava (e define o TTL) é o worker
+    gdd_store = create_gdd_store(redis_pool)
+    snapshot_store = InsightSnapshotStore(redis_pool, settings.INSIGHT_SNAPSHOT_TTL_SECONDS, settings.INSIGHT_SNAPSHOT_MAX_ENTRIES)
+    await upstream_clients.start()
+    services.forecast_cache.bind_redis(redis_pool)
+    upstream_rate_limiter.bind_redis(redis_pool)
+    analysis_memo.bind_redis(redis_pool)
+    await satellite_results.start(redis_pool)
+    await custom_profiles.start(redis_pool, settings.CROP_PROFILE_RELOAD_SECONDS)
     # print("ARQ Redis pool initialized.")
     # print(f"Type of redis_pool: {type(redis_pool)}")
     # print(f"Dir of redis_pool: {dir(redis_pool)}")
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await satellite_results.stop()
+    await custom_profiles.stop()
+    await upstream_clients.aclose()
+    tracing.shutdown_tracing()
     if redis_pool:
         await redis_pool.close()
         print("ARQ Redis pool closed.")
@@ -56,23 +103,33 @@ def read_root():
     return {"message": "Bem-vindo à API Smart Agro Clima"}
 
 
-@app.post("/insights/", response_model=DemeterInsight)
-async def get_demeter_insights(location: FarmLocation, config: AnalysisConfig = Depends(AnalysisConfig)):
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Exposição das métricas no formato Prometheus."""
+    content, media_type = render_latest()
+    return Response(content=content, media_type=media_type)
+
+
+async def fetch_weather(location: FarmLocation, planting_date: Optional[date] = None):
     """
-    Endpoint principal. Recebe a localização e retorna os insights acionáveis.
-    Agora busca tanto a previsão do tempo quanto dados históricos em paralelo.
-    A análise de satélite é submetida como uma tarefa de fundo.
+    Busca os dados de previsão e históricos em paralelo.
+    Com 'planting_date', o histórico dos últimos dias é substituído pela série diária desde o plantio
+    (terceiro valor retornado; None sem data de plantio ou se a série não puder ser obtida, caso em que
+    o GDD volta a usar o histórico dos últimos dias).
+    Um erro na previsão interrompe a requisição; um erro no histórico apenas gera um alerta.
     """
-    if not redis_pool:
-        raise HTTPException(status_code=500, detail="Redis pool not initialized.")
-
     # Busca os dados de previsão e históricos em paralelo para mais eficiência
     forecast_task = services.get_forecast_data(lat=location.lat, lon=location.lon)
-    historical_task = services.get_historical_weather_data(lat=location.lat, lon=location.lon)
-    
-    results = await asyncio.gather(forecast_task, historical_task)
-    
-    forecast_data, historical_data = results
+    if planting_date:
+        gdd_series_task = gdd_store.get_series(location.lat, location.lon, planting_date)
+        forecast_data, gdd_series = await asyncio.gather(forecast_task, gdd_series_task)
+        historical_data = {}
+        if gdd_series is None:
+            historical_data = await services.get_historical_weather_data(lat=location.lat, lon=location.lon)
+    else:
+        historical_task = services.get_historical_weather_data(lat=location.lat, lon=location.lon)
+        forecast_data, historical_data = await asyncio.gather(forecast_task, historical_task)
+        gdd_series = None
     
     if forecast_data.get("error"):
         raise HTTPException(status_code=500, detail=forecast_data.get("error"))
@@ -81,25 +138,40 @@ async def get_demeter_insights(location: FarmLocation, config: AnalysisConfig =
     if historical_data.get("error"):
         print(f"Alerta: Não foi possível obter dados históricos. {historical_data.get('error')}")
 
-    # Submete a tarefa de análise de satélite para o ARQ
-    # O resultado inicial da análise de satélite indica que está sendo processado
+    return forecast_data, historical_data, gdd_series
+
+
+def pending_satellite_analysis(location: FarmLocation) -> SatelliteAnalysis:
+    """Estado inicial da análise de satélite enfileirada para a localização (em processamento)."""
+    return SatelliteAnalysis(
+        available=False,
+        message="Análise de satélite em processamento...",
+        ndvi_value=None,
+        image_url=None,
+        task_id=satellite_job_id(location.lat, location.lon) # ID da tarefa para o frontend acompanhar
+    )
+
+
+async def enqueue_satellite_analysis(location: FarmLocation) -> SatelliteAnalysis:
+    """
+    Submete a análise de satélite para o ARQ e retorna o estado inicial da análise.
+    O resultado inicial indica que está sendo processado.
+    """
+    job_id = satellite_job_id(location.lat, location.lon) # ID customizado para fácil recuperação
     try:
-        job = await redis_pool.enqueue_job(
-            "analyze_satellite_image", 
-            lat=location.lat, 
-            lon=location.lon,
-            _job_id=f"satellite_analysis_{location.lat}_{location.lon}" # ID customizado para fácil recuperação
-        )
-        satellite_analysis_initial = SatelliteAnalysis(
-            available=False,
-            message="Análise de satélite em processamento...",
-            ndvi_value=None,
-            image_url=None,
-            task_id=job.job_id # Adiciona o ID da tarefa para o frontend acompanhar
-        )
+        with timed("enqueue"), tracing.span("arq.enqueue", {"arq.function": SATELLITE_ANALYSIS_FUNCTION, "arq.job_id": job_id}):
+            # Sem novo job (None) se já houver um com o mesmo ID: o resultado sai sob o mesmo task_id
+            await redis_pool.enqueue_job(
+                SATELLITE_ANALYSIS_FUNCTION, 
+                lat=location.lat, 
+                lon=location.lon,
+                trace_context=tracing.inject_context(), # O job continua o trace desta requisição
+                _job_id=job_id
+            )
+        return pending_satellite_analysis(location)
     except Exception as e:
         print(f"Erro ao enfileirar tarefa de satélite: {e}")
-        satellite_analysis_initial = SatelliteAnalysis(
+        return SatelliteAnalysis(
             available=False,
             message="Erro ao iniciar análise de satélite.",
             ndvi_value=None,
@@ -107,28 +179,410 @@ async def get_demeter_insights(location: FarmLocation, config: AnalysisConfig =
             task_id=None
         )
 
+
+class InsightFormat:
+    """
+    Parâmetros da resposta de /insights/: formato (seleção de seções e forma compacta) e
+    requisição condicional (If-None-Match), respondida com 304 antes de qualquer análise.
+    """
+
+    def __init__(
+        self,
+        fields: Optional[str] = Query(None, description="Seções a incluir, separadas por vírgula (ex.: \"frost_alert,gdd_insight\"). Se omitido, inclui todas."),
+        compact: bool = Query(False, description="Codifica os 'details' em colunas ({columns, rows}) e omite textos explicativos."),
+        details: bool = Query(True, description="Se falso, omite os 'details' de todas as seções."),
+        if_none_match: Optional[str] = Header(None),
+    ):
+        try:
+            self.fields = parse_fields(fields)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        self.compact = compact
+        self.details = details
+        self.if_none_match = if_none_match
+
+    def etag(self, *parts: Any) -> str:
+        """ETag das partes que determinam o insight, combinadas com o formato pedido."""
+        return make_etag(*parts, sorted(self.fields or ()), self.compact, self.details)
+
+    def not_modified(self, etag: str) -> Optional[Response]:
+        """Resposta 304 se o cliente já tem esta versão (If-None-Match), senão None."""
+        if etag_matches(self.if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": "no-cache"})
+        return None
+
+    def response(self, insights: Dict[str, Any], etag: str) -> Response:
+        """
+        Codifica o insight diretamente, sem a revalidação do response_model: o resultado do motor de
+        análise é confiável e já segue DemeterInsight (o modelo continua documentando a resposta).
+        'no-cache' faz o cliente revalidar a cada uso, recebendo 304 enquanto o ETag não mudar.
+        """
+        content = encode_insight(insights, self.fields, self.compact, self.details)
+        return Response(content=content, media_type=JSON_MEDIA_TYPE, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def config_etag_parts(config: AnalysisConfig) -> tuple:
+    """Partes do ETag que vêm da configuração: os parâmetros pedidos e os limites efetivos do perfil (que podem ser alterados via API)."""
+    return config.model_dump_json(), logic.crop_profiles.compile_config(config.model_dump()).fingerprint
+
+
+@app.post("/insights/", response_model=DemeterInsight)
+@timed_handler
+async def get_demeter_insights(request: InsightRequest, backend: Literal["python", "numpy"] = "python", output: InsightFormat = Depends()):
+    """
+    Endpoint principal. Recebe a localização (e, no mesmo corpo, a configuração de análise) e retorna os insights acionáveis.
+    Para fazendas cadastradas (mesma localização e configuração), responde com o insight
+    pré-calculado pelo worker; caso contrário, calcula na hora:
+    busca tanto a previsão do tempo quanto dados históricos em paralelo.
+    A análise de satélite é submetida como uma tarefa de fundo.
+    A resposta traz 'snapshot_id', com o qual POST /insights/recompute refaz a análise com outros limites.
+    O parâmetro 'backend' escolhe o motor de análise ("numpy" é vetorizado, útil para horizontes longos).
+    'fields', 'compact' e 'details' reduzem a resposta (ex.: painéis que só exibem alguns alertas).
+    A resposta traz um ETag derivado do snapshot (previsão, histórico e cena de satélite) e dos limites;
+    com If-None-Match igual, responde 304 sem enfileirar o satélite, gravar o snapshot, refazer a análise ou codificar o resultado.
+    """
+    if not redis_pool:
+        raise HTTPException(status_code=500, detail="Redis pool not initialized.")
+    location, config = request.location(), request.config()
+
+    with timed("precomputed"):
+        precomputed = await insight_store.get(location.lat, location.lon, config.model_dump())
+    if precomputed:
+        etag = output.etag("precomputed", location.lat, location.lon, precomputed.get("precomputed_at"), *config_etag_parts(config))
+        not_modified = output.not_modified(etag)
+        if not_modified:
+            return not_modified
+        return output.response(precomputed, etag)
+
+    forecast_data, historical_data, gdd_series = await fetch_weather(location, config.planting_date)
+
+    # O snapshot identifica os dados da análise e, com os limites, a versão da resposta (ETag). Ele é
+    # calculado com a tarefa de satélite já enfileirada, para responder 304 sem enfileirar nem gravar nada
+    if output.if_none_match:
+        with timed("snapshot"):
+            pending = pending_satellite_analysis(location).model_dump()
+            snapshot_id = snapshot_store.snapshot_id(location.lat, location.lon, forecast_data, historical_data, pending, gdd_series)
+        not_modified = output.not_modified(output.etag(snapshot_id, *config_etag_parts(config)))
+        if not_modified:
+            return not_modified
+
+    # Submete a tarefa de análise de satélite para o ARQ
+    satellite_analysis_initial = (await enqueue_satellite_analysis(location)).model_dump()
+
+    with timed("snapshot"):
+        snapshot_id = await snapshot_store.put(location.lat, location.lon, forecast_data, historical_data, satellite_analysis_initial, gdd_series)
+    etag = output.etag(snapshot_id, *config_etag_parts(config))
+
     # A função de análise agora recebe ambos os conjuntos de dados
-    insights = logic.analyze_forecast(forecast_data, historical_data, config.model_dump() | {"lat": location.lat, "lon": location.lon}, satellite_analysis_initial.model_dump())
+    insights = await analysis_memo.analyze(forecast_data, historical_data, config.model_dump() | {"lat": location.lat, "lon": location.lon}, satellite_analysis_initial, backend=backend, gdd_series=gdd_series)
     
     if insights.get("error"):
         raise HTTPException(status_code=500, detail=insights.get("error"))
 
     # A análise de satélite já está incluída nos insights retornados por logic.analyze_forecast
 
+    insights["snapshot_id"] = snapshot_id
+    return output.response(insights, etag)
+
+
+@app.post("/insights/recompute", response_model=DemeterInsight)
+@timed_handler
+async def recompute_demeter_insights(request: InsightRecomputeRequest, backend: Literal["python", "numpy"] = "python", output: InsightFormat = Depends()):
+    """
+    Refaz a análise de um snapshot devolvido por /insights/ com novos limites, sem chamar os provedores
+    de clima e sem enfileirar outra análise de satélite (se a original já terminou, seu resultado é usado).
+    Responde 404 se o snapshot tiver expirado; nesse caso, a análise deve ser refeita em /insights/.
+    Aceita os mesmos parâmetros de formato de /insights/ ('fields', 'compact', 'details') e If-None-Match.
+    """
+    if not redis_pool:
+        raise HTTPException(status_code=500, detail="Redis pool not initialized.")
+
+    with timed("snapshot"):
+        snapshot = await snapshot_store.get(request.snapshot_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Snapshot não encontrado ou expirado. Refaça a análise.")
+
+    satellite_analysis = snapshot["satellite_analysis"]
+    if satellite_analysis.get("task_id"):
+        result_json = await redis_pool.get(satellite_analysis["task_id"])
+        if result_json:
+            satellite_analysis = satellite_analysis_from_result(result_json).model_dump()
+
+    # O resultado de satélite entra no ETag: a conclusão da cena muda o insight do mesmo snapshot
+    etag = output.etag(request.snapshot_id, json.dumps(satellite_analysis, sort_keys=True), *config_etag_parts(request.config))
+    not_modified = output.not_modified(etag)
+    if not_modified:
+        return not_modified
+
+    insights = await analysis_memo.analyze(snapshot["forecast_data"], snapshot["historical_data"], request.config.model_dump() | snapshot["location"], satellite_analysis, backend=backend, gdd_series=snapshot["gdd_series"])
+
+    if insights.get("error"):
+        raise HTTPException(status_code=500, detail=insights.get("error"))
+
+    return output.response({**insights, "snapshot_id": request.snapshot_id}, etag)
+
+
+@app.post("/insights/profiles", response_model=ProfileComparisonInsight)
+@timed_handler
+async def compare_crop_profiles(request: ProfileComparisonRequest, backend: Literal["python", "numpy"] = "python"):
+    """
+    Avalia vários perfis de cultura (todos, por padrão) para a mesma localização.
+    A previsão e o histórico são buscados uma única vez e compartilhados entre os perfis.
+    """
+    if not redis_pool:
+        raise HTTPException(status_code=500, detail="Redis pool not initialized.")
+
+    profiles = request.profiles or logic.crop_profiles.names()
+    unknown_profiles = [name for name in profiles if name not in logic.crop_profiles]
+    if unknown_profiles:
+        raise HTTPException(status_code=400, detail=f"Perfis de cultura desconhecidos: {', '.join(unknown_profiles)}.")
+    unknown_keys = [key for key in request.overrides if key not in logic.crop_profiles.keys]
+    if unknown_keys:
+        raise HTTPException(status_code=400, detail=f"Parâmetros de análise desconhecidos: {', '.join(unknown_keys)}.")
+
+    forecast_data, historical_data, _ = await fetch_weather(request.location)
+    satellite_analysis_initial = await enqueue_satellite_analysis(request.location)
+
+    insights = logic.analyze_profiles(forecast_data, historical_data, profiles, request.overrides, satellite_analysis_initial.model_dump(), backend=backend)
+    
+    if insights.get("error"):
+        raise HTTPException(status_code=500, detail=insights.get("error"))
+
     return insights
 
 
+async def fetch_cell_weather(cell: tuple) -> tuple:
+    """Busca previsão e histórico para o centro de uma célula de grade, sem interromper o lote em caso de erro."""
+    try:
+        return await asyncio.gather(
+            services.get_forecast_data(lat=cell[0], lon=cell[1]),
+            services.get_historical_weather_data(lat=cell[0], lon=cell[1]),
+        )
+    except Exception as e:
+        print(f"Erro ao buscar dados do tempo para a célula {cell}: {e}")
+        return {"error": "Ocorreu um erro inesperado no servidor."}, {}
+
+
+def group_by_cell(items: List[BatchInsightItem]) -> Dict[tuple, List[tuple]]:
+    """Agrupa os itens do lote (com seus índices) pela célula de grade da previsão."""
+    groups: Dict[tuple, List[tuple]] = {}
+    for index, item in enumerate(items):
+        cell = services.forecast_cell(item.location.lat, item.location.lon)
+        groups.setdefault(cell, []).append((index, item))
+    return groups
+
+
+async def fetch_weather_by_cell(cells: List[tuple], max_concurrency: int) -> Dict[tuple, tuple]:
+    """
+    Busca previsão e histórico uma única vez por célula de grade,
+    com no máximo 'max_concurrency' células em andamento ao mesmo tempo.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch_cell(cell):
+        async with semaphore:
+            return await fetch_cell_weather(cell)
+
+    weather = await asyncio.gather(*(fetch_cell(cell) for cell in cells))
+    return dict(zip(cells, weather))
+
+
+async def fetch_gdd_series(entries: List[tuple]) -> Dict[int, Any]:
+    """Séries diárias de GDD dos itens do lote que informam a data de plantio, indexadas pelo índice do item."""
+    dated = [(index, item) for index, item in entries if item.config and item.config.planting_date]
+    series = await asyncio.gather(*(gdd_store.get_series(item.location.lat, item.location.lon, item.config.planting_date) for _, item in dated), return_exceptions=True)
+    by_index = {}
+    for (index, item), item_series in zip(dated, series):
+        if isinstance(item_series, Exception):
+            # Sem a série, o GDD do item volta a ser calculado sobre o histórico recente
+            print(f"Erro ao obter a série de GDD da fazenda {item.farm_id or index}: {item_series}")
+            continue
+        by_index[index] = item_series
+    return by_index
+
+
+def analyze_batch_item(index: int, item: BatchInsightItem, weather: tuple, satellite_by_job: Dict[str, SatelliteAnalysis], backend: str, gdd_series=None) -> Dict[str, Any]:
+    """Analisa uma fazenda do lote, convertendo qualquer falha em um erro apenas desse item."""
+    location = item.location
+    forecast_data, historical_data = weather
+    result = {"index": index, "farm_id": item.farm_id}
+    if forecast_data.get("error"):
+        return {**result, "error": forecast_data.get("error")}
+
+    config = (item.config or AnalysisConfig()).model_dump() | {"lat": location.lat, "lon": location.lon}
+    satellite_analysis_initial = satellite_by_job[satellite_job_id(location.lat, location.lon)]
+    try:
+        insights = analysis_memo.analyze_local(forecast_data, historical_data, config, satellite_analysis_initial.model_dump(), backend=backend, gdd_series=gdd_series)
+    except Exception as e:
+        print(f"Erro ao analisar a fazenda {item.farm_id or index}: {e}")
+        insights = {"error": "Ocorreu um erro inesperado na análise."}
+
+    if insights.get("error"):
+        return {**result, "error": insights.get("error")}
+    return {**result, "insight": insights}
+
+
+async def enqueue_satellite_analyses(locations: List[FarmLocation]) -> Dict[str, SatelliteAnalysis]:
+    """
+    Submete as análises de satélite de várias localizações em pipelines do Redis.
+    Retorna o estado inicial de cada análise, indexado pelo ID da tarefa.
+    """
+    jobs = {satellite_job_id(location.lat, location.lon): {"lat": location.lat, "lon": location.lon} for location in locations}
+    try:
+        with timed("enqueue"), tracing.span("arq.enqueue_batch", {"arq.function": SATELLITE_ANALYSIS_FUNCTION, "arq.job_count": len(jobs)}):
+            # Todos os jobs do lote continuam o trace desta requisição
+            trace_context = tracing.inject_context()
+            await enqueue_jobs(redis_pool, SATELLITE_ANALYSIS_FUNCTION, [(job_id, {**kwargs, "trace_context": trace_context}) for job_id, kwargs in jobs.items()])
+        return {
+            job_id: SatelliteAnalysis(available=False, message="Análise de satélite em processamento...", task_id=job_id)
+            for job_id in jobs
+        }
+    except Exception as e:
+        print(f"Erro ao enfileirar tarefas de satélite em lote: {e}")
+        failed = SatelliteAnalysis(available=False, message="Erro ao iniciar análise de satélite.", task_id=None)
+        return {job_id: failed for job_id in jobs}
+
+
+@app.post("/insights/batch", response_model=BatchInsightResponse)
+@timed_handler
+async def get_batch_insights(request: BatchInsightRequest, backend: Literal["python", "numpy"] = "python"):
+    """
+    Gera insights para uma carteira de fazendas em uma única chamada.
+    Pontos próximos compartilham a mesma busca nos provedores externos, as análises de satélite
+    são enfileiradas em lote e cada fazenda recebe seu próprio resultado ou erro.
+    """
+    if not redis_pool:
+        raise HTTPException(status_code=500, detail="Redis pool not initialized.")
+    if len(request.items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"O lote excede o limite de {settings.BATCH_MAX_ITEMS} fazendas.")
+
+    groups = group_by_cell(request.items)
+    # Lotes cedem a cota dos provedores às requisições interativas
+    with upstream_priority(BACKGROUND):
+        weather_by_cell, satellite_by_job, gdd_by_index = await asyncio.gather(
+            fetch_weather_by_cell(list(groups), settings.BATCH_MAX_CONCURRENCY),
+            enqueue_satellite_analyses([item.location for item in request.items]),
+            fetch_gdd_series(list(enumerate(request.items))),
+        )
+
+    results = [None] * len(request.items)
+    for cell, entries in groups.items():
+        for index, item in entries:
+            results[index] = analyze_batch_item(index, item, weather_by_cell[cell], satellite_by_job, backend, gdd_by_index.get(index))
+
+    return {"results": results}
+
+
+async def stream_batch_results(groups: Dict[tuple, List[tuple]], satellite_by_job: Dict[str, SatelliteAnalysis], backend: str):
+    """
+    Gera uma linha NDJSON por fazenda, na ordem em que as análises terminam.
+    Os resultados passam por uma fila limitada: se o cliente lê devagar, a fila enche e as
+    buscas de novas células param, em vez de acumular a carteira inteira em memória.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=settings.BATCH_STREAM_BUFFER)
+    finished = object()
+    pending_cells = iter(list(groups.items()))
+    sent = set()
+
+    def error_line(index: int, item: BatchInsightItem, message: str) -> str:
+        return BatchInsightResult(index=index, farm_id=item.farm_id, error=message).model_dump_json() + "\n"
+
+    async def worker():
+        # Os workers compartilham o mesmo iterador, então cada célula é buscada uma única vez
+        for cell, entries in pending_cells:
+            weather, gdd_by_index = await asyncio.gather(fetch_cell_weather(cell), fetch_gdd_series(entries))
+            for index, item in entries:
+                # Como em /insights/batch, uma falha vira o erro apenas desse item
+                try:
+                    result = analyze_batch_item(index, item, weather, satellite_by_job, backend, gdd_by_index.get(index))
+                    with timed("serialization"):
+                        line = BatchInsightResult(**result).model_dump_json() + "\n"
+                except Exception as e:
+                    print(f"Erro ao gerar o resultado da fazenda {item.farm_id or index}: {e}")
+                    line = error_line(index, item, "Ocorreu um erro inesperado na análise.")
+                await queue.put(line)
+                sent.add(index)
+
+    async def run_workers():
+        workers = [asyncio.create_task(worker()) for _ in range(settings.BATCH_MAX_CONCURRENCY)]
+        try:
+            await asyncio.gather(*workers)
+        except Exception as e:
+            # Falha fora de um item: os demais workers são interrompidos e os itens restantes recebem uma linha de erro
+            print(f"Erro ao processar o lote em streaming: {e}")
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            for entries in groups.values():
+                for index, item in entries:
+                    if index not in sent:
+                        await queue.put(error_line(index, item, "Ocorreu um erro inesperado no processamento do lote."))
+        finally:
+            # Cancelamento (cliente desconectado): nenhum worker fica bloqueado na fila
+            for task in workers:
+                task.cancel()
+        await queue.put(finished)
+
+    # Lotes cedem a cota dos provedores às requisições interativas
+    with upstream_priority(BACKGROUND):
+        producer = asyncio.create_task(run_workers())
+    try:
+        while True:
+            line = await queue.get()
+            if line is finished:
+                break
+            yield line
+    finally:
+        # Cliente desconectado ou fim do lote: interrompe as buscas restantes
+        producer.cancel()
+
+
+@app.post("/insights/batch/stream")
+async def stream_batch_insights(request: BatchInsightRequest, backend: Literal["python", "numpy"] = "python"):
+    """
+    Variante em streaming de /insights/batch: responde em NDJSON, uma linha (BatchInsightResult)
+    por fazenda assim que ela é analisada, em ordem de conclusão (use 'index' ou 'farm_id' para associar).
+    """
+    if not redis_pool:
+        raise HTTPException(status_code=500, detail="Redis pool not initialized.")
+    if len(request.items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"O lote excede o limite de {settings.BATCH_MAX_ITEMS} fazendas.")
+
+    groups = group_by_cell(request.items)
+    satellite_by_job = await enqueue_satellite_analyses([item.location for item in request.items])
+    return StreamingResponse(stream_batch_results(groups, satellite_by_job, backend), media_type="application/x-ndjson")
+
+
+def satellite_analysis_from_result(result_json) -> SatelliteAnalysis:
+    """Converte o resultado armazenado pelo worker (JSON) no modelo de resposta."""
+    # The result of the job is a JSON string that needs to be deserialized
+    try:
+        result_data = json.loads(result_json)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=500, detail="Erro ao decodificar resultado da tarefa.")
+    return SatelliteAnalysis(
+        available=True,
+        message="Análise de satélite concluída.",
+        ndvi_value=result_data.get("ndvi_value"),
+        image_url=result_data.get("image_url")
+    )
+
+
 @app.get("/satellite/result/{task_id}", response_model=SatelliteAnalysis)
-async def get_satellite_analysis_result(task_id: str):
+async def get_satellite_analysis_result(response: Response, task_id: str, wait: float = Query(0, ge=0, le=30, description="Segundos para aguardar a conclusão (long-poll) antes de responder 202."), if_none_match: Optional[str] = Header(None)):
     """
     Endpoint para verificar o status e obter o resultado de uma tarefa de análise de satélite.
+    Com 'wait', a requisição fica aberta até a tarefa terminar ou o tempo acabar (long-poll),
+    para clientes que não conseguem manter um stream em /satellite/stream/{task_id}.
+    O resultado concluído traz um ETag derivado da cena; com If-None-Match igual, responde 304.
     """
     if not redis_pool:
         raise HTTPException(status_code=500, detail="Redis pool not initialized.")
 
-    print(f"Received task_id: {task_id}")
-    result_json = await redis_pool.get(task_id)
-    print(f"Result from Redis for {task_id}: {result_json}")
+    if wait > 0:
+        result_json = await satellite_results.wait(task_id, wait, lambda: redis_pool.get(task_id))
+    else:
+        result_json = await redis_pool.get(task_id)
 
     if not result_json:
         # If the job is not yet finished, or if it failed and the result was not stored
@@ -136,23 +590,136 @@ async def get_satellite_analysis_result(task_id: str):
         # So we assume it's still processing if no result is found.
         raise HTTPException(status_code=status.HTTP_202_ACCEPTED, detail="Análise em processamento.")
 
-    # The result of the job is a JSON string that needs to be deserialized
-    try:
-        result_data = json.loads(result_json)
-        return SatelliteAnalysis(
-            available=True,
-            message="Análise de satélite concluída.",
-            ndvi_value=result_data.get("ndvi_value"),
-            image_url=result_data.get("image_url")
-        )
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=500, detail="Erro ao decodificar resultado da tarefa.")
+    etag = make_etag("satellite", task_id, result_json)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return satellite_analysis_from_result(result_json)
+
+
+@app.get("/satellite/stream/{task_id}")
+async def stream_satellite_analysis_result(task_id: str):
+    """
+    Server-Sent Events: envia um evento 'result' (SatelliteAnalysis) assim que o worker publicar
+    a conclusão da tarefa, substituindo o polling. Comentários de keep-alive mantêm a conexão
+    aberta; após SATELLITE_STREAM_TIMEOUT_SECONDS sem resultado é enviado um evento 'timeout'.
+    """
+    if not redis_pool:
+        raise HTTPException(status_code=500, detail="Redis pool not initialized.")
+
+    async def events():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.SATELLITE_STREAM_TIMEOUT_SECONDS
+        check = lambda: redis_pool.get(task_id)
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                yield "event: timeout\ndata: {}\n\n"
+                return
+            result_json = await satellite_results.wait(task_id, min(remaining, settings.SATELLITE_STREAM_KEEPALIVE_SECONDS), check)
+            if result_json:
+                try:
+                    analysis = satellite_analysis_from_result(result_json)
+                except HTTPException as e:
+                    yield f"event: failure\ndata: {json.dumps({'detail': e.detail})}\n\n"
+                    return
+                yield f"event: result\ndata: {analysis.model_dump_json()}\n\n"
+                return
+            yield ": keep-alive\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.post("/farms", response_model=Farm, status_code=status.HTTP_201_CREATED)
+async def register_farm(registration: FarmRegistration):
+    """
+    Cadastra uma fazenda para pré-cálculo periódico dos insights pelo worker. O primeiro cálculo
+    é enfileirado imediatamente; depois, a fazenda é atualizada a cada ciclo da previsão.
+    """
+    if not redis_pool:
+        raise HTTPException(status_code=500, detail="Redis pool not initialized.")
+    config = (registration.config or AnalysisConfig()).model_dump(mode="json")
+    farm = await farm_registry.register(registration.location.lat, registration.location.lon, config, registration.farm_id)
+    await enqueue_jobs(redis_pool, FARM_REFRESH_FUNCTION, [(refresh_job_id(farm["farm_id"], settings.FORECAST_CACHE_CADENCE_SECONDS, farm["config"]), {"farm_id": farm["farm_id"]})])
+    return farm
+
+
+@app.get("/farms", response_model=List[Farm])
+async def list_farms():
+    """Lista as fazendas cadastradas para pré-cálculo."""
+    if not redis_pool:
+        raise HTTPException(status_code=500, detail="Redis pool not initialized.")
+    return await farm_registry.list_farms()
+
+
+@app.delete("/farms/{farm_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def remove_farm(farm_id: str):
+    """Remove uma fazenda do cadastro; o último insight pré-calculado expira sozinho."""
+    if not redis_pool:
+        raise HTTPException(status_code=500, detail="Redis pool not initialized.")
+    if not await farm_registry.remove(farm_id):
+        raise HTTPException(status_code=404, detail="Fazenda não encontrada.")
+
+
+@app.get("/crop-profiles", response_model=List[CropProfile])
+def list_crop_profiles():
+    """Lista os perfis de cultura disponíveis: os embutidos e os personalizados."""
+    return [
+        {"name": name, "builtin": logic.crop_profiles.is_builtin(name), "thresholds": dict(logic.crop_profiles.get(name))}
+        for name in logic.crop_profiles.names()
+    ]
+
+
+@app.put("/crop-profiles/{name}", response_model=CropProfile)
+async def put_crop_profile(name: str, thresholds: Dict[str, float]):
+    """
+    Cria ou atualiza um perfil de cultura personalizado. Os limites não informados vêm do perfil 'default'.
+    O perfil passa a valer em todos os processos da API e do worker em até CROP_PROFILE_RELOAD_SECONDS.
+    """
+    if not redis_pool:
+        raise HTTPException(status_code=500, detail="Redis pool not initialized.")
+    if logic.crop_profiles.is_builtin(name):
+        raise HTTPException(status_code=400, detail=f"O perfil '{name}' é embutido e não pode ser alterado.")
+    unknown_keys = [key for key in thresholds if key not in logic.crop_profiles.keys]
+    if unknown_keys:
+        raise HTTPException(status_code=400, detail=f"Parâmetros de análise desconhecidos: {', '.join(unknown_keys)}.")
+    await custom_profiles.put(name, thresholds)
+    return {"name": name, "builtin": False, "thresholds": dict(logic.crop_profiles.get(name))}
+
+
+@app.delete("/crop-profiles/{name}", status_code=status.HTTP_204_NO_CONTENT)
+async def remove_crop_profile(name: str):
+    """Remove um perfil de cultura personalizado."""
+    if not redis_pool:
+        raise HTTPException(status_code=500, detail="Redis pool not initialized.")
+    if logic.crop_profiles.is_builtin(name):
+        raise HTTPException(status_code=400, detail=f"O perfil '{name}' é embutido e não pode ser removido.")
+    if not await custom_profiles.remove(name):
+        raise HTTPException(status_code=404, detail="Perfil de cultura não encontrado.")
+
+
+@app.get("/gdd", response_model=GDDInsight)
+async def get_accumulated_gdd(lat: float, lon: float, since: date, base_temp: float = Query(logic.GDD_BASE_TEMP, description="Temperatura base (°C).")):
+    """
+    GDD acumulado desde a data 'since' (ex.: plantio) até ontem, para a temperatura base indicada.
+    Dias já armazenados para a localização não são buscados de novo no provedor.
+    """
+    if not redis_pool:
+        raise HTTPException(status_code=500, detail="Redis pool not initialized.")
+    if since >= date.today():
+        raise HTTPException(status_code=400, detail="A data inicial deve ser anterior a hoje.")
+    series = await gdd_store.get_series(lat, lon, since)
+    if series is None:
+        raise HTTPException(status_code=502, detail="Não foi possível obter as temperaturas diárias da localização.")
+    return series.gdd_insight(since, base_temp)
 
 
 @app.post("/weather-data/")
 async def get_raw_weather_data(location: FarmLocation):
     """
-    Endpoint de depuração para obter os dados brutos da API de clima.
+    Endpoint de depuração para obter os dados da API de clima, como usados pela análise
+    (apenas os campos lidos por app.logic; ver app.decoding).
     """
     weather_data = await services.get_forecast_data(lat=location.lat, lon=location.lon)
     if weather_data.get("error"):
@@ -0,0 +1,166 @@
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Histogram
+except ImportError:  # Sem prometheus_client (ex.: scripts de benchmark) as métricas viram no-op
+    prometheus_client = None
+
+# Limites dos histogramas, de 0,5 ms (etapas da análise) a 2 min (jobs de satélite)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+
+def _histogram(name: str, documentation: str, labelnames=()):
+    if prometheus_client is None:
+        return _NoopMetric()
+    return Histogram(name, documentation, labelnames, buckets=LATENCY_BUCKETS)
+
+
+def _counter(name: str, documentation: str, labelnames=()):
+    if prometheus_client is None:
+        return _NoopMetric()
+    return Counter(name, documentation, labelnames)
+
+
+# --- API ---
+STAGE_DURATION = _histogram("demeter_stage_duration_seconds", "Duração de cada etapa do processamento de uma requisição.", ["stage"])
+UPSTREAM_DURATION = _histogram("demeter_upstream_request_duration_seconds", "Duração das chamadas aos provedores externos.", ["provider", "outcome"])
+CACHE_REQUESTS = _counter("demeter_cache_requests_total", "Consultas ao cache, por resultado (local_hit, redis_hit, stale_hit, miss, coalesced).", ["cache", "result"])
+CIRCUIT_STATE_CHANGES = _counter("demeter_circuit_state_changes_total", "Mudanças de estado dos disjuntores dos provedores externos.", ["provider", "state"])
+RATE_LIMIT_WAIT = _histogram("demeter_rate_limit_wait_seconds", "Espera na fila do limitador de taxa antes de chamar o provedor.", ["provider", "priority"])
+RATE_LIMIT_REJECTED = _counter("demeter_rate_limit_rejected_total", "Chamadas desistidas por excederem a espera máxima do limitador de taxa.", ["provider", "priority"])
+REQUEST_DURATION = _histogram("demeter_request_duration_seconds", "Duração total das requisições HTTP.", ["method", "path", "status"])
+
+# --- Worker ---
+JOB_QUEUE_WAIT = _histogram("demeter_worker_queue_wait_seconds", "Tempo entre o enfileiramento e o início do job.", ["function"])
+JOB_DURATION = _histogram("demeter_worker_job_duration_seconds", "Duração dos jobs do worker.", ["function"])
+JOB_OUTCOMES = _counter("demeter_worker_jobs_total", "Jobs finalizados, por resultado.", ["function", "outcome"])
+EE_INIT_DURATION = _histogram("demeter_worker_ee_init_seconds", "Duração da inicialização do Google Earth Engine.", ["outcome"])
+EE_CALL_DURATION = _histogram("demeter_worker_ee_call_seconds", "Duração das chamadas bloqueantes ao Google Earth Engine.", ["call", "outcome"])
+
+
+# Tempos da requisição atual, usados para montar o cabeçalho Server-Timing
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+def record_timing(name: str, seconds: float):
+    """Acrescenta um tempo ao cabeçalho Server-Timing da requisição atual (se houver uma)."""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+@contextmanager
+def timed(stage: str):
+    """Mede uma etapa: registra no histograma de etapas e no Server-Timing da requisição."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_DURATION.labels(stage).observe(elapsed)
+        record_timing(stage, elapsed)
+
+
+@contextmanager
+def timed_upstream(provider: str):
+    """Mede uma chamada a um provedor externo, separando sucesso e erro."""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        elapsed = time.perf_counter() - start
+        UPSTREAM_DURATION.labels(provider, outcome).observe(elapsed)
+        record_timing(f"upstream.{provider}", elapsed)
+
+
+def timed_handler(endpoint):
+    """
+    Decorador de endpoints assíncronos: mede o handler como a etapa 'handler', para que o
+    middleware separe dela o tempo gasto fora do handler (etapa 'framework').
+    """
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        with timed("handler"):
+            return await endpoint(*args, **kwargs)
+    return wrapper
+
+
+class ServerTimingMiddleware:
+    """
+    Middleware ASGI que coleta os tempos das etapas de cada requisição e os devolve no cabeçalho
+    Server-Timing. A etapa 'framework' é o tempo da requisição fora do handler: leitura e validação
+    do corpo, resolução de dependências, validação do response_model, codificação feita pelo
+    FastAPI e os demais middlewares. 'serialization' é medida diretamente onde a resposta é
+    codificada (ex.: app.serialization.encode_insight).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: List[Tuple[str, float]] = []
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                total = time.perf_counter() - start
+                durations = {}
+                for name, seconds in timings:
+                    durations[name] = durations.get(name, 0.0) + seconds
+                if "handler" in durations:
+                    framework = max(0.0, total - durations["handler"])
+                    STAGE_DURATION.labels("framework").observe(framework)
+                    durations["framework"] = framework
+                durations["total"] = total
+                header = ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in durations.items())
+                # Timing-Allow-Origin expõe os tempos ao frontend, servido de outra origem (CORS "*")
+                extra_headers = [(b"server-timing", header.encode()), (b"timing-allow-origin", b"*")]
+                message = {**message, "headers": list(message.get("headers", [])) + extra_headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            REQUEST_DURATION.labels(scope["method"], path, str(status_code)).observe(time.perf_counter() - start)
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """Retorna o conteúdo e o content-type da exposição Prometheus."""
+    if prometheus_client is None:
+        return b"", "text/plain"
+    return prometheus_client.generate_latest(), prometheus_client.CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port: int):
+    """Expõe as métricas em um servidor HTTP próprio (usado pelo worker, que não tem API)."""
+    if prometheus_client is not None and port:
+        prometheus_client.start_http_server(port)
@@ -0,0 +1,58 @@
+import math
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+# Registro compacto (16 bytes): NDVI médio (NaN = sem valor), % de pixels nublados da cena
+# e início da aquisição da cena (epoch em ms), seguido da URL do thumbnail (UTF-8, opcional).
+RECORD = struct.Struct("<ffq")
+
+
+def encode_record(ndvi_value: Optional[float], cloudy_pixel_percentage: Optional[float], time_start: Optional[int], image_url: Optional[str] = None) -> bytes:
+    """Codifica um resultado de NDVI no formato binário compacto do armazenamento."""
+    return RECORD.pack(
+        math.nan if ndvi_value is None else ndvi_value,
+        math.nan if cloudy_pixel_percentage is None else cloudy_pixel_percentage,
+        time_start or 0,
+    ) + (image_url or "").encode()
+
+
+def decode_record(raw: bytes) -> Dict[str, Any]:
+    """Decodifica um registro binário de NDVI (registros antigos, de 16 bytes, vêm sem 'image_url')."""
+    ndvi_value, cloudy_pixel_percentage, time_start = RECORD.unpack_from(raw)
+    return {
+        "ndvi_value": None if math.isnan(ndvi_value) else ndvi_value,
+        "cloudy_pixel_percentage": None if math.isnan(cloudy_pixel_percentage) else cloudy_pixel_percentage,
+        "time_start": time_start or None,
+        "image_url": raw[RECORD.size:].decode() or None,
+    }
+
+
+class NDVIStore:
+    """
+    Armazenamento durável de NDVI no Redis, indexado por (ponto ajustado à grade, cena Sentinel-2).
+    Enquanto a melhor cena de um ponto não mudar, o NDVI é reaproveitado sem novo cálculo de pixels.
+    """
+
+    def __init__(self, redis, ttl_seconds: int):
+        self._redis = redis
+        self._ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def key(lat: float, lon: float, scene_id: str) -> str:
+        return f"ndvi:{lat:.6f}:{lon:.6f}:{scene_id}"
+
+    async def get_many(self, entries: List[Tuple[float, float, str]]) -> List[Optional[Dict[str, Any]]]:
+        """Busca os registros de vários (lat, lon, scene_id) com um único MGET."""
+        if not entries:
+            return []
+        raw_values = await self._redis.mget([self.key(lat, lon, scene_id) for lat, lon, scene_id in entries])
+        return [decode_record(raw) if raw else None for raw in raw_values]
+
+    async def put_many(self, entries: List[Tuple[float, float, str, bytes]]):
+        """Grava vários registros já codificados em um único pipeline."""
+        if not entries:
+            return
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for lat, lon, scene_id, record in entries:
+                pipe.set(self.key(lat, lon, scene_id), record, ex=self._ttl_seconds)
+            await pipe.execute()
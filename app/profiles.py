@@ -0,0 +1,155 @@
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+CUSTOM_PROFILES_KEY = "crop_profiles:custom"
+CUSTOM_PROFILES_VERSION_KEY = "crop_profiles:version"
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledProfile:
+    """Limites efetivos de uma análise (perfil de cultura + limites explícitos), imutáveis e prontos para os detectores."""
+    name: str
+    thresholds: Mapping[str, float]
+    fingerprint: str
+
+
+class ProfileRegistry:
+    """
+    Perfis de cultura: os embutidos (logic.CROP_PROFILES) e os personalizados, guardados no Redis.
+    Cada combinação (perfil, limites explícitos) é compilada uma única vez em um CompiledProfile
+    e reaproveitada pelas requisições seguintes, sem refazer a mescla de dicionários.
+    """
+
+    def __init__(self, builtin_profiles: Dict[str, Dict[str, Any]], max_compiled: int = 4096):
+        self.default = MappingProxyType(dict(builtin_profiles["default"]))
+        self.keys: Tuple[str, ...] = tuple(self.default)
+        self._builtin = {name: self._complete(values) for name, values in builtin_profiles.items()}
+        self._custom: Dict[str, Mapping[str, Any]] = {}
+        self._max_compiled = max_compiled
+        self._compiled: "OrderedDict[tuple, CompiledProfile]" = OrderedDict()
+
+    def _complete(self, values: Mapping[str, Any]) -> Mapping[str, Any]:
+        """Perfil com todos os limites; os ausentes vêm do perfil 'default'."""
+        return MappingProxyType({key: values.get(key, default) for key, default in self.default.items()})
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._builtin or name in self._custom
+
+    def names(self) -> List[str]:
+        return list(self._builtin) + [name for name in self._custom if name not in self._builtin]
+
+    def is_builtin(self, name: str) -> bool:
+        return name in self._builtin
+
+    def get(self, name: Optional[str]) -> Optional[Mapping[str, Any]]:
+        """Limites completos do perfil (None se o perfil não existir)."""
+        if not name:
+            return None
+        return self._builtin.get(name) or self._custom.get(name)
+
+    def set_custom(self, profiles: Dict[str, Dict[str, Any]]):
+        """Substitui os perfis personalizados (ex.: recarregados do Redis) e descarta as compilações antigas."""
+        self._custom = {name: self._complete(values) for name, values in profiles.items() if name not in self._builtin}
+        self._compiled.clear()
+
+    def compile(self, name: Optional[str], overrides: Mapping[str, Any]) -> CompiledProfile:
+        """Compila o perfil 'name' com os limites explícitos 'overrides' (valores None são ignorados)."""
+        return self._compile(name, tuple(overrides.get(key) for key in self.keys))
+
+    def compile_config(self, config: Mapping[str, Any]) -> CompiledProfile:
+        """Compila uma configuração de análise (AnalysisConfig): 'crop_profile' mais os limites fornecidos."""
+        return self._compile(config.get("crop_profile"), tuple(config.get(key) for key in self.keys))
+
+    def _compile(self, name: Optional[str], override_values: tuple) -> CompiledProfile:
+        cache_key = (name, override_values)
+        compiled = self._compiled.get(cache_key)
+        if compiled is not None:
+            self._compiled.move_to_end(cache_key)
+            return compiled
+
+        base = self.get(name) or self.default
+        thresholds = {
+            key: base[key] if value is None else value
+            for key, value in zip(self.keys, override_values)
+        }
+        compiled = CompiledProfile(
+            name=name if name in self else "default",
+            thresholds=MappingProxyType(thresholds),
+            fingerprint=hashlib.sha1(json.dumps(thresholds, sort_keys=True).encode()).hexdigest()[:16],
+        )
+        self._compiled[cache_key] = compiled
+        while len(self._compiled) > self._max_compiled:
+            self._compiled.popitem(last=False)
+        return compiled
+
+
+class CustomProfileStore:
+    """
+    Perfis de cultura personalizados no Redis (hash nome -> limites em JSON). Cada gravação incrementa
+    uma versão; os processos da API e do worker consultam a versão periodicamente e recarregam os
+    perfis no registro quando ela muda, sem reinício.
+    """
+
+    def __init__(self, registry: ProfileRegistry):
+        self._registry = registry
+        self._redis = None
+        self._version = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, redis, reload_seconds: float):
+        self._redis = redis
+        await self.reload()
+        self._task = asyncio.create_task(self._watch(reload_seconds))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _watch(self, reload_seconds: float):
+        while True:
+            await asyncio.sleep(reload_seconds)
+            try:
+                await self.reload()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Erro ao recarregar perfis de cultura personalizados: {e}")
+
+    async def reload(self, force: bool = False):
+        """Recarrega os perfis personalizados se a versão no Redis mudou."""
+        version = await self._redis.get(CUSTOM_PROFILES_VERSION_KEY)
+        if version == self._version and not force:
+            return
+        raw_profiles = await self._redis.hgetall(CUSTOM_PROFILES_KEY)
+        profiles = {}
+        for name, raw in raw_profiles.items():
+            name = name.decode() if isinstance(name, bytes) else name
+            profiles[name] = json.loads(raw)
+        self._registry.set_custom(profiles)
+        self._version = version
+        print(f"Perfis de cultura personalizados carregados: {len(profiles)}.")
+
+    async def put(self, name: str, values: Dict[str, Any]):
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hset(CUSTOM_PROFILES_KEY, name, json.dumps(values))
+            pipe.incr(CUSTOM_PROFILES_VERSION_KEY)
+            await pipe.execute()
+        await self.reload(force=True)
+
+    async def remove(self, name: str) -> bool:
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hdel(CUSTOM_PROFILES_KEY, name)
+            pipe.incr(CUSTOM_PROFILES_VERSION_KEY)
+            removed, _ = await pipe.execute()
+        await self.reload(force=True)
+        return bool(removed)
@@ -0,0 +1,151 @@
+import asyncio
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional, Union
+
+from .config import settings
+from .metrics import RATE_LIMIT_REJECTED, RATE_LIMIT_WAIT
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+# Balde de tokens compartilhado (Redis), reabastecido continuamente pelo relógio do próprio Redis,
+# para que todos os processos vejam o mesmo tempo. ARGV: taxa (tokens/ms), capacidade e a reserva:
+# quantos tokens precisam sobrar após a retirada. Retorna {liberado (0/1), espera sugerida em ms}.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local reserve = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if tokens - 1 >= reserve then
+  tokens = tokens - 1
+  allowed = 1
+else
+  wait = math.ceil((reserve + 1 - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate) + 1000)
+return {allowed, wait}
+"""
+
+class SharedPriority:
+    """
+    Prioridade de uma busca compartilhada por várias requisições (single-flight do cache): começa com a
+    prioridade de quem criou a busca e sobe para INTERACTIVE assim que uma requisição interativa passa a aguardá-la.
+    """
+
+    def __init__(self, priority: str):
+        self.priority = priority
+
+    def join(self, priority: str):
+        if priority == INTERACTIVE:
+            self.priority = INTERACTIVE
+
+
+_priority: ContextVar[Union[str, SharedPriority, None]] = ContextVar("upstream_priority", default=None)
+_default_priority = INTERACTIVE
+
+
+class RateLimitExceeded(Exception):
+    """A chamada ao provedor esperaria além do tempo máximo de fila da sua prioridade."""
+
+
+def set_default_priority(priority: str):
+    """Define a prioridade padrão do processo (o worker usa BACKGROUND; a API, INTERACTIVE)."""
+    global _default_priority
+    _default_priority = priority
+
+
+def current_priority() -> str:
+    priority = _priority.get()
+    if isinstance(priority, SharedPriority):
+        return priority.priority
+    return priority or _default_priority
+
+
+@contextmanager
+def upstream_priority(priority: str):
+    """Define a prioridade das chamadas a provedores feitas dentro do bloco (e das tarefas criadas nele)."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+@contextmanager
+def shared_priority() -> Iterator[SharedPriority]:
+    """
+    Como upstream_priority, mas a prioridade das tarefas criadas no bloco pode ser elevada depois,
+    com SharedPriority.join, por quem passar a aguardar o resultado delas.
+    """
+    holder = SharedPriority(current_priority())
+    token = _priority.set(holder)
+    try:
+        yield holder
+    finally:
+        _priority.reset(token)
+
+
+class UpstreamRateLimiter:
+    """
+    Limitador de taxa por provedor compartilhado por todos os processos da API e do worker (Redis).
+    Chamadas em BACKGROUND não podem consumir a reserva de tokens das chamadas INTERACTIVE.
+    Sem token disponível, a chamada aguarda na fila até o tempo máximo da sua prioridade.
+    """
+
+    def __init__(self):
+        self._redis = None
+        self._script = None
+
+    def bind_redis(self, redis):
+        self._redis = redis
+        self._script = redis.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def acquire(self, provider: str, max_wait: Optional[float] = None):
+        """
+        Aguarda um token do provedor; levanta RateLimitExceeded se a espera passar do tempo máximo
+        da prioridade atual (ou de 'max_wait', se menor).
+        """
+        limit_per_minute = settings.UPSTREAM_RATE_LIMITS.get(provider, 0)
+        if not limit_per_minute or self._script is None:
+            return
+
+        rate = limit_per_minute / 60000 # tokens por ms
+        capacity = max(1.0, limit_per_minute / 60 * settings.RATE_LIMIT_BURST_SECONDS)
+
+        start = time.monotonic()
+        while True:
+            # Relida a cada tentativa: uma busca compartilhada sobe de prioridade quando uma requisição interativa passa a aguardá-la
+            priority = current_priority()
+            reserve = capacity * settings.RATE_LIMIT_INTERACTIVE_RESERVE if priority == BACKGROUND else 0
+            priority_wait = settings.RATE_LIMIT_BACKGROUND_MAX_WAIT_SECONDS if priority == BACKGROUND else settings.RATE_LIMIT_INTERACTIVE_MAX_WAIT_SECONDS
+            wait_limit = priority_wait if max_wait is None else min(priority_wait, max_wait)
+            try:
+                allowed, wait_ms = await self._script(keys=[f"ratelimit:{provider}"], args=[rate, capacity, reserve])
+            except Exception as e:
+                # Sem Redis o limitador não bloqueia: melhor arriscar um 429 do que derrubar a API
+                print(f"Erro no limitador de taxa do provedor '{provider}': {e}")
+                return
+            waited = time.monotonic() - start
+            if allowed:
+                RATE_LIMIT_WAIT.labels(provider, priority).observe(waited)
+                return
+            # Pequena variação aleatória para que os processos em espera não voltem todos juntos
+            delay = wait_ms / 1000 * (1 + random.random() * 0.2)
+            if waited + delay > wait_limit:
+                RATE_LIMIT_REJECTED.labels(provider, priority).inc()
+                raise RateLimitExceeded(provider)
+            await asyncio.sleep(delay)
+
+
+upstream_rate_limiter = UpstreamRateLimiter()
@@ -0,0 +1,68 @@
+import time
+from typing import Dict
+
+from .config import settings
+from .http_client import DEFAULT_PROVIDERS
+from .metrics import CIRCUIT_STATE_CHANGES
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Disjuntor por provedor (por processo). Após 'failure_threshold' falhas seguidas o circuito abre
+    e as chamadas falham na hora, sem aguardar o provedor; passados 'recovery_seconds', uma única
+    chamada de teste é liberada (meio-aberto) e o resultado dela fecha ou reabre o circuito.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, recovery_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def _transition(self, state: str):
+        if state != self.state:
+            self.state = state
+            CIRCUIT_STATE_CHANGES.labels(self.name, state).inc()
+            print(f"Circuito do provedor '{self.name}': {state}.")
+
+    def allow(self) -> bool:
+        """Indica se uma chamada ao provedor pode ser feita agora."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.recovery_seconds:
+                return False
+            self._transition(HALF_OPEN)
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def record_success(self):
+        self._failures = 0
+        self._probe_in_flight = False
+        self._transition(CLOSED)
+
+    def release(self):
+        """Libera a chamada de teste sem registrar resultado (ex.: chamada cancelada pelo cliente)."""
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self._probe_in_flight = False
+        self._failures += 1
+        if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+            self._transition(OPEN)
+
+
+provider_breakers: Dict[str, CircuitBreaker] = {
+    provider: CircuitBreaker(provider, settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RECOVERY_SECONDS)
+    for provider in DEFAULT_PROVIDERS
+}
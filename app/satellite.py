@@ -0,0 +1,131 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import ee
+
+from . import tracing
+
+# Coleção Sentinel-2 (reflectância de superfície) usada para o NDVI
+S2_COLLECTION = 'COPERNICUS/S2_SR'
+NDVI_BUFFER_METERS = 100 # Buffer ao redor do ponto para a média do NDVI
+THUMBNAIL_BUFFER_METERS = 500
+
+Point = Tuple[float, float] # (lat, lon)
+
+
+# --- Chamadas ao Earth Engine (bloqueantes, executadas no pool de threads do worker) ---
+
+def find_best_scenes(points: List[Point], start_date: str, end_date: str) -> List[Optional[Dict[str, Any]]]:
+    """
+    Encontra, para cada ponto, a cena Sentinel-2 menos nublada no período, em uma única chamada.
+    Retorna por ponto {"scene_id", "cloudy_pixel_percentage", "time_start"} ou None se não houver cena.
+    """
+    features = ee.FeatureCollection([
+        ee.Feature(ee.Geometry.Point(lon, lat), {"idx": i}) for i, (lat, lon) in enumerate(points)
+    ])
+    collection = ee.ImageCollection(S2_COLLECTION).filterDate(start_date, end_date)
+
+    def best_scene(feature):
+        candidates = collection.filterBounds(feature.geometry()).sort('CLOUDY_PIXEL_PERCENTAGE')
+        image = candidates.first()
+        return feature.set(ee.Algorithms.If(
+            candidates.size().gt(0),
+            ee.Dictionary({
+                "scene_id": image.get('system:index'),
+                "cloudy_pixel_percentage": image.get('CLOUDY_PIXEL_PERCENTAGE'),
+                "time_start": image.get('system:time_start'),
+            }),
+            ee.Dictionary({"scene_id": None}),
+        ))
+
+    scenes: List[Optional[Dict[str, Any]]] = [None] * len(points)
+    for feature in features.map(best_scene).getInfo()["features"]:
+        properties = feature["properties"]
+        if properties.get("scene_id"):
+            scenes[properties["idx"]] = {
+                "scene_id": properties["scene_id"],
+                "cloudy_pixel_percentage": properties.get("cloudy_pixel_percentage"),
+                "time_start": properties.get("time_start"),
+            }
+    return scenes
+
+
+def reduce_scene_ndvi(scene_id: str, points: List[Point]) -> List[Optional[float]]:
+    """Calcula o NDVI médio de vários pontos de uma mesma cena com um único reduceRegions."""
+    image = ee.Image(f"{S2_COLLECTION}/{scene_id}")
+    ndvi = image.normalizedDifference(['B8', 'B4']).rename('NDVI')
+    buffers = ee.FeatureCollection([
+        ee.Feature(ee.Geometry.Point(lon, lat).buffer(NDVI_BUFFER_METERS), {"idx": i}) for i, (lat, lon) in enumerate(points)
+    ])
+    reduced = ndvi.reduceRegions(collection=buffers, reducer=ee.Reducer.mean(), scale=10).getInfo()
+
+    values: List[Optional[float]] = [None] * len(points)
+    for feature in reduced["features"]:
+        properties = feature["properties"]
+        values[properties["idx"]] = properties.get("mean")
+    return values
+
+
+def thumbnail_url(scene_id: str, lat: float, lon: float) -> str:
+    """Gera a URL do thumbnail RGB da cena ao redor do ponto."""
+    image = ee.Image(f"{S2_COLLECTION}/{scene_id}")
+    return image.getThumbUrl({
+        'bands': ['B4', 'B3', 'B2'], # RGB
+        'min': 0,
+        'max': 3000,
+        'region': ee.Geometry.Point(lon, lat).buffer(THUMBNAIL_BUFFER_METERS).bounds()
+    })
+
+
+# --- Agrupamento de jobs ---
+
+class NDVIBatcher:
+    """
+    Acumula pedidos de NDVI por uma janela curta e os processa juntos, para que uma carteira
+    de fazendas gere poucas chamadas ao Earth Engine em vez de várias por fazenda.
+    """
+
+    def __init__(self, compute_batch: Callable[[List[Point]], Awaitable[List[Dict[str, Any]]]], window_seconds: float, max_batch_size: int):
+        self._compute_batch = compute_batch
+        self._window_seconds = window_seconds
+        self._max_batch_size = max_batch_size
+        self._pending: List[Tuple[Point, asyncio.Future, Any]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running: set = set()
+
+    async def submit(self, lat: float, lon: float) -> Dict[str, Any]:
+        """Adiciona um ponto ao lote atual e aguarda o resultado correspondente."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # O link associa o span do lote ao span do job que pediu este ponto
+        self._pending.append(((lat, lon), future, tracing.current_link()))
+        if len(self._pending) >= self._max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self._window_seconds, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: List[Tuple[Point, asyncio.Future, Any]]):
+        # Um lote atende jobs de vários traces: o span do lote inicia um trace próprio, ligado a eles
+        links = [link for _, _, link in batch if link is not None]
+        try:
+            with tracing.span("ndvi.batch", {"ndvi.batch_size": len(batch)}, links=links, root=True):
+                results = await self._compute_batch([point for point, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,80 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from .jobs import SATELLITE_RESULT_CHANNEL_PREFIX
+
+
+class SatelliteResultHub:
+    """
+    Recebe as notificações de conclusão das análises de satélite (Redis pub/sub) e as entrega
+    aos clientes aguardando cada tarefa. Uma única assinatura por processo da API atende todos
+    os clientes conectados, em vez de uma conexão Redis por cliente.
+    """
+
+    def __init__(self):
+        self._waiters: Dict[str, Set[asyncio.Future]] = {}
+        self._redis = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, redis):
+        self._redis = redis
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self):
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.psubscribe(f"{SATELLITE_RESULT_CHANNEL_PREFIX}*")
+                async for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    channel = message["channel"]
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    self._notify(channel[len(SATELLITE_RESULT_CHANNEL_PREFIX):], message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Erro na assinatura de resultados de satélite: {e}. Reconectando...")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def _notify(self, task_id: str, data):
+        for future in self._waiters.pop(task_id, ()):
+            if not future.done():
+                future.set_result(data)
+
+    async def wait(self, task_id: str, timeout: float, check: Callable[[], Awaitable[Optional[bytes]]]) -> Optional[bytes]:
+        """
+        Aguarda o resultado da tarefa por até 'timeout' segundos. 'check' lê o resultado já
+        armazenado; ele é chamado depois de registrar a espera, para não perder uma conclusão
+        que aconteça entre a leitura e a assinatura.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(task_id, set()).add(future)
+        try:
+            result = await check()
+            if result:
+                return result
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            waiters = self._waiters.get(task_id)
+            if waiters is not None:
+                waiters.discard(future)
+                if not waiters:
+                    del self._waiters[task_id]
+
+
+satellite_results = SatelliteResultHub()
@@ -1,4 +1,5 @@
 from pydantic import BaseModel, Field
+from datetime import date, datetime
 from typing import Optional, List, Dict, Any
 
 class FarmLocation(BaseModel):
@@ -7,41 +8,53 @@ class FarmLocation(BaseModel):
 
 class AnalysisConfig(BaseModel):
     crop_profile: Optional[str] = None
+    planting_date: Optional[date] = Field(None, description="Data de plantio. Se informada, o GDD é acumulado desde ela, em vez de apenas nos últimos 5 dias.")
+
+    # Limites omitidos (None) vêm do perfil 'crop_profile' (ou do perfil 'default'); o "Padrão" das descrições é o do 'default'
 
     # Pulverização
-    wind_speed_threshold_ms: float = Field(2.8, description="Limite de velocidade do vento para pulverização em m/s (aprox. 10 km/h)")
-    precipitation_prob_threshold: float = Field(0.1, description="Probabilidade máxima de chuva para pulverização (0.0 a 1.0)")
+    wind_speed_threshold_ms: Optional[float] = Field(None, description="Limite de velocidade do vento para pulverização em m/s (aprox. 10 km/h). Padrão: 2.8")
+    precipitation_prob_threshold: Optional[float] = Field(None, description="Probabilidade máxima de chuva para pulverização (0.0 a 1.0). Padrão: 0.1")
 
     # Risco Fúngico
-    fungal_risk_humidity: float = Field(80, description="Umidade relativa mínima para risco fúngico (%)")
-    fungal_risk_temp_min: float = Field(18, description="Temperatura mínima para risco fúngico (°C)")
-    fungal_risk_temp_max: float = Field(26, description="Temperatura máxima para risco fúngico (°C)")
+    fungal_risk_humidity: Optional[float] = Field(None, description="Umidade relativa mínima para risco fúngico (%). Padrão: 80")
+    fungal_risk_temp_min: Optional[float] = Field(None, description="Temperatura mínima para risco fúngico (°C). Padrão: 18")
+    fungal_risk_temp_max: Optional[float] = Field(None, description="Temperatura máxima para risco fúngico (°C). Padrão: 26")
 
     # Geada
-    frost_temp_threshold: float = Field(2, description="Temperatura limite para alerta de geada (°C)")
+    frost_temp_threshold: Optional[float] = Field(None, description="Temperatura limite para alerta de geada (°C). Padrão: 2")
 
     # Estresse por Calor
-    heat_stress_temp_threshold: float = Field(32, description="Temperatura limite para estresse por calor (°C)")
+    heat_stress_temp_threshold: Optional[float] = Field(None, description="Temperatura limite para estresse por calor (°C). Padrão: 32")
 
     # Plantio
-    planting_temp_min: float = Field(18, description="Temperatura mínima ideal para plantio (°C)")
-    planting_temp_max: float = Field(30, description="Temperatura máxima ideal para plantio (°C)")
-    planting_rain_prob_threshold: float = Field(0.3, description="Probabilidade mínima de chuva para plantio (0.0 a 1.0)")
+    planting_temp_min: Optional[float] = Field(None, description="Temperatura mínima ideal para plantio (°C). Padrão: 18")
+    planting_temp_max: Optional[float] = Field(None, description="Temperatura máxima ideal para plantio (°C). Padrão: 30")
+    planting_rain_prob_threshold: Optional[float] = Field(None, description="Probabilidade mínima de chuva para plantio (0.0 a 1.0). Padrão: 0.3")
 
     # Colheita
-    harvest_rain_prob_threshold: float = Field(0.1, description="Probabilidade máxima de chuva para colheita (0.0 a 1.0)")
-    harvest_humidity_threshold: float = Field(70, description="Umidade máxima para colheita (%)")
+    harvest_rain_prob_threshold: Optional[float] = Field(None, description="Probabilidade máxima de chuva para colheita (0.0 a 1.0). Padrão: 0.1")
+    harvest_humidity_threshold: Optional[float] = Field(None, description="Umidade máxima para colheita (%). Padrão: 70")
 
     # Irrigação
-    irrigation_no_rain_threshold: float = Field(0.05, description="Probabilidade máxima de chuva para recomendação de irrigação (0.0 a 1.0)")
-    irrigation_temp_threshold: float = Field(25, description="Temperatura mínima para recomendação de irrigação (°C)")
-    irrigation_min_hours: float = Field(24, description="Duração mínima em horas para recomendação de irrigação")
+    irrigation_no_rain_threshold: Optional[float] = Field(None, description="Probabilidade máxima de chuva para recomendação de irrigação (0.0 a 1.0). Padrão: 0.05")
+    irrigation_temp_threshold: Optional[float] = Field(None, description="Temperatura mínima para recomendação de irrigação (°C). Padrão: 25")
+    irrigation_min_hours: Optional[float] = Field(None, description="Duração mínima em horas para recomendação de irrigação. Padrão: 24")
 
     # GDD
-    gdd_base_temp: float = Field(10, description="Temperatura base para cálculo de Graus-Dia (°C)")
+    gdd_base_temp: Optional[float] = Field(None, description="Temperatura base para cálculo de Graus-Dia (°C). Padrão: 10")
 
     # Geral
-    min_window_hours: float = Field(12, description="Duração mínima em horas para uma janela ser considerada válida (geral)")
+    min_window_hours: Optional[float] = Field(None, description="Duração mínima em horas para uma janela ser considerada válida (geral). Padrão: 12")
+
+class InsightRequest(FarmLocation, AnalysisConfig):
+    """Corpo de POST /insights/: a localização e, no mesmo nível, os parâmetros opcionais de AnalysisConfig."""
+
+    def location(self) -> FarmLocation:
+        return FarmLocation(lat=self.lat, lon=self.lon)
+
+    def config(self) -> AnalysisConfig:
+        return AnalysisConfig(**self.model_dump(exclude=set(FarmLocation.model_fields)))
 
 
 # --- Modelos para a Resposta dos Insights ---
@@ -139,8 +152,56 @@ class DemeterInsight(BaseModel):
     gdd_insight: GDDInsight
     satellite_analysis: SatelliteAnalysis
     ndvi_insight: NDVIInsight
+    precomputed_at: Optional[datetime] = Field(None, description="Momento do pré-cálculo, quando o insight vem do cadastro de fazendas.")
+    forecast_stale: bool = Field(False, description="A previsão é a última válida em cache, servida porque o provedor está com falha.")
+    forecast_fetched_at: Optional[datetime] = Field(None, description="Momento em que a previsão desatualizada foi obtida do provedor.")
+    snapshot_id: Optional[str] = Field(None, description="Identificador dos dados usados na análise, para recalculá-la com outros limites em POST /insights/recompute.")
+
+class InsightRecomputeRequest(BaseModel):
+    snapshot_id: str
+    config: AnalysisConfig = Field(default_factory=AnalysisConfig)
+
+class ProfileComparisonRequest(BaseModel):
+    location: FarmLocation
+    profiles: Optional[List[str]] = Field(None, description="Perfis de cultura a avaliar. Se omitido, avalia todos os perfis disponíveis.")
+    overrides: Dict[str, float] = Field(default_factory=dict, description="Limites fornecidos explicitamente, aplicados sobre todos os perfis (ex.: {\"min_window_hours\": 24}).")
+
+class CropProfile(BaseModel):
+    name: str
+    builtin: bool = Field(description="Perfil embutido na aplicação (não pode ser alterado pela API).")
+    thresholds: Dict[str, float] = Field(description="Limites completos do perfil; os não informados vêm do perfil 'default'.")
+
+class ProfileComparisonInsight(BaseModel):
+    profiles: Dict[str, DemeterInsight]
+
+class BatchInsightItem(BaseModel):
+    location: FarmLocation
+    config: Optional[AnalysisConfig] = None
+    farm_id: Optional[str] = Field(None, description="Identificador da fazenda, devolvido no resultado correspondente.")
+
+class BatchInsightRequest(BaseModel):
+    items: List[BatchInsightItem]
+
+class BatchInsightResult(BaseModel):
+    index: int
+    farm_id: Optional[str] = None
+    insight: Optional[DemeterInsight] = None
+    error: Optional[str] = None
+
+class BatchInsightResponse(BaseModel):
+    results: List[BatchInsightResult]
 
 class Feedback(BaseModel):
     name: Optional[str] = None
     email: Optional[str] = None
     message: str
+
+class FarmRegistration(BaseModel):
+    farm_id: Optional[str] = Field(None, description="Identificador da fazenda. Se omitido, um novo é gerado; se existente, o cadastro é atualizado.")
+    location: FarmLocation
+    config: Optional[AnalysisConfig] = None
+
+class Farm(BaseModel):
+    farm_id: str
+    location: FarmLocation
+    config: AnalysisConfig
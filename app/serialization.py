@@ -0,0 +1,126 @@
+import json
+from datetime import date, datetime, timezone
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, List, Optional
+
+from pydantic import BaseModel
+
+from .metrics import timed
+from .schemas import DemeterInsight
+
+try:
+    import orjson
+except ImportError:  # Sem orjson, a codificação usa o módulo json da biblioteca padrão
+    orjson = None
+
+JSON_MEDIA_TYPE = "application/json"
+
+# Campos de DemeterInsight que aceitam datas em epoch (como 'fetched_at' do cache de previsões)
+_DATETIME_FIELDS = ("precomputed_at", "forecast_fetched_at")
+
+
+def _section_defaults(model) -> Optional[Dict[str, Any]]:
+    """Campos opcionais de uma seção do insight com seus valores padrão (None se o campo não for um modelo)."""
+    if not (isinstance(model, type) and issubclass(model, BaseModel)):
+        return None
+    return {name: field.default for name, field in model.model_fields.items() if not field.is_required()}
+
+
+# Estrutura de DemeterInsight pré-calculada: campo -> padrões da seção (None para campos simples)
+_INSIGHT_SECTIONS = {name: _section_defaults(field.annotation) for name, field in DemeterInsight.model_fields.items()}
+_INSIGHT_DEFAULTS = {name: field.default for name, field in DemeterInsight.model_fields.items() if not field.is_required()}
+_SECTION_FIELDS = {name: frozenset(DemeterInsight.model_fields[name].annotation.model_fields) for name, defaults in _INSIGHT_SECTIONS.items() if defaults is not None}
+INSIGHT_FIELDS: FrozenSet[str] = frozenset(_INSIGHT_SECTIONS)
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat().replace("+00:00", "Z")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, MappingProxyType):
+        return dict(value)
+    if hasattr(value, "item"):  # Escalares numpy do motor vetorizado
+        return value.item()
+    raise TypeError(f"Tipo não serializável em JSON: {type(value).__name__}")
+
+
+def dumps(data: Any) -> bytes:
+    """Codifica em JSON compacto (UTF-8), com orjson quando disponível."""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_UTC_Z | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def parse_fields(fields: Optional[str]) -> Optional[FrozenSet[str]]:
+    """
+    Interpreta o parâmetro 'fields' (seções separadas por vírgula, ex.: "frost_alert,gdd_insight").
+    Retorna None se não houver seleção; levanta ValueError com as seções desconhecidas.
+    """
+    if not fields:
+        return None
+    selected = frozenset(name.strip() for name in fields.split(",") if name.strip())
+    unknown = selected - INSIGHT_FIELDS
+    if unknown:
+        raise ValueError(f"Campos desconhecidos: {', '.join(sorted(unknown))}. Disponíveis: {', '.join(sorted(INSIGHT_FIELDS))}.")
+    return selected or None
+
+
+def columnar(details: List[Any]) -> Any:
+    """
+    Converte uma lista de períodos (dicionários com as mesmas chaves) em {"columns": [...], "rows": [[...]]},
+    sem repetir os nomes das chaves em cada período. Listas de janelas (listas de períodos) são convertidas janela a janela.
+    """
+    if not details:
+        return details
+    first = details[0]
+    if isinstance(first, list):
+        return [columnar(window) for window in details]
+    if not isinstance(first, dict):
+        return details
+    columns = list(first)
+    return {"columns": columns, "rows": [[period.get(column) for column in columns] for period in details]}
+
+
+def _section(name: str, value: Any, compact: bool, details: bool) -> Any:
+    defaults = _INSIGHT_SECTIONS[name]
+    if defaults is None or not isinstance(value, dict):
+        if name in _DATETIME_FIELDS and isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value, timezone.utc)
+        return value
+
+    # Mesma forma que o response_model produziria: apenas os campos declarados, com os padrões preenchidos
+    allowed = _SECTION_FIELDS[name]
+    section = {**defaults, **{key: item for key, item in value.items() if key in allowed}}
+    if "details" in section:
+        if not details:
+            del section["details"]
+        elif compact and isinstance(section["details"], list):
+            section["details"] = columnar(section["details"])
+    if compact:
+        section.pop("explanation_text", None)
+    return section
+
+
+def insight_payload(insights: Dict[str, Any], fields: Optional[FrozenSet[str]] = None, compact: bool = False, details: bool = True) -> Dict[str, Any]:
+    """
+    Prepara um insight do motor de análise para a resposta, sem revalidá-lo com pydantic: o resultado do
+    motor (ou do cache de pré-cálculo) já segue DemeterInsight, então basta projetá-lo nos campos do modelo.
+    'fields' restringe as seções; 'compact' codifica os 'details' em colunas e omite textos explicativos;
+    'details=False' omite os 'details' de todas as seções.
+    """
+    payload = {}
+    for name in _INSIGHT_SECTIONS:
+        if fields is not None and name not in fields:
+            continue
+        if name in insights:
+            payload[name] = _section(name, insights[name], compact, details)
+        elif name in _INSIGHT_DEFAULTS:
+            payload[name] = _INSIGHT_DEFAULTS[name]
+    return payload
+
+
+def encode_insight(insights: Dict[str, Any], fields: Optional[FrozenSet[str]] = None, compact: bool = False, details: bool = True) -> bytes:
+    """Projeta e codifica um insight, medido como a etapa 'serialization' (histograma e Server-Timing)."""
+    with timed("serialization"):
+        return dumps(insight_payload(insights, fields, compact, details))
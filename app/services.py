@@ -1,15 +1,164 @@
+import asyncio
+import time
 import httpx
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, Optional
 from .config import settings
-from datetime import datetime, timedelta
+from .http_client import upstream_clients, OPENWEATHER, OPEN_METEO
+from .cache import TwoTierCache, snap_to_grid
+from .metrics import timed_upstream
+from . import tracing
+from .resilience import provider_breakers
+from .rate_limit import RateLimitExceeded, upstream_rate_limiter
+from .decoding import InvalidPayloadError, decode_daily, decode_forecast
+from datetime import date
 
-# Documentação da API 5 day / 3 hour: https://openweathermap.org/forecast5
-FORECAST_API_URL = "http://api.openweathermap.org/data/2.5/forecast"
-HISTORICAL_API_URL = "https://api.open-meteo.com/v1/forecast"
+# Cache da previsão por célula de grade (memória + Redis), com TTL alinhado à atualização do provedor
+forecast_cache = TwoTierCache(
+    namespace="forecast",
+    cadence_seconds=settings.FORECAST_CACHE_CADENCE_SECONDS,
+    max_entries=settings.FORECAST_CACHE_MAX_ENTRIES,
+    stale_seconds=settings.FORECAST_STALE_SECONDS,
+    refresh_attempts=settings.FORECAST_REFRESH_ATTEMPTS,
+    retry_backoff_seconds=settings.FORECAST_REFRESH_BACKOFF_SECONDS,
+)
+
+
+class ProviderUnavailableError(Exception):
+    """O circuito do provedor está aberto: a chamada nem é feita."""
+
+
+async def call_provider(provider: str, url: str, params: dict, budget_seconds: float) -> httpx.Response:
+    """
+    Chama um provedor externo respeitando o disjuntor, o limite de taxa compartilhado e um orçamento
+    de latência total, que inclui a espera na fila do limitador: uma espera que esgotaria o orçamento
+    levanta RateLimitExceeded, e a chamada em si só dispõe do que sobrar dele.
+    Timeouts, erros de rede e respostas 5xx/429 contam como falha do provedor; outros 4xx não.
+    """
+    breaker = provider_breakers[provider]
+    if not breaker.allow():
+        raise ProviderUnavailableError(provider)
+
+    client = upstream_clients.get(provider)
+    start = time.monotonic()
+    try:
+        await upstream_rate_limiter.acquire(provider, max_wait=budget_seconds)
+    except BaseException:
+        breaker.release()
+        raise
+    remaining = budget_seconds - (time.monotonic() - start)
+
+    try:
+        with timed_upstream(provider), tracing.span(f"upstream.{provider}"):
+            response = await asyncio.wait_for(client.get(url, params=params), max(remaining, 0.0))
+            response.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code >= 500 or e.response.status_code == 429:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        raise
+    except asyncio.CancelledError:
+        breaker.release()
+        raise
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    return response
+
+
+@dataclass(frozen=True, slots=True)
+class ProviderErrors:
+    """Mensagens de erro devolvidas (e nome usado nos logs) quando a chamada a um provedor falha."""
+    label: str
+    invalid: str
+    unavailable: str
+    rate_limited: str
+    timeout: str
+    status: str # Formatada com o código HTTP em {status}
+    unexpected: str
+    context: str = "" # Complemento do log de erro inesperado (ex.: " ao buscar dados históricos")
+    unauthorized: Optional[str] = None # Mensagem específica para 401, se houver
+
+
+FORECAST_ERRORS = ProviderErrors(
+    label="OpenWeatherMap",
+    invalid="Formato de dados de previsão inválido.",
+    unavailable="O provedor de previsão do tempo está indisponível no momento. Tente novamente em instantes.",
+    rate_limited="Limite de consultas ao provedor de previsão do tempo atingido. Tente novamente em instantes.",
+    timeout="O provedor de previsão do tempo não respondeu a tempo.",
+    status="Não foi possível obter os dados do tempo (Erro: {status}).",
+    unexpected="Ocorreu um erro inesperado no servidor.",
+    # O erro 401 especificamente pode ser um problema de chave ou de plano
+    unauthorized="Chave de API inválida ou não autorizada. Verifique o arquivo .env e as permissões da sua chave no site do OpenWeatherMap.",
+)
+HISTORICAL_ERRORS = ProviderErrors(
+    label="Open-Meteo",
+    invalid="Formato de dados históricos inválido.",
+    unavailable="O provedor de dados históricos está indisponível no momento.",
+    rate_limited="Limite de consultas ao provedor de dados históricos atingido.",
+    timeout="O provedor de dados históricos não respondeu a tempo.",
+    status="Não foi possível obter os dados históricos do tempo (Erro: {status}).",
+    unexpected="Ocorreu um erro inesperado no servidor ao buscar dados históricos.",
+    context=" ao buscar dados históricos",
+)
+DAILY_ERRORS = replace(
+    HISTORICAL_ERRORS,
+    status="Não foi possível obter as temperaturas diárias (Erro: {status}).",
+    unexpected="Ocorreu um erro inesperado no servidor ao buscar temperaturas diárias.",
+    context=" ao buscar temperaturas diárias",
+)
+
+
+async def fetch_decoded(provider: str, url: str, params: dict, budget_seconds: float, decode: Callable[[bytes], Dict[str, Any]], errors: ProviderErrors) -> dict:
+    """Chama o provedor (ver call_provider) e decodifica a resposta; falhas viram {"error": ...} com as mensagens de 'errors'."""
+    try:
+        response = await call_provider(provider, url, params, budget_seconds)
+        return decode(response.content)
+    except InvalidPayloadError as e:
+        print(f"Resposta inesperada da API do {errors.label}: {e}")
+        return {"error": errors.invalid}
+    except ProviderUnavailableError:
+        return {"error": errors.unavailable}
+    except RateLimitExceeded:
+        return {"error": errors.rate_limited}
+    except asyncio.TimeoutError:
+        print(f"Tempo limite excedido ao chamar a API do {errors.label}.")
+        return {"error": errors.timeout}
+    except httpx.HTTPStatusError as e:
+        print(f"Erro ao chamar a API do {errors.label}: {e}")
+        if e.response.status_code == 401 and errors.unauthorized:
+            return {"error": errors.unauthorized}
+        return {"error": errors.status.format(status=e.response.status_code)}
+    except Exception as e:
+        print(f"Ocorreu um erro inesperado{errors.context}: {e}")
+        return {"error": errors.unexpected}
+
+
+def forecast_cell(lat: float, lon: float) -> tuple:
+    """Retorna o centro da célula de grade usada como chave do cache de previsão."""
+    return snap_to_grid(lat, lon, settings.FORECAST_CACHE_GRID_DEG)
 
 
 async def get_forecast_data(lat: float, lon: float) -> dict:
+    """
+    Busca a previsão do tempo para a célula de grade que contém o ponto, usando o cache
+    de previsão. Requisições simultâneas para a mesma célula geram uma única chamada externa.
+    Se o provedor falhar, a última previsão válida da célula é servida marcada com "stale": True.
+    """
+    if not settings.FORECAST_CACHE_ENABLED:
+        return await fetch_forecast_data(lat, lon)
+
+    cell_lat, cell_lon = forecast_cell(lat, lon)
+    key = f"{settings.FORECAST_CACHE_GRID_DEG}:{cell_lat:.6f}:{cell_lon:.6f}"
+    return await forecast_cache.get_or_fetch(key, lambda: fetch_forecast_data(cell_lat, cell_lon))
+
+
+async def fetch_forecast_data(lat: float, lon: float) -> dict:
     """
     Busca dados de previsão do tempo (5 dias, de 3 em 3 horas) da API OpenWeatherMap.
+    A resposta é reduzida aos campos usados pela análise (ver app.decoding).
     """
     params = {
         "lat": lat,
@@ -19,20 +168,7 @@ async def get_forecast_data(lat: float, lon: float) -> dict:
         "lang": "pt_br",
     }
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(FORECAST_API_URL, params=params)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            print(f"Erro ao chamar a API do OpenWeatherMap: {e}")
-            # O erro 401 especificamente pode ser um problema de chave ou de plano
-            if e.response.status_code == 401:
-                return {"error": "Chave de API inválida ou não autorizada. Verifique o arquivo .env e as permissões da sua chave no site do OpenWeatherMap."}
-            return {"error": f"Não foi possível obter os dados do tempo (Erro: {e.response.status_code})."}
-        except Exception as e:
-            print(f"Ocorreu um erro inesperado: {e}")
-            return {"error": "Ocorreu um erro inesperado no servidor."}
+    return await fetch_decoded(OPENWEATHER, settings.FORECAST_API_URL, params, settings.FORECAST_LATENCY_BUDGET_SECONDS, decode_forecast, FORECAST_ERRORS)
 
 async def get_historical_weather_data(lat: float, lon: float, days: int = 5) -> dict:
     """
@@ -47,14 +183,20 @@ async def get_historical_weather_data(lat: float, lon: float, days: int = 5) ->
         "timezone": "auto"
     }
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(HISTORICAL_API_URL, params=params)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            print(f"Erro ao chamar a API do Open-Meteo: {e}")
-            return {"error": f"Não foi possível obter os dados históricos do tempo (Erro: {e.response.status_code})."}
-        except Exception as e:
-            print(f"Ocorreu um erro inesperado ao buscar dados históricos: {e}")
-            return {"error": "Ocorreu um erro inesperado no servidor ao buscar dados históricos."}
+    return await fetch_decoded(OPEN_METEO, settings.HISTORICAL_API_URL, params, settings.HISTORICAL_LATENCY_BUDGET_SECONDS, decode_daily, HISTORICAL_ERRORS)
+
+async def get_daily_temperatures(lat: float, lon: float, start_date: date, end_date: date) -> dict:
+    """
+    Busca as temperaturas diárias (máx e mín) de 'start_date' a 'end_date', inclusive.
+    Usada para preencher e estender a série do GDD desde o plantio (app.gdd_store).
+    """
+    params = {
+        "latitude": lat,
+        "longitude": lon,
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "daily": "temperature_2m_max,temperature_2m_min",
+        "timezone": "auto"
+    }
+
+    return await fetch_decoded(OPEN_METEO, settings.GDD_HISTORY_API_URL, params, settings.HISTORICAL_LATENCY_BUDGET_SECONDS, decode_daily, DAILY_ERRORS)
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .gdd_store import DailyTemperatureSeries
+from .metrics import CACHE_REQUESTS
+
+
+class InsightSnapshotStore:
+    """
+    Dados usados em uma análise de /insights/ (previsão, histórico, série de GDD e a tarefa de satélite),
+    guardados no Redis e num LRU em memória sob um identificador derivado do conteúdo. Com ele,
+    POST /insights/recompute refaz a análise com novos limites sem chamar os provedores de clima.
+    """
+
+    def __init__(self, redis, ttl_seconds: int, max_entries: int):
+        self._redis = redis
+        self._ttl_seconds = ttl_seconds
+        self._max_entries = max_entries
+        # id -> (gravado no Redis em, snapshot)
+        self._local: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    @staticmethod
+    def key(snapshot_id: str) -> str:
+        return f"insights:snapshot:{snapshot_id}"
+
+    @staticmethod
+    def _encode(lat: float, lon: float, forecast_data: Dict[str, Any], historical_data: Dict[str, Any], satellite_analysis: Dict[str, Any], gdd_series: Optional[DailyTemperatureSeries] = None) -> Tuple[str, str]:
+        """Identificador e conteúdo (JSON) do snapshot, sem gravá-lo; o identificador é derivado do conteúdo."""
+        payload = json.dumps({
+            "location": {"lat": lat, "lon": lon},
+            "forecast_data": forecast_data,
+            "historical_data": historical_data,
+            "gdd_series": gdd_series.to_dict() if gdd_series is not None else None,
+            "satellite_analysis": satellite_analysis,
+        })
+        return hashlib.sha1(payload.encode()).hexdigest()[:20], payload
+
+    def snapshot_id(self, lat: float, lon: float, forecast_data: Dict[str, Any], historical_data: Dict[str, Any], satellite_analysis: Dict[str, Any], gdd_series: Optional[DailyTemperatureSeries] = None) -> str:
+        """Identificador que put() devolveria para estes dados, sem gravar nada (ex.: para responder 304 antes)."""
+        return self._encode(lat, lon, forecast_data, historical_data, satellite_analysis, gdd_series)[0]
+
+    async def put(self, lat: float, lon: float, forecast_data: Dict[str, Any], historical_data: Dict[str, Any], satellite_analysis: Dict[str, Any], gdd_series: Optional[DailyTemperatureSeries] = None) -> str:
+        """Guarda o snapshot e retorna seu identificador (o mesmo para dados idênticos)."""
+        snapshot_id, payload = self._encode(lat, lon, forecast_data, historical_data, satellite_analysis, gdd_series)
+
+        # O mesmo snapshot regravado há pouco (outra requisição na mesma célula) só precisa renovar o TTL depois
+        entry = self._local.get(snapshot_id)
+        if entry is None or time.time() - entry[0] > self._ttl_seconds / 2:
+            try:
+                await self._redis.set(self.key(snapshot_id), payload, ex=self._ttl_seconds)
+            except Exception as e:
+                print(f"Erro ao gravar snapshot de insights: {e}")
+            snapshot = {
+                "location": {"lat": lat, "lon": lon},
+                "forecast_data": forecast_data,
+                "historical_data": historical_data,
+                # Cópia: a série original continua sendo estendida e recortada pelo GDDStore
+                "gdd_series": DailyTemperatureSeries.from_dict(gdd_series.to_dict()) if gdd_series is not None else None,
+                "satellite_analysis": satellite_analysis,
+            }
+            self._set_local(snapshot_id, time.time(), snapshot)
+        return snapshot_id
+
+    async def get(self, snapshot_id: str) -> Optional[Dict[str, Any]]:
+        """Retorna o snapshot (com 'gdd_series' já decodificada) ou None se não existir ou tiver expirado."""
+        entry = self._local.get(snapshot_id)
+        if entry is not None and time.time() - entry[0] < self._ttl_seconds:
+            self._local.move_to_end(snapshot_id)
+            CACHE_REQUESTS.labels("insight_snapshot", "local_hit").inc()
+            return entry[1]
+
+        try:
+            raw = await self._redis.get(self.key(snapshot_id))
+        except Exception as e:
+            print(f"Erro ao ler snapshot de insights: {e}")
+            raw = None
+        if not raw:
+            CACHE_REQUESTS.labels("insight_snapshot", "miss").inc()
+            return None
+
+        CACHE_REQUESTS.labels("insight_snapshot", "redis_hit").inc()
+        snapshot = json.loads(raw)
+        if snapshot["gdd_series"] is not None:
+            snapshot["gdd_series"] = DailyTemperatureSeries.from_dict(snapshot["gdd_series"])
+        # Sem saber quando foi gravado, considera o snapshot válido por apenas mais meio TTL neste processo
+        self._set_local(snapshot_id, time.time() - self._ttl_seconds / 2, snapshot)
+        return snapshot
+
+    def _set_local(self, snapshot_id: str, stored_at: float, snapshot: Dict[str, Any]):
+        self._local[snapshot_id] = (stored_at, snapshot)
+        self._local.move_to_end(snapshot_id)
+        while len(self._local) > self._max_entries:
+            self._local.popitem(last=False)
@@ -0,0 +1,100 @@
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from .config import settings
+
+try:
+    from opentelemetry import propagate, trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+except ImportError:  # Sem OpenTelemetry instalado o tracing vira no-op
+    trace = None
+
+TRACER_NAME = "demeter"
+
+_provider = None
+
+
+def configure_tracing(service_name: str) -> bool:
+    """
+    Configura o exportador de spans conforme TRACING_EXPORTER: "otlp" (coletor OTLP/HTTP local),
+    "file" (um span JSON por linha em TRACING_FILE_PATH) ou "none". Retorna True se ativado.
+    """
+    global _provider
+    if trace is None or settings.TRACING_EXPORTER == "none" or _provider is not None:
+        return _provider is not None
+
+    if settings.TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)
+    elif settings.TRACING_EXPORTER == "file":
+        exporter = ConsoleSpanExporter(
+            out=open(settings.TRACING_FILE_PATH, "a", encoding="utf-8"),
+            formatter=lambda span: span.to_json(indent=None) + "\n",
+        )
+    else:
+        raise ValueError(f"TRACING_EXPORTER inválido: {settings.TRACING_EXPORTER}")
+
+    _provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(_provider)
+    return True
+
+
+def shutdown_tracing():
+    """Envia os spans pendentes e encerra o exportador."""
+    global _provider
+    if _provider is not None:
+        _provider.shutdown()
+        _provider = None
+
+
+def instrument_fastapi(app):
+    """Cria um span por requisição HTTP da API (se a instrumentação do FastAPI estiver instalada)."""
+    try:
+        from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+    except ImportError:
+        return
+    FastAPIInstrumentor.instrument_app(app, excluded_urls="metrics")
+
+
+@contextmanager
+def span(name: str, attributes: Optional[Dict[str, Any]] = None, parent: Optional[Dict[str, str]] = None, links: Optional[List[Any]] = None, root: bool = False):
+    """
+    Abre um span filho do span atual. 'parent' é um contexto propagado (ver inject_context) a usar
+    como pai; 'root' inicia um novo trace, normalmente com 'links' para os spans relacionados.
+    """
+    if trace is None:
+        yield None
+        return
+    context = propagate.extract(parent) if parent is not None else None
+    if root:
+        context = trace.set_span_in_context(trace.INVALID_SPAN)
+    tracer = trace.get_tracer(TRACER_NAME)
+    with tracer.start_as_current_span(name, context=context, attributes=attributes, links=links) as current:
+        yield current
+
+
+def record_span(name: str, start_time_ns: int, end_time_ns: int, attributes: Optional[Dict[str, Any]] = None):
+    """Registra um span de intervalo já decorrido (ex.: o tempo que um job esperou na fila)."""
+    if trace is None:
+        return
+    tracer = trace.get_tracer(TRACER_NAME)
+    tracer.start_span(name, attributes=attributes, start_time=start_time_ns).end(end_time=end_time_ns)
+
+
+def inject_context() -> Dict[str, str]:
+    """Serializa o contexto do span atual (W3C traceparent) para enviá-lo junto com um job."""
+    carrier: Dict[str, str] = {}
+    if trace is not None:
+        propagate.inject(carrier)
+    return carrier
+
+
+def current_link():
+    """Link para o span atual, usado quando um span de lote agrupa spans de vários jobs."""
+    if trace is None:
+        return None
+    span_context = trace.get_current_span().get_span_context()
+    return trace.Link(span_context) if span_context.is_valid else None
@@ -1,97 +1,320 @@
 import ee
 import os
 import json
-from datetime import datetime, timedelta
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from arq import cron
 from arq.connections import RedisSettings
 from ee import ServiceAccountCredentials
 from .config import settings
+from . import satellite
+from .satellite import Point
+from .cache import snap_to_grid
+from .ndvi_store import NDVIStore, encode_record
+from .jobs import enqueue_jobs, satellite_result_channel, SATELLITE_ANALYSIS_FUNCTION
+from . import services
+from .gdd_store import create_gdd_store
+from .analysis_memo import analysis_memo
+from .logic import crop_profiles
+from .profiles import CustomProfileStore
+from .farms import FARM_REFRESH_FUNCTION, FarmRegistry, InsightStore, current_slot, refresh_job_id, refresh_slot
+from .http_client import upstream_clients
+from .rate_limit import BACKGROUND, set_default_priority, upstream_rate_limiter
+from . import tracing
+from .metrics import EE_CALL_DURATION, EE_INIT_DURATION, JOB_DURATION, JOB_OUTCOMES, JOB_QUEUE_WAIT, start_metrics_server
 
-async def analyze_satellite_image(ctx, lat: float, lon: float):
+
+def initialize_earth_engine():
+    """Inicializa o Google Earth Engine com a conta de serviço (chamada bloqueante)."""
+    credentials = ServiceAccountCredentials(
+        email=os.environ["GOOGLE_SERVICE_ACCOUNT_EMAIL"],
+        key_file=os.environ["GOOGLE_APPLICATION_CREDENTIALS"]
+    )
+    ee.Initialize(credentials, project=os.environ["GOOGLE_PROJECT_ID"])
+
+
+async def run_ee(ctx, fn, *args, **kwargs):
     """
-    Tarefa de fundo (ARQ) para analisar a imagem de satélite.
+    Executa uma chamada bloqueante do Earth Engine (getInfo, getThumbUrl...) no pool de threads
+    do worker, para não travar o loop de eventos do ARQ enquanto aguarda a resposta.
     """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    outcome = "error"
     try:
-        print("Attempting to initialize Earth Engine...")
-        credentials = ServiceAccountCredentials(
-            email=os.environ["GOOGLE_SERVICE_ACCOUNT_EMAIL"],
-            key_file=os.environ["GOOGLE_APPLICATION_CREDENTIALS"]
-        )
-        ee.Initialize(credentials, project=os.environ["GOOGLE_PROJECT_ID"])
-        print("Earth Engine initialized successfully.")
-    except Exception as e:
-        print(f"Error initializing Earth Engine: {e}")
-        # Se a inicialização falhar, retorne um erro para o cliente.
-        result = {
-            "error": "Falha ao inicializar o Google Earth Engine.",
-            "details": str(e)
-        }
-        await ctx['redis'].set(ctx['job_id'], json.dumps(result), ex=3600)
+        with tracing.span(f"ee.{fn.__name__}"):
+            result = await loop.run_in_executor(ctx["ee_executor"], functools.partial(fn, *args, **kwargs))
+        outcome = "ok"
         return result
+    finally:
+        EE_CALL_DURATION.labels(fn.__name__, outcome).observe(time.perf_counter() - start)
+
+
+async def ensure_earth_engine(ctx) -> bool:
+    """
+    Garante que o Earth Engine esteja inicializado neste processo. A inicialização acontece
+    uma única vez; se tiver falhado no startup, é tentada novamente no próximo job.
+    """
+    if ctx.get("ee_ready"):
+        return True
+    async with ctx["ee_init_lock"]:
+        if ctx.get("ee_ready"):
+            return True
+        start = time.perf_counter()
+        try:
+            print("Attempting to initialize Earth Engine...")
+            await run_ee(ctx, initialize_earth_engine)
+            ctx["ee_ready"] = True
+            ctx["ee_init_error"] = None
+            EE_INIT_DURATION.labels("ok").observe(time.perf_counter() - start)
+            print("Earth Engine initialized successfully.")
+        except Exception as e:
+            print(f"Error initializing Earth Engine: {e}")
+            ctx["ee_init_error"] = str(e)
+            EE_INIT_DURATION.labels("error").observe(time.perf_counter() - start)
+    return ctx.get("ee_ready", False)
+
+
+async def startup(ctx):
+    """Hook de inicialização do worker: cria o pool de threads do EE e inicializa o Earth Engine."""
+    start_metrics_server(settings.WORKER_METRICS_PORT)
+    tracing.configure_tracing("demeter-worker")
+    ctx["ee_executor"] = ThreadPoolExecutor(max_workers=settings.EE_MAX_CONCURRENCY, thread_name_prefix="earth-engine")
+    ctx["ee_init_lock"] = asyncio.Lock()
+    ctx["ee_ready"] = False
+    ctx["ndvi_store"] = NDVIStore(ctx["redis"], ttl_seconds=settings.NDVI_STORE_TTL_DAYS * 86400)
+    ctx["ndvi_batcher"] = satellite.NDVIBatcher(
+        lambda points: compute_ndvi_batch(ctx, points),
+        window_seconds=settings.NDVI_BATCH_WINDOW_SECONDS,
+        max_batch_size=settings.NDVI_BATCH_MAX_SIZE,
+    )
+    # Pré-cálculo de insights: o worker também busca o clima, com o mesmo cache de previsão da API
+    await upstream_clients.start()
+    services.forecast_cache.bind_redis(ctx["redis"])
+    # Chamadas do worker são de segundo plano: não consomem a reserva das requisições interativas
+    upstream_rate_limiter.bind_redis(ctx["redis"])
+    set_default_priority(BACKGROUND)
+    analysis_memo.bind_redis(ctx["redis"])
+    ctx["farm_registry"] = FarmRegistry(ctx["redis"])
+    ctx["insight_store"] = InsightStore(ctx["redis"], ttl_seconds=precomputed_insight_ttl())
+    ctx["gdd_store"] = create_gdd_store(ctx["redis"])
+    # Perfis de cultura personalizados usados pelas fazendas cadastradas
+    ctx["custom_profiles"] = CustomProfileStore(crop_profiles)
+    await ctx["custom_profiles"].start(ctx["redis"], settings.CROP_PROFILE_RELOAD_SECONDS)
+    await ensure_earth_engine(ctx)
+
 
-    point = ee.Geometry.Point(lon, lat)
-    
+async def shutdown(ctx):
+    """Hook de encerramento do worker: libera o pool de threads do EE."""
+    ctx["ee_executor"].shutdown(wait=False, cancel_futures=True)
+    await ctx["custom_profiles"].stop()
+    await upstream_clients.aclose()
+    tracing.shutdown_tracing()
+
+
+async def compute_ndvi_batch(ctx, points: List[Point]) -> List[Dict[str, Any]]:
+    """
+    Calcula o NDVI de vários pontos de uma vez: uma busca pelas melhores cenas de todos os pontos,
+    um reduceRegions por cena (em paralelo) e os thumbnails, devolvendo um resultado por ponto.
+    Pontos cuja cena já está no armazenamento de NDVI reaproveitam o valor e o thumbnail gravados.
+    """
     # Definir o período de busca (últimos 30 dias)
     end_date = datetime.now()
     start_date = end_date - timedelta(days=30)
 
-    print(f"Searching for images from {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
+    print(f"Searching images for {len(points)} points from {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
+    scenes = await run_ee(ctx, satellite.find_best_scenes, points, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+
+    # Reaproveita o NDVI já calculado para a mesma cena; só calcula os pontos cuja melhor cena mudou
+    with_scene = [i for i, scene in enumerate(scenes) if scene]
+    stored = await ctx["ndvi_store"].get_many([(*points[i], scenes[i]["scene_id"]) for i in with_scene])
+
+    ndvi_values: List[Optional[float]] = [None] * len(points)
+    image_urls: List[Optional[str]] = [None] * len(points)
+    points_by_scene: Dict[str, List[int]] = {}
+    for i, record in zip(with_scene, stored):
+        if record:
+            ndvi_values[i] = record["ndvi_value"]
+            image_urls[i] = record["image_url"]
+        else:
+            points_by_scene.setdefault(scenes[i]["scene_id"], []).append(i)
+    # Registros gravados antes de o thumbnail fazer parte deles
+    missing_thumbnails = [i for i, record in zip(with_scene, stored) if record and not record["image_url"]]
+
+    print(f"NDVI store hits: {len(with_scene) - sum(len(indices) for indices in points_by_scene.values())}/{len(with_scene)}. Calculating NDVI over {len(points_by_scene)} scenes...")
 
-    # Usar a coleção de imagens do Sentinel-2
-    collection = (
-        ee.ImageCollection('COPERNICUS/S2_SR')
-        .filterBounds(point)
-        .filterDate(start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
-        .sort('CLOUDY_PIXEL_PERCENTAGE')
-        .limit(1)
+    async def thumbnail(i: int):
+        lat, lon = points[i]
+        image_urls[i] = await run_ee(ctx, satellite.thumbnail_url, scenes[i]["scene_id"], lat, lon)
+
+    async def reduce_scene(scene_id: str, indices: List[int]):
+        values, _ = await asyncio.gather(
+            run_ee(ctx, satellite.reduce_scene_ndvi, scene_id, [points[i] for i in indices]),
+            asyncio.gather(*(thumbnail(i) for i in indices)),
+        )
+        for i, value in zip(indices, values):
+            ndvi_values[i] = value
+        scene = scenes[indices[0]]
+        await ctx["ndvi_store"].put_many([
+            (*points[i], scene_id, encode_record(value, scene["cloudy_pixel_percentage"], scene["time_start"], image_urls[i]))
+            for i, value in zip(indices, values)
+        ])
+
+    await asyncio.gather(
+        *(reduce_scene(scene_id, indices) for scene_id, indices in points_by_scene.items()),
+        *(thumbnail(i) for i in missing_thumbnails),
     )
-    
-    image = collection.first()
-
-    if not image:
-        print("No image found for the given criteria.")
-        result = {
-            "ndvi_value": None,
-            "image_url": None,
-            "message": "Nenhuma imagem de satélite encontrada para a área e período especificados."
-        }
-        await ctx['redis'].set(ctx['job_id'], json.dumps(result), ex=3600)
+
+    results = []
+    for scene, ndvi_value, image_url in zip(scenes, ndvi_values, image_urls):
+        if not scene:
+            results.append({
+                "ndvi_value": None,
+                "image_url": None,
+                "message": "Nenhuma imagem de satélite encontrada para a área e período especificados."
+            })
+        else:
+            results.append({
+                "ndvi_value": round(ndvi_value, 4) if ndvi_value else None,
+                "image_url": image_url,
+                "scene_id": scene["scene_id"]
+            })
+    return results
+
+
+async def store_satellite_result(ctx, result: Dict[str, Any]):
+    """
+    Armazena o resultado no Redis usando o job_id como chave, como JSON, e publica a conclusão
+    para os clientes conectados via SSE/long-poll.
+    """
+    payload = json.dumps(result)
+    async with ctx['redis'].pipeline(transaction=False) as pipe:
+        pipe.set(ctx['job_id'], payload, ex=3600) # Expira em 1 hora
+        pipe.publish(satellite_result_channel(ctx['job_id']), payload)
+        await pipe.execute()
+
+
+async def analyze_satellite_image(ctx, lat: float, lon: float, trace_context: Optional[Dict[str, str]] = None):
+    """
+    Tarefa de fundo (ARQ) para analisar a imagem de satélite.
+    O ponto entra no lote de NDVI do worker, processado junto com os demais jobs que chegarem
+    na mesma janela; o resultado individual é então gravado sob o ID deste job.
+    'trace_context' é o contexto de tracing da requisição que enfileirou o job.
+    """
+    attributes = {"arq.job_id": ctx["job_id"], "arq.job_try": ctx["job_try"], "lat": lat, "lon": lon}
+    with tracing.span(SATELLITE_ANALYSIS_FUNCTION, attributes, parent=trace_context or {}):
+        return await run_satellite_analysis(ctx, lat, lon)
+
+
+async def run_satellite_analysis(ctx, lat: float, lon: float) -> Dict[str, Any]:
+    """Executa a análise de um job, registrando o tempo de fila, a duração e o resultado."""
+    start = time.perf_counter()
+    # Tempo de fila: do enfileiramento (registrado pelo ARQ) até o início do job
+    enqueue_time = ctx["enqueue_time"]
+    queue_wait = max(0.0, (datetime.now(enqueue_time.tzinfo) - enqueue_time).total_seconds())
+    JOB_QUEUE_WAIT.labels(SATELLITE_ANALYSIS_FUNCTION).observe(queue_wait)
+    now_ns = time.time_ns()
+    tracing.record_span("arq.queue_wait", now_ns - int(queue_wait * 1e9), now_ns)
+    outcome = "error"
+    try:
+        if not await ensure_earth_engine(ctx):
+            # Se a inicialização falhar, retorne um erro para o cliente.
+            result = {
+                "error": "Falha ao inicializar o Google Earth Engine.",
+                "details": ctx.get("ee_init_error")
+            }
+            await store_satellite_result(ctx, result)
+            outcome = "ee_init_failed"
+            return result
+
+        # O ponto é ajustado à grade do armazenamento de NDVI, para que o resultado seja reaproveitável
+        result = await ctx["ndvi_batcher"].submit(*snap_to_grid(lat, lon, settings.NDVI_STORE_GRID_DEG))
+
+        await store_satellite_result(ctx, result)
+        print("Result stored in Redis.")
+        outcome = "success" if result.get("ndvi_value") is not None else "no_data"
         return result
+    finally:
+        JOB_OUTCOMES.labels(SATELLITE_ANALYSIS_FUNCTION, outcome).inc()
+        JOB_DURATION.labels(SATELLITE_ANALYSIS_FUNCTION).observe(time.perf_counter() - start)
+
+
+def precomputed_insight_ttl() -> int:
+    """Validade de um insight pré-calculado: um ciclo de atualização mais uma fatia de folga."""
+    return settings.FORECAST_CACHE_CADENCE_SECONDS + settings.FARM_REFRESH_TICK_MINUTES * 60
+
+
+async def schedule_farm_refresh(ctx):
+    """
+    Cron: enfileira a atualização das fazendas da fatia atual. O intervalo de atualização da previsão
+    é dividido em fatias de FARM_REFRESH_TICK_MINUTES e cada fazenda cai sempre na mesma fatia,
+    espalhando a carga pelo intervalo em vez de recalcular todas as fazendas de uma vez.
+    """
+    cadence = settings.FORECAST_CACHE_CADENCE_SECONDS
+    tick = settings.FARM_REFRESH_TICK_MINUTES * 60
+    slots = max(1, cadence // tick)
+    slot = current_slot(cadence, tick)
+    farm_ids = [farm_id for farm_id in await ctx["farm_registry"].farm_ids() if refresh_slot(farm_id, slots) == slot]
+    await enqueue_jobs(ctx["redis"], FARM_REFRESH_FUNCTION, [(refresh_job_id(farm_id, cadence), {"farm_id": farm_id}) for farm_id in farm_ids])
+    print(f"Farm refresh slot {slot}/{slots}: {len(farm_ids)} farms enqueued.")
+
+
+async def farm_satellite_analysis(ctx, lat: float, lon: float) -> Dict[str, Any]:
+    """NDVI de uma fazenda cadastrada, no mesmo formato de SatelliteAnalysis devolvido pela API."""
+    if await ensure_earth_engine(ctx):
+        try:
+            result = await ctx["ndvi_batcher"].submit(*snap_to_grid(lat, lon, settings.NDVI_STORE_GRID_DEG))
+            return {"available": True, "message": "Análise de satélite concluída.", "ndvi_value": result.get("ndvi_value"), "image_url": result.get("image_url"), "task_id": None}
+        except Exception as e:
+            print(f"Error computing NDVI for farm at ({lat}, {lon}): {e}")
+    return {"available": False, "message": "Erro ao iniciar análise de satélite.", "ndvi_value": None, "image_url": None, "task_id": None}
+
+
+async def refresh_farm_insight(ctx, farm_id: str):
+    """
+    Tarefa de fundo (ARQ): pré-calcula previsão, NDVI e insights de uma fazenda cadastrada e os grava
+    no armazenamento consultado por POST /insights/. Em caso de erro na previsão, o insight anterior é mantido.
+    """
+    farm = await ctx["farm_registry"].get(farm_id)
+    if farm is None:
+        return {"skipped": "Fazenda não cadastrada."}
+    lat, lon = farm["location"]["lat"], farm["location"]["lon"]
+    planting_date = farm["config"].get("planting_date")
+
+    # Com data de plantio, o GDD vem da série diária desde o plantio em vez do histórico dos últimos dias
+    if planting_date:
+        history_task = ctx["gdd_store"].get_series(lat, lon, date.fromisoformat(planting_date))
+    else:
+        history_task = services.get_historical_weather_data(lat, lon)
+    (forecast_data, history), satellite_analysis = await asyncio.gather(
+        asyncio.gather(services.get_forecast_data(lat, lon), history_task),
+        farm_satellite_analysis(ctx, lat, lon),
+    )
+    historical_data, gdd_series = ({}, history) if planting_date else (history, None)
+    if forecast_data.get("error"):
+        return {"error": forecast_data["error"]}
+    if planting_date and gdd_series is None:
+        # Sem a série desde o plantio, o GDD volta a usar o histórico dos últimos dias
+        historical_data = await services.get_historical_weather_data(lat, lon)
 
-    print("Image found. Calculating NDVI...")
-    
-    # Calcular NDVI
-    ndvi = image.normalizedDifference(['B8', 'B4']).rename('NDVI')
-    
-    # Extrair o valor médio de NDVI na região
-    ndvi_value = ndvi.reduceRegion(
-        reducer=ee.Reducer.mean(),
-        geometry=point.buffer(100), # Buffer de 100 metros ao redor do ponto
-        scale=10
-    ).get('NDVI').getInfo()
-
-    print(f"NDVI calculated: {ndvi_value}")
-
-    # Gerar URL da imagem de thumbnail
-    image_url = image.getThumbUrl({
-        'bands': ['B4', 'B3', 'B2'], # RGB
-        'min': 0,
-        'max': 3000,
-        'region': point.buffer(500).bounds().getInfo()
-    })
-
-    print(f"Image URL generated: {image_url}")
-
-    result = {
-        "ndvi_value": round(ndvi_value, 4) if ndvi_value else None,
-        "image_url": image_url
-    }
-
-    # Armazenar o resultado no Redis usando o job_id como chave, como JSON
-    await ctx['redis'].set(ctx['job_id'], json.dumps(result), ex=3600) # Expira em 1 hora
-    print("Result stored in Redis.")
-    return result
+    insight = await analysis_memo.analyze(forecast_data, historical_data, farm["config"] | {"lat": lat, "lon": lon}, satellite_analysis, gdd_series=gdd_series)
+    if insight.get("error"):
+        return {"error": insight["error"]}
+    insight["precomputed_at"] = datetime.now(timezone.utc).isoformat()
+    await ctx["insight_store"].put(lat, lon, farm["config"], insight)
+    return {"farm_id": farm_id, "precomputed_at": insight["precomputed_at"]}
 
 
 class WorkerSettings:
-    functions = [analyze_satellite_image]
+    functions = [analyze_satellite_image, refresh_farm_insight]
+    cron_jobs = [
+        cron(schedule_farm_refresh, minute=set(range(0, 60, settings.FARM_REFRESH_TICK_MINUTES)), second=0)
+    ] if settings.FARM_REFRESH_ENABLED else []
+    on_startup = startup
+    on_shutdown = shutdown
+    max_jobs = settings.WORKER_MAX_JOBS
     redis_settings = RedisSettings.from_dsn(settings.REDIS_DSN)
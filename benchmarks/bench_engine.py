@@ -0,0 +1,78 @@
+"""
+Micro-benchmark: motor de passada única (logic.evaluate_forecast) vs. as sete funções find_*.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_engine [--steps 40] [--repeat 2000]
+"""
+import argparse
+import random
+import time
+import timeit
+
+from app import logic
+
+
+def make_forecast_list(steps: int, seed: int = 42):
+    """Gera uma previsão sintética no formato da API OpenWeatherMap (5 dias / 3 horas)."""
+    rng = random.Random(seed)
+    start = int(time.time()) // 10800 * 10800
+    forecast_list = []
+    for i in range(steps):
+        temp = round(rng.uniform(-2, 36), 2)
+        forecast_list.append({
+            "dt": start + i * 10800,
+            "main": {
+                "temp": temp,
+                "temp_min": round(temp - rng.uniform(0, 3), 2),
+                "temp_max": round(temp + rng.uniform(0, 3), 2),
+                "humidity": rng.randint(30, 100),
+            },
+            "weather": [{"id": rng.choice([500, 800, 800, 801, 802])}],
+            "wind": {"speed": round(rng.uniform(0, 6), 2)},
+            "pop": rng.choice([0, 0, 0, 0.05, 0.2, 0.6]),
+        })
+    return forecast_list
+
+
+def run_individual(forecast_list, t):
+    """Caminho anterior: uma passada por detector."""
+    return {
+        "spraying_alert": logic.find_spraying_window(forecast_list, t["wind_speed_threshold_ms"], t["precipitation_prob_threshold"], t["min_window_hours"]),
+        "fungal_risk_alert": logic.find_fungal_risk_window(forecast_list, t["fungal_risk_humidity"], t["fungal_risk_temp_min"], t["fungal_risk_temp_max"], t["min_window_hours"]),
+        "frost_alert": logic.find_frost_risk(forecast_list, t["frost_temp_threshold"]),
+        "heat_stress_alert": logic.find_heat_stress_risk(forecast_list, t["heat_stress_temp_threshold"]),
+        "planting_window_alert": logic.find_planting_window(forecast_list, t["planting_temp_min"], t["planting_temp_max"], t["planting_rain_prob_threshold"]),
+        "harvesting_window_alert": logic.find_harvesting_window(forecast_list, t["harvest_rain_prob_threshold"], t["harvest_humidity_threshold"], t["min_window_hours"]),
+        "irrigation_recommendation": logic.find_irrigation_recommendation(forecast_list, t["irrigation_no_rain_threshold"], t["irrigation_temp_threshold"], t["irrigation_min_hours"]),
+    }
+
+
+def run_fused(forecast_list, t):
+    """Caminho novo: normalização única + passada única."""
+    return logic.evaluate_forecast(logic.normalize_forecast(forecast_list), t)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    forecast_list = make_forecast_list(args.steps)
+    for profile_name, profile in logic.CROP_PROFILES.items():
+        t = logic.crop_profiles.compile_config(profile).thresholds
+        if run_individual(forecast_list, t) != run_fused(forecast_list, t):
+            raise SystemExit(f"Divergência entre os caminhos para o perfil '{profile_name}'.")
+
+    t = logic.crop_profiles.compile_config({}).thresholds
+    individual = min(timeit.repeat(lambda: run_individual(forecast_list, t), number=args.repeat, repeat=5)) / args.repeat
+    fused = min(timeit.repeat(lambda: run_fused(forecast_list, t), number=args.repeat, repeat=5)) / args.repeat
+
+    print(f"Passos: {args.steps}")
+    print(f"find_* individuais: {individual * 1e6:10.1f} µs/análise")
+    print(f"Passada única:      {fused * 1e6:10.1f} µs/análise")
+    print(f"Aceleração:         {individual / fused:10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
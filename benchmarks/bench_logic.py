@@ -0,0 +1,237 @@
+"""
+Suíte de benchmarks de app/logic.py, com baseline em JSON para detectar regressões.
+
+Cobre todas as funções públicas do módulo (detectores find_*, motor de passada única, GDD, NDVI,
+perfis) e analyze_forecast de ponta a ponta, sobre dados sintéticos determinísticos
+(benchmarks/synthetic.py) em vários tamanhos e regimes de tempo.
+
+Os tempos são normalizados por uma carga de calibração em Python puro, para que a baseline
+gravada em uma máquina possa ser comparada com execuções em outra. A suíte roda várias vezes
+(--runs); a baseline guarda a mediana de cada caso e só é regressão o caso que fica acima dos
+limites em todas as execuções, para que o ruído de uma execução isolada não reprove a suíte.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_logic                # executa e compara com a baseline
+    python -m benchmarks.bench_logic --save         # executa e grava uma nova baseline
+    python -m benchmarks.bench_logic --filter gdd   # apenas os casos que contêm 'gdd'
+    python -m benchmarks.bench_logic --runs 5       # mais execuções (padrão: 3)
+"""
+import argparse
+import inspect
+import json
+import platform
+import random
+import statistics
+import sys
+import timeit
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from app import logic, logic_numpy
+from benchmarks.synthetic import FORECAST_SIZES, HISTORY_SIZES, REGIMES, make_forecast, make_history
+
+BASELINE_PATH = Path(__file__).parent / "baselines" / "logic.json"
+TARGET_SECONDS = 0.01 # Duração mínima de cada repetição
+REPEAT = 5
+
+Case = Tuple[str, str, Callable[[], object]] # (nome do caso, função coberta, chamada)
+
+
+def calibrate() -> float:
+    """
+    Tempo (µs) de uma carga fixa em Python puro, usado para normalizar entre máquinas. Além de aritmética,
+    a carga cria e percorre dicionários e listas como o motor de análise, para acompanhar também as
+    variações de memória e cache da máquina, e não só as de CPU.
+    """
+    def workload():
+        rows = [{"temp": (i % 37) * 0.5, "humidity": i % 100, "hour": i % 24} for i in range(600)]
+        total = 0.0
+        for row in rows:
+            total += row["temp"] * 0.5 if row["humidity"] > 50 else -row["hour"]
+        rows.sort(key=lambda row: row["temp"])
+        return total + sum(row["humidity"] for row in rows[::7])
+    return measure(workload)
+
+
+def measure(fn: Callable[[], object]) -> float:
+    """Melhor tempo (µs) por chamada entre REPEAT repetições de duração mínima TARGET_SECONDS."""
+    timer = timeit.Timer(fn)
+    number = 1
+    while timer.timeit(number) < TARGET_SECONDS:
+        number *= 2
+    return min(timer.repeat(repeat=REPEAT, number=number)) / number * 1e6
+
+
+def build_cases() -> List[Case]:
+    """Monta os casos de benchmark: função x tamanho x regime."""
+    default = logic.CROP_PROFILES["default"]
+    thresholds = logic.crop_profiles.compile_config(default).thresholds
+    satellite_pending = {"available": False, "message": "Análise de satélite em processamento...", "ndvi_value": None, "image_url": None, "task_id": "bench"}
+    has_numpy = logic_numpy.is_available()
+    cases: List[Case] = []
+
+    for regime in REGIMES:
+        history = make_history(HISTORY_SIZES["5d"], regime)
+        for size_name, (steps, step_hours) in FORECAST_SIZES.items():
+            forecast = make_forecast(steps, step_hours, regime)
+            forecast_list = forecast["list"]
+            normalized = logic.normalize_forecast(forecast_list)
+            t = thresholds
+            suffix = f"{size_name}/{regime}"
+
+            cases += [
+                (f"normalize_forecast/{suffix}", "normalize_forecast", lambda fl=forecast_list: logic.normalize_forecast(fl)),
+                (f"evaluate_forecast[python]/{suffix}", "evaluate_forecast", lambda s=normalized: logic.evaluate_forecast(s, t)),
+                (f"prepare_evaluator[python]/{suffix}", "prepare_evaluator", lambda s=normalized: logic.prepare_evaluator(s, "python")(t)),
+                (f"find_spraying_window/{suffix}", "find_spraying_window", lambda fl=forecast_list: logic.find_spraying_window(fl, t["wind_speed_threshold_ms"], t["precipitation_prob_threshold"], t["min_window_hours"])),
+                (f"find_fungal_risk_window/{suffix}", "find_fungal_risk_window", lambda fl=forecast_list: logic.find_fungal_risk_window(fl, t["fungal_risk_humidity"], t["fungal_risk_temp_min"], t["fungal_risk_temp_max"], t["min_window_hours"])),
+                (f"find_frost_risk/{suffix}", "find_frost_risk", lambda fl=forecast_list: logic.find_frost_risk(fl, t["frost_temp_threshold"])),
+                (f"find_heat_stress_risk/{suffix}", "find_heat_stress_risk", lambda fl=forecast_list: logic.find_heat_stress_risk(fl, t["heat_stress_temp_threshold"])),
+                (f"find_planting_window/{suffix}", "find_planting_window", lambda fl=forecast_list: logic.find_planting_window(fl, t["planting_temp_min"], t["planting_temp_max"], t["planting_rain_prob_threshold"])),
+                (f"find_harvesting_window/{suffix}", "find_harvesting_window", lambda fl=forecast_list: logic.find_harvesting_window(fl, t["harvest_rain_prob_threshold"], t["harvest_humidity_threshold"], t["min_window_hours"])),
+                (f"find_irrigation_recommendation/{suffix}", "find_irrigation_recommendation", lambda fl=forecast_list: logic.find_irrigation_recommendation(fl, t["irrigation_no_rain_threshold"], t["irrigation_temp_threshold"], t["irrigation_min_hours"])),
+                (f"analyze_forecast[python]/{suffix}", "analyze_forecast", lambda f=forecast, h=history: logic.analyze_forecast(f, h, dict(default), satellite_pending)),
+                (f"analyze_profiles[python]/{suffix}", "analyze_profiles", lambda f=forecast, h=history: logic.analyze_profiles(f, h, list(logic.CROP_PROFILES), {}, satellite_pending)),
+            ]
+            if has_numpy:
+                cases += [
+                    (f"evaluate_forecast[numpy]/{suffix}", "evaluate_forecast", lambda s=normalized: logic_numpy.evaluate_forecast(s, t)),
+                    (f"analyze_forecast[numpy]/{suffix}", "analyze_forecast", lambda f=forecast, h=history: logic.analyze_forecast(f, h, dict(default), satellite_pending, backend="numpy")),
+                ]
+
+    for size_name, days in HISTORY_SIZES.items():
+        for regime in REGIMES:
+            history = make_history(days, regime)
+            cases.append((f"calculate_gdd/{size_name}/{regime}", "calculate_gdd", lambda h=history: logic.calculate_gdd(h, logic.GDD_BASE_TEMP)))
+
+    first_dt = make_forecast(1)["list"][0]["dt"]
+    cases += [
+        ("crop_profiles.compile_config/cached", "crop_profiles.compile_config", lambda: logic.crop_profiles.compile_config({"crop_profile": "soja", "frost_temp_threshold": 1})),
+        ("analyze_ndvi_insight/pending", "analyze_ndvi_insight", lambda: logic.analyze_ndvi_insight(satellite_pending)),
+        ("analyze_ndvi_insight/value", "analyze_ndvi_insight", lambda: logic.analyze_ndvi_insight({"ndvi_value": 0.42})),
+        ("format_step_time/cached", "format_step_time", lambda: logic.format_step_time(first_dt)),
+        ("mps_to_kmh", "mps_to_kmh", lambda: logic.mps_to_kmh(3.2)),
+        ("forecast_freshness", "forecast_freshness", lambda: logic.forecast_freshness({"list": [], "stale": True, "fetched_at": first_dt})),
+    ]
+    return cases
+
+
+def uncovered_functions(cases: List[Case]) -> List[str]:
+    """Funções públicas de app/logic.py sem nenhum caso de benchmark."""
+    covered = {function for _, function, _ in cases}
+    public = [
+        name for name, obj in vars(logic).items()
+        if not name.startswith("_") and callable(obj) and getattr(obj, "__module__", None) == logic.__name__ and not inspect.isclass(obj)
+    ]
+    return sorted(set(public) - covered)
+
+
+def run_suite(selected: List[Case], runs: int) -> Tuple[Dict[str, List[float]], float]:
+    """
+    Executa os casos 'runs' vezes e retorna (tempos de cada caso em cada execução, calibração mediana).
+    Cada execução é normalizada pela própria calibração e levada à escala da calibração mediana, e mede
+    todos os casos em sequência: uma perturbação passageira da máquina afeta só uma amostra de cada caso.
+    """
+    runs_results = []
+    for run in range(runs):
+        # Ordem diferente a cada execução: uma perturbação recorrente não atinge sempre os mesmos casos
+        order = random.Random(run).sample(selected, len(selected))
+        calibration_before = calibrate()
+        times = {name: measure(fn) for name, _, fn in order}
+        # Calibração antes e depois da execução: o menor valor reduz o efeito de variações de frequência da CPU
+        calibration_us = min(calibration_before, calibrate())
+        runs_results.append((calibration_us, times))
+        print(f"Execução {run + 1}/{runs}: calibração {calibration_us:.1f} µs")
+
+    median_calibration = statistics.median(calibration for calibration, _ in runs_results)
+    samples: Dict[str, List[float]] = {name: [] for name, _, _ in selected}
+    for calibration_us, times in runs_results:
+        for name, value in times.items():
+            samples[name].append(value * median_calibration / calibration_us)
+    return samples, median_calibration
+
+
+def compare(samples: Dict[str, List[float]], calibration_us: float, baseline: Dict, tolerance: float, min_delta_us: float, min_delta_ratio: float) -> List[str]:
+    """
+    Compara os tempos normalizados com a baseline e retorna os casos que regrediram de forma consistente:
+    a melhor das execuções ainda fica acima da tolerância relativa, com diferença absoluta de ao menos
+    max('min_delta_us', 'min_delta_ratio' x baseline) (ruído dos casos rápidos). A tabela mostra a mediana.
+
+    A calibração não acompanha toda variação da máquina (ex.: vizinhos disputando cache e memória em uma
+    VM), então a razão mediana da suíte é descontada antes do teste: um deslocamento que atinge todos os
+    casos por igual é só avisado, e regride o caso que fica mais lento que o resto da suíte.
+    """
+    scale = baseline["calibration_us"] / calibration_us
+    known = [name for name in samples if name in baseline["cases"]]
+    drift = statistics.median(statistics.median(samples[name]) * scale / baseline["cases"][name] for name in known) if known else 1.0
+    regressions = []
+    print(f"\n{'caso':<60} {'baseline':>10} {'mediana':>10} {'razão':>7}")
+    for name, times in samples.items():
+        median = statistics.median(times) * scale
+        reference = baseline["cases"].get(name)
+        if reference is None:
+            print(f"{name:<60} {'-':>10} {median:10.1f}    novo")
+            continue
+        best = min(times) * scale / drift
+        threshold = max(reference * (1 + tolerance), reference + max(min_delta_us, min_delta_ratio * reference))
+        flag = " <- regressão" if best > threshold else ""
+        print(f"{name:<60} {reference:10.1f} {median:10.1f} {median / reference:7.2f}{flag}")
+        if flag:
+            regressions.append(name)
+
+    print(f"\nDeslocamento da suíte em relação à baseline: {drift:.2f}x")
+    if drift > 1 + tolerance:
+        print("Aviso: a suíte inteira está mais lenta que a baseline. Se a máquina não estiver sobrecarregada, compare com a baseline de outro commit.")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", action="store_true", help="Grava os resultados como nova baseline.")
+    parser.add_argument("--filter", default="", help="Executa apenas os casos cujo nome contém este texto.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Aumento relativo tolerado antes de acusar regressão.")
+    parser.add_argument("--min-delta", type=float, default=20.0, help="Diferença absoluta mínima (µs) para acusar regressão.")
+    parser.add_argument("--min-delta-ratio", type=float, default=0.10, help="Diferença mínima relativa à baseline, se maior que --min-delta.")
+    parser.add_argument("--runs", type=int, default=3, help="Execuções da suíte; a regressão precisa aparecer em todas.")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    args = parser.parse_args()
+
+    cases = build_cases()
+    missing = uncovered_functions(cases)
+    if missing:
+        raise SystemExit(f"Funções de app/logic.py sem benchmark: {', '.join(missing)}.")
+
+    selected = [case for case in cases if args.filter in case[0]]
+    print(f"{len(selected)} casos")
+
+    samples, calibration_us = run_suite(selected, max(1, args.runs))
+    print(f"Calibração (mediana): {calibration_us:.1f} µs")
+
+    if args.save:
+        if args.filter:
+            raise SystemExit("--save exige a suíte completa (sem --filter).")
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps({
+            "calibration_us": round(calibration_us, 3),
+            "python": platform.python_version(),
+            "numpy": logic_numpy.is_available(),
+            "runs": max(1, args.runs),
+            "cases": {name: round(statistics.median(times), 3) for name, times in samples.items()},
+        }, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"\nBaseline gravada em {args.baseline}.")
+        return
+
+    if not args.baseline.exists():
+        print(f"\nSem baseline em {args.baseline}; use --save para criar uma.")
+        return
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    regressions = compare(samples, calibration_us, baseline, args.tolerance, args.min_delta, args.min_delta_ratio)
+    if regressions:
+        print(f"\n{len(regressions)} caso(s) acima da tolerância de {args.tolerance:.0%} em todas as {len(next(iter(samples.values())))} execuções.")
+        sys.exit(1)
+    print("\nSem regressões.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Paridade e desempenho do backend vetorizado (logic_numpy) frente ao backend em Python.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_numpy [--seeds 200] [--repeat 200]
+"""
+import argparse
+import random
+import timeit
+
+from app import logic, logic_numpy
+from benchmarks.bench_engine import make_forecast_list
+
+
+def check_parity(seeds: int) -> int:
+    """Compara os dois backends em previsões e limites aleatórios. Retorna o número de casos verificados."""
+    rng = random.Random(0)
+    keys = list(logic.CROP_PROFILES["default"])
+    profiles = list(logic.CROP_PROFILES.values())
+    cases = 0
+    for seed in range(seeds):
+        forecast_list = make_forecast_list(rng.choice([1, 2, 5, 40, 128, 384]), seed)
+        steps = logic.normalize_forecast(forecast_list)
+        # Mistura limites de perfis diferentes para exercitar combinações variadas
+        thresholds = logic.crop_profiles.compile_config({key: rng.choice(profiles)[key] for key in keys}).thresholds
+        expected = logic.evaluate_forecast(steps, thresholds)
+        actual = logic_numpy.evaluate_forecast(steps, thresholds)
+        if repr(expected) != repr(actual):
+            raise SystemExit(f"Divergência entre os backends (seed={seed}, limites={thresholds}).")
+        cases += 1
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seeds", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    if not logic_numpy.is_available():
+        raise SystemExit("NumPy não está instalado.")
+
+    print(f"Paridade verificada em {check_parity(args.seeds)} casos.")
+
+    thresholds = logic.crop_profiles.compile_config({}).thresholds
+    for size in (40, 128, 384, 1536):
+        steps = logic.normalize_forecast(make_forecast_list(size))
+        python = min(timeit.repeat(lambda: logic.evaluate_forecast(steps, thresholds), number=args.repeat, repeat=5)) / args.repeat
+        numpy = min(timeit.repeat(lambda: logic_numpy.evaluate_forecast(steps, thresholds), number=args.repeat, repeat=5)) / args.repeat
+        # Colunas já convertidas, como ao avaliar vários perfis sobre a mesma previsão
+        columns = logic_numpy.to_columns(steps)
+        reused = min(timeit.repeat(lambda: logic_numpy.evaluate_forecast(steps, thresholds, columns), number=args.repeat, repeat=5)) / args.repeat
+        print(
+            f"{size:5d} passos | python: {python * 1e6:9.1f} µs | numpy: {numpy * 1e6:9.1f} µs ({python / numpy:5.2f}x)"
+            f" | numpy c/ colunas prontas: {reused * 1e6:9.1f} µs ({python / reused:5.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
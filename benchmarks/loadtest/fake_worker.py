@@ -0,0 +1,61 @@
+"""
+Worker ARQ com um Earth Engine simulado, para testes de carga sem consumir a cota do GEE.
+
+As chamadas ao EE (inicialização, busca de cenas, reduceRegions e thumbnail) são substituídas
+por funções bloqueantes que apenas aguardam a latência configurada, preservando o restante do
+worker real (pool de threads, lotes de NDVI, armazenamento no Redis e publicação do resultado).
+
+Configuração por variáveis de ambiente:
+    FAKE_EE_LATENCY_MS    latência de cada chamada ao EE (padrão 500)
+    FAKE_EE_ERROR_RATE    fração de chamadas que falham, de 0 a 1 (padrão 0)
+
+Uso (a partir da raiz do projeto):
+    python -m arq benchmarks.loadtest.fake_worker.WorkerSettings
+"""
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from app import satellite, worker
+from app.satellite import Point
+
+LATENCY_MS = float(os.getenv("FAKE_EE_LATENCY_MS", "500"))
+ERROR_RATE = float(os.getenv("FAKE_EE_ERROR_RATE", "0"))
+
+
+def _simulate_call():
+    time.sleep(LATENCY_MS / 1000)
+    if random.random() < ERROR_RATE:
+        raise RuntimeError("Earth Engine simulado: erro")
+
+
+def initialize_earth_engine():
+    _simulate_call()
+
+
+def find_best_scenes(points: List[Point], start_date: str, end_date: str) -> List[Optional[Dict[str, Any]]]:
+    _simulate_call()
+    # Uma cena por tile de 1 grau, como os tiles do Sentinel-2
+    return [
+        {"scene_id": f"FAKE_{int(lat)}_{int(lon)}_{start_date}", "cloudy_pixel_percentage": 5.0, "time_start": int(time.time() * 1000)}
+        for lat, lon in points
+    ]
+
+
+def reduce_scene_ndvi(scene_id: str, points: List[Point]) -> List[Optional[float]]:
+    _simulate_call()
+    return [round(random.Random(f"{lat}:{lon}").uniform(0.1, 0.9), 4) for lat, lon in points]
+
+
+def thumbnail_url(scene_id: str, lat: float, lon: float) -> str:
+    _simulate_call()
+    return f"https://example.invalid/thumbnails/{scene_id}.png"
+
+
+satellite.find_best_scenes = find_best_scenes
+satellite.reduce_scene_ndvi = reduce_scene_ndvi
+satellite.thumbnail_url = thumbnail_url
+worker.initialize_earth_engine = initialize_earth_engine
+
+WorkerSettings = worker.WorkerSettings
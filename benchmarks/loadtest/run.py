@@ -0,0 +1,187 @@
+"""
+Teste de carga de ponta a ponta do POST /insights/.
+
+Sobe os stubs dos provedores de clima, o worker com Earth Engine simulado e a API (uvicorn),
+todos apontando para o Redis de REDIS_DSN (que precisa estar em execução), e dispara requisições
+em níveis crescentes de concorrência. Para cada nível reporta vazão, latências p50/p95/p99 e os
+erros por tipo.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.loadtest.run
+    python -m benchmarks.loadtest.run --concurrency 1 8 32 128 --duration 20 --stub-latency-ms 150 --stub-error-rate 0.02
+    python -m benchmarks.loadtest.run --no-spawn --target http://localhost:8000   # API já em execução
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Dict, List
+
+import httpx
+
+STUB_PORT = 9000
+API_PORT = 8800
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Percentil pelo método do posto mais próximo (valores já ordenados)."""
+    if not sorted_values:
+        return float("nan")
+    index = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def make_locations(count: int, seed: int) -> List[Dict[str, float]]:
+    """Gera localizações aleatórias (e reprodutíveis) dentro do Brasil."""
+    rng = random.Random(seed)
+    return [{"lat": round(rng.uniform(-33.0, 4.0), 5), "lon": round(rng.uniform(-73.0, -35.0), 5)} for _ in range(count)]
+
+
+def spawn(args: List[str], env: Dict[str, str], log_path: str) -> subprocess.Popen:
+    log = open(log_path, "w")
+    return subprocess.Popen([sys.executable, "-m", *args], env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def wait_ready(url: str, timeout: float = 30):
+    """Aguarda um serviço responder, para começar a medir só depois de tudo pronto."""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise SystemExit(f"Serviço não respondeu a tempo: {url}")
+
+
+async def run_level(client: httpx.AsyncClient, url: str, locations: List[Dict[str, float]], concurrency: int, duration: float) -> Dict:
+    """Mantém 'concurrency' requisições em andamento por 'duration' segundos."""
+    latencies: List[float] = []
+    errors: Counter = Counter()
+    deadline = time.monotonic() + duration
+
+    async def user(user_index: int):
+        rng = random.Random(user_index)
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                response = await client.post(url, json=rng.choice(locations))
+                error = None if response.status_code == 200 else f"HTTP {response.status_code}"
+            except httpx.HTTPError as e:
+                error = type(e).__name__
+            if error:
+                errors[error] += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    started = time.monotonic()
+    await asyncio.gather(*(user(i) for i in range(concurrency)))
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies) + sum(errors.values()),
+        "ok": len(latencies),
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "errors": dict(errors),
+    }
+
+
+def print_report(results: List[Dict]):
+    print(f"\n{'conc.':>6} {'reqs':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  erros")
+    for r in results:
+        errors = ", ".join(f"{name}: {count}" for name, count in sorted(r["errors"].items())) or "-"
+        print(f"{r['concurrency']:6d} {r['requests']:7d} {r['throughput_rps']:8.1f} {r['p50_ms']:8.1f} {r['p95_ms']:8.1f} {r['p99_ms']:8.1f}  {errors}")
+
+
+async def drive(args, target: str):
+    locations = make_locations(args.locations, args.seed)
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    results = []
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        url = f"{target}/insights/"
+        await run_level(client, url, locations, min(args.concurrency), args.warmup) # Aquecimento (conexões, caches do processo)
+        for concurrency in args.concurrency:
+            result = await run_level(client, url, locations, concurrency, args.duration)
+            print(f"concorrência {concurrency}: {result['throughput_rps']:.1f} req/s, p95 {result['p95_ms']:.1f} ms")
+            results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--duration", type=float, default=10, help="Segundos por nível de concorrência.")
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--locations", type=int, default=1000, help="Localizações distintas sorteadas pelas requisições.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-spawn", action="store_true", help="Não sobe stubs/worker/API; usa a API em --target.")
+    parser.add_argument("--target", default=f"http://127.0.0.1:{API_PORT}")
+    parser.add_argument("--api-workers", type=int, default=1, help="Processos uvicorn da API.")
+    parser.add_argument("--no-forecast-cache", action="store_true", help="Desativa o cache de previsão (toda requisição vai ao stub).")
+    parser.add_argument("--stub-latency-ms", type=float, default=80)
+    parser.add_argument("--stub-jitter-ms", type=float, default=20)
+    parser.add_argument("--stub-error-rate", type=float, default=0)
+    parser.add_argument("--stub-forecast-steps", type=int, default=40)
+    parser.add_argument("--stub-history-days", type=int, default=5)
+    parser.add_argument("--rate-limit", type=float, default=0, help="Chamadas por minuto a cada stub de provedor (0 = sem limite).")
+    parser.add_argument("--ee-latency-ms", type=float, default=500)
+    parser.add_argument("--ee-error-rate", type=float, default=0)
+    parser.add_argument("--output", help="Grava os resultados em JSON.")
+    args = parser.parse_args()
+
+    processes: List[subprocess.Popen] = []
+    try:
+        if not args.no_spawn:
+            stub_env = {
+                "STUB_LATENCY_MS": str(args.stub_latency_ms),
+                "STUB_JITTER_MS": str(args.stub_jitter_ms),
+                "STUB_ERROR_RATE": str(args.stub_error_rate),
+                "STUB_FORECAST_STEPS": str(args.stub_forecast_steps),
+                "STUB_HISTORY_DAYS": str(args.stub_history_days),
+            }
+            app_env = {
+                "OPENWEATHER_API_KEY": os.getenv("OPENWEATHER_API_KEY", "loadtest"),
+                "FORECAST_API_URL": f"http://127.0.0.1:{STUB_PORT}/data/2.5/forecast",
+                "HISTORICAL_API_URL": f"http://127.0.0.1:{STUB_PORT}/v1/forecast",
+                "FORECAST_CACHE_ENABLED": str(not args.no_forecast_cache).lower(),
+                "FAKE_EE_LATENCY_MS": str(args.ee_latency_ms),
+                "FAKE_EE_ERROR_RATE": str(args.ee_error_rate),
+                "WORKER_METRICS_PORT": "0",
+                "UPSTREAM_RATE_LIMITS": json.dumps({"openweather": args.rate_limit, "open_meteo": args.rate_limit}),
+            }
+            processes.append(spawn(["uvicorn", "benchmarks.loadtest.stubs:app", "--port", str(STUB_PORT), "--log-level", "warning"], stub_env, "loadtest-stubs.log"))
+            processes.append(spawn(["arq", "benchmarks.loadtest.fake_worker.WorkerSettings"], app_env, "loadtest-worker.log"))
+            processes.append(spawn(["uvicorn", "app.main:app", "--port", str(API_PORT), "--workers", str(args.api_workers), "--log-level", "warning"], app_env, "loadtest-api.log"))
+            asyncio.run(wait_ready(f"http://127.0.0.1:{STUB_PORT}/docs"))
+            asyncio.run(wait_ready(f"{args.target}/"))
+
+        results = asyncio.run(drive(args, args.target))
+        print_report(results)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump({"config": vars(args), "results": results}, f, indent=2)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Stubs locais das APIs de previsão (OpenWeatherMap) e de histórico (Open-Meteo) para testes de carga.
+
+Configuração por variáveis de ambiente:
+    STUB_LATENCY_MS       latência média de cada resposta (padrão 80)
+    STUB_JITTER_MS        variação uniforme (+/-) da latência (padrão 20)
+    STUB_ERROR_RATE       fração de respostas com erro 503, de 0 a 1 (padrão 0)
+    STUB_FORECAST_STEPS   passos da previsão; 40 = resposta padrão de 5 dias (padrão 40)
+    STUB_HISTORY_DAYS     dias de histórico (padrão 5)
+
+Uso (a partir da raiz do projeto):
+    uvicorn benchmarks.loadtest.stubs:app --port 9000
+Com FORECAST_API_URL=http://localhost:9000/data/2.5/forecast e
+HISTORICAL_API_URL=http://localhost:9000/v1/forecast na API.
+"""
+import asyncio
+import json
+import os
+import random
+
+from fastapi import FastAPI, Response
+
+from benchmarks.synthetic import REGIMES, make_forecast, make_history
+
+LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "80"))
+JITTER_MS = float(os.getenv("STUB_JITTER_MS", "20"))
+ERROR_RATE = float(os.getenv("STUB_ERROR_RATE", "0"))
+FORECAST_STEPS = int(os.getenv("STUB_FORECAST_STEPS", "40"))
+HISTORY_DAYS = int(os.getenv("STUB_HISTORY_DAYS", "5"))
+
+# Respostas geradas uma única vez (por regime), para que o stub não dispute CPU com a API medida
+FORECAST_PAYLOADS = [json.dumps(make_forecast(FORECAST_STEPS, 3, regime)).encode() for regime in REGIMES]
+HISTORY_PAYLOADS = [json.dumps(make_history(HISTORY_DAYS, regime)).encode() for regime in REGIMES]
+
+app = FastAPI(title="Stubs de provedores de clima")
+
+
+async def simulate_upstream(payloads, lat: float, lon: float) -> Response:
+    """Aguarda a latência configurada e devolve um payload (o regime varia com a coordenada) ou um erro."""
+    await asyncio.sleep(max(0.0, LATENCY_MS + random.uniform(-JITTER_MS, JITTER_MS)) / 1000)
+    if random.random() < ERROR_RATE:
+        return Response(content=b'{"cod": 503, "message": "stub: erro simulado"}', status_code=503, media_type="application/json")
+    payload = payloads[hash((round(lat, 2), round(lon, 2))) % len(payloads)]
+    return Response(content=payload, media_type="application/json")
+
+
+@app.get("/data/2.5/forecast")
+async def forecast(lat: float, lon: float):
+    return await simulate_upstream(FORECAST_PAYLOADS, lat, lon)
+
+
+@app.get("/v1/forecast")
+async def historical(latitude: float, longitude: float):
+    return await simulate_upstream(HISTORY_PAYLOADS, latitude, longitude)
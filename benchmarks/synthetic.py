@@ -0,0 +1,143 @@
+"""
+Gerador sintético e determinístico de dados climáticos para benchmarks.
+
+Produz previsões no formato da API OpenWeatherMap (/data/2.5/forecast) e históricos no formato
+da API Open-Meteo (daily temperature_2m_max/min), com regimes de tempo que exercitam caminhos
+diferentes dos detectores:
+
+- "mixed": tempo variado, sem padrão dominante;
+- "dry_spell": estiagem quente e seca (irrigação, estresse térmico, janelas longas de pulverização);
+- "frost_nights": noites frias com geada e dias amenos;
+- "humid_runs": longos períodos úmidos e chuvosos (risco de fungos, sem janelas de colheita).
+
+A mesma semente gera sempre os mesmos dados, inclusive os timestamps.
+"""
+import math
+import random
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+REGIMES = ("mixed", "dry_spell", "frost_nights", "humid_runs")
+
+# Início fixo (alinhado a 3h, UTC) para que os dados não dependam do momento da execução
+START_TIMESTAMP = 1_700_000_000 // 10800 * 10800
+HISTORY_END_DATE = date(2023, 11, 14)
+
+# Tamanhos de referência
+FORECAST_SIZES = {
+    "5d-3h": (40, 3), # Resposta padrão da API (5 dias, de 3 em 3 horas)
+    "16d-1h": (384, 1), # Horizonte horário de 16 dias
+}
+HISTORY_SIZES = {
+    "5d": 5, # Janela usada pelo endpoint de insights
+    "2y": 730, # Várias estações
+}
+
+
+def _step(rng: random.Random, regime: str, hour: int, state: Dict[str, Any]) -> Dict[str, float]:
+    """Sorteia as condições de um passo, com ciclo diário e persistência entre passos."""
+    diurnal = math.sin((hour - 9) / 24 * 2 * math.pi) # Máxima às 15h, mínima às 3h
+
+    if regime == "dry_spell":
+        temp = 33 + 5 * diurnal + rng.gauss(0, 1.5) # Noites quentes: a estiagem não é interrompida à noite
+        humidity = 35 - 12 * diurnal + rng.gauss(0, 5)
+        wind = rng.uniform(0.5, 4.5)
+        pop = rng.choice([0, 0, 0, 0, 0.05])
+        raining = False
+    elif regime == "frost_nights":
+        temp = 8 + 9 * diurnal + rng.gauss(0, 1.5)
+        humidity = 75 - 20 * diurnal + rng.gauss(0, 6)
+        wind = rng.uniform(0, 2.5)
+        pop = rng.choice([0, 0, 0, 0.1])
+        raining = False
+    elif regime == "humid_runs":
+        # Frentes úmidas persistentes: o estado muda raramente, gerando sequências longas
+        if rng.random() < 0.05:
+            state["wet"] = not state.get("wet", True)
+        wet = state.get("wet", True)
+        temp = 21 + 4 * diurnal + rng.gauss(0, 1)
+        humidity = (94 if wet else 78) + rng.gauss(0, 3)
+        wind = rng.uniform(0, 3.5)
+        pop = rng.choice([0.6, 0.8, 0.9, 1.0]) if wet else rng.choice([0.1, 0.2, 0.4])
+        raining = wet and rng.random() < 0.7
+    else:
+        temp = 20 + 8 * diurnal + rng.uniform(-8, 10)
+        humidity = rng.uniform(30, 100)
+        wind = rng.uniform(0, 6)
+        pop = rng.choice([0, 0, 0, 0.05, 0.2, 0.6])
+        raining = pop >= 0.6 and rng.random() < 0.5
+
+    return {
+        "temp": round(temp, 2),
+        "humidity": int(min(100, max(5, round(humidity)))),
+        "wind": round(wind, 2),
+        "pop": pop,
+        "raining": raining,
+    }
+
+
+def make_forecast(steps: int, step_hours: int = 3, regime: str = "mixed", seed: int = 0) -> Dict[str, Any]:
+    """Gera uma previsão no formato da resposta da API OpenWeatherMap."""
+    if regime not in REGIMES:
+        raise ValueError(f"Regime desconhecido: {regime}")
+    rng = random.Random(f"forecast:{regime}:{steps}:{step_hours}:{seed}")
+    state: Dict[str, Any] = {}
+    forecast_list: List[Dict[str, Any]] = []
+    for i in range(steps):
+        dt = START_TIMESTAMP + i * step_hours * 3600
+        conditions = _step(rng, regime, (dt // 3600) % 24, state)
+        temp = conditions["temp"]
+        forecast_list.append({
+            "dt": dt,
+            "main": {
+                "temp": temp,
+                "feels_like": temp,
+                "temp_min": round(temp - rng.uniform(0, 1.5), 2),
+                "temp_max": round(temp + rng.uniform(0, 1.5), 2),
+                "pressure": 1013,
+                "humidity": conditions["humidity"],
+            },
+            "weather": [{"id": 500, "main": "Rain", "description": "chuva leve", "icon": "10d"} if conditions["raining"]
+                        else {"id": 800, "main": "Clear", "description": "céu limpo", "icon": "01d"}],
+            "clouds": {"all": 90 if conditions["raining"] else 10},
+            "wind": {"speed": conditions["wind"], "deg": rng.randint(0, 359)},
+            "visibility": 10000,
+            "pop": conditions["pop"],
+            "dt_txt": "",
+        })
+    return {
+        "cod": "200",
+        "message": 0,
+        "cnt": steps,
+        "list": forecast_list,
+        "city": {"id": 0, "name": "Sintética", "coord": {"lat": -22.9, "lon": -47.06}, "country": "BR", "timezone": -10800},
+    }
+
+
+def make_history(days: int, regime: str = "mixed", seed: int = 0) -> Dict[str, Any]:
+    """Gera um histórico diário no formato da resposta da API Open-Meteo, com sazonalidade anual."""
+    if regime not in REGIMES:
+        raise ValueError(f"Regime desconhecido: {regime}")
+    rng = random.Random(f"history:{regime}:{days}:{seed}")
+    offset = {"mixed": 0, "dry_spell": 6, "frost_nights": -9, "humid_runs": 1}[regime]
+    amplitude = {"mixed": 10, "dry_spell": 6, "frost_nights": 5, "humid_runs": 4}[regime]
+
+    start = HISTORY_END_DATE - timedelta(days=days - 1)
+    times, temp_max, temp_min = [], [], []
+    for i in range(days):
+        day = start + timedelta(days=i)
+        # Hemisfério sul: verão em janeiro
+        season = math.cos((day.timetuple().tm_yday - 15) / 365.25 * 2 * math.pi)
+        mean = 19 + offset + 6 * season + rng.gauss(0, 2)
+        spread = amplitude + rng.uniform(-2, 2)
+        times.append(day.isoformat())
+        temp_max.append(round(mean + spread / 2, 1))
+        temp_min.append(round(mean - spread / 2, 1))
+
+    return {
+        "latitude": -22.9,
+        "longitude": -47.06,
+        "timezone": "America/Sao_Paulo",
+        "daily_units": {"time": "iso8601", "temperature_2m_max": "°C", "temperature_2m_min": "°C"},
+        "daily": {"time": times, "temperature_2m_max": temp_max, "temperature_2m_min": temp_min},
+    }
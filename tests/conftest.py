@@ -0,0 +1,89 @@
+import os
+import time
+from datetime import timedelta
+
+import fakeredis
+import pytest
+import redis.asyncio
+from arq.connections import ArqRedis
+
+from benchmarks.synthetic import make_forecast, make_history
+
+# app.config exige a chave do OpenWeatherMap; nos testes os provedores reais nunca são chamados
+os.environ.setdefault("OPENWEATHER_API_KEY", "test")
+
+
+class Clock:
+    """Relógio controlado pelo teste: retorna 'now', que o teste avança à mão."""
+
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Substitui time.time (relógio de parede usado nos caches e armazenamentos do app)."""
+    clock = Clock()
+    monkeypatch.setattr(time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def monotonic(monkeypatch):
+    """Substitui time.monotonic (relógio dos disjuntores)."""
+    clock = Clock(1000.0)
+    monkeypatch.setattr(time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def weather_calls(monkeypatch):
+    """Substitui os provedores de clima por dados sintéticos e conta as chamadas feitas."""
+    from app import services
+
+    calls = {"forecast": 0, "historical": 0, "daily": 0}
+
+    async def fetch_forecast_data(lat, lon):
+        calls["forecast"] += 1
+        return make_forecast(40, regime="mixed", seed=0)
+
+    async def get_historical_weather_data(lat, lon, days=5):
+        calls["historical"] += 1
+        return make_history(5)
+
+    async def get_daily_temperatures(lat, lon, start_date, end_date):
+        calls["daily"] += 1
+        days = (end_date - start_date).days + 1
+        return {"daily": {
+            "time": [(start_date + timedelta(days=i)).isoformat() for i in range(days)],
+            "temperature_2m_max": [28.0] * days,
+            "temperature_2m_min": [16.0] * days,
+        }}
+
+    monkeypatch.setattr(services, "fetch_forecast_data", fetch_forecast_data)
+    monkeypatch.setattr(services, "get_historical_weather_data", get_historical_weather_data)
+    monkeypatch.setattr(services, "get_daily_temperatures", get_daily_temperatures)
+    services.forecast_cache.clear()
+    return calls
+
+
+@pytest.fixture
+def client(monkeypatch, weather_calls):
+    """Cliente da API com Redis em memória (fakeredis) e provedores de clima sintéticos."""
+    from fastapi.testclient import TestClient
+
+    from app import logic, main
+
+    server = fakeredis.FakeServer()
+
+    async def create_pool(_settings):
+        pool = redis.asyncio.ConnectionPool(connection_class=fakeredis.aioredis.FakeAsyncRedisConnection, server=server)
+        return ArqRedis(connection_pool=pool)
+
+    monkeypatch.setattr(main, "create_pool", create_pool)
+    with TestClient(main.app) as test_client:
+        yield test_client
+    logic.crop_profiles.set_custom({})
@@ -0,0 +1,46 @@
+import json
+
+from app import main
+
+ITEMS = [
+    {"location": {"lat": -22.9, "lon": -47.06}, "farm_id": "a"},
+    {"location": {"lat": -22.91, "lon": -47.07}, "farm_id": "b"},
+    {"location": {"lat": -15.6, "lon": -56.1}, "farm_id": "c"},
+]
+
+
+def stream(client):
+    response = client.post("/insights/batch/stream", json={"items": ITEMS})
+    assert response.status_code == 200
+    return {line["farm_id"]: line for line in map(json.loads, response.text.splitlines())}
+
+
+def test_stream_returns_one_line_per_farm(client):
+    lines = stream(client)
+    assert sorted(lines) == ["a", "b", "c"]
+    assert all(line["insight"] and not line["error"] for line in lines.values())
+
+
+def test_item_failure_becomes_an_error_line(client, monkeypatch):
+    analyze = main.analyze_batch_item
+
+    def failing(index, item, *args, **kwargs):
+        if item.farm_id == "b":
+            raise RuntimeError("falha inesperada")
+        return analyze(index, item, *args, **kwargs)
+
+    monkeypatch.setattr(main, "analyze_batch_item", failing)
+    lines = stream(client)
+    assert sorted(lines) == ["a", "b", "c"]
+    assert lines["b"]["error"] and lines["b"]["insight"] is None
+    assert lines["a"]["insight"] and lines["c"]["insight"]
+
+
+def test_worker_failure_still_answers_every_farm(client, monkeypatch):
+    async def failing(cell):
+        raise RuntimeError("falha na célula")
+
+    monkeypatch.setattr(main, "fetch_cell_weather", failing)
+    lines = stream(client)
+    assert sorted(lines) == ["a", "b", "c"]
+    assert all(line["error"] for line in lines.values())
@@ -0,0 +1,175 @@
+import asyncio
+import json
+
+import fakeredis.aioredis
+
+from app.cache import TwoTierCache, cadence_aligned_ttl, snap_to_grid
+from app.rate_limit import BACKGROUND, INTERACTIVE, current_priority, upstream_priority
+
+
+class Fetcher:
+    """Fonte de dados contável; cada chamada retorna um valor novo."""
+
+    def __init__(self, delay: float = 0, error: bool = False):
+        self.calls = 0
+        self.delay = delay
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.error:
+            return {"error": "falha"}
+        return {"value": self.calls}
+
+
+def test_snap_to_grid_groups_nearby_points():
+    assert snap_to_grid(-22.912, -47.061, 0.1) == snap_to_grid(-22.93, -47.09, 0.1) == (-22.9, -47.1)
+    assert snap_to_grid(-22.912, -47.061, 0) == (-22.912, -47.061)
+
+
+def test_cadence_aligned_ttl():
+    assert cadence_aligned_ttl(3600, now=7200 + 600) == 3000
+    assert cadence_aligned_ttl(3600, now=7200 + 3590) == 60
+
+
+def test_local_hit_skips_fetcher(clock):
+    async def scenario():
+        forecasts = TwoTierCache("test", cadence_seconds=3600, max_entries=10)
+        fetcher = Fetcher()
+        first = await forecasts.get_or_fetch("a", fetcher)
+        second = await forecasts.get_or_fetch("a", fetcher)
+        return first, second, fetcher.calls
+
+    assert asyncio.run(scenario()) == ({"value": 1}, {"value": 1}, 1)
+
+
+def test_expired_entry_is_refetched(clock):
+    async def scenario():
+        forecasts = TwoTierCache("test", cadence_seconds=3600, max_entries=10)
+        fetcher = Fetcher()
+        await forecasts.get_or_fetch("a", fetcher)
+        clock.now += 3600
+        return await forecasts.get_or_fetch("a", fetcher), fetcher.calls
+
+    assert asyncio.run(scenario()) == ({"value": 2}, 2)
+
+
+def test_concurrent_misses_are_coalesced(clock):
+    async def scenario():
+        forecasts = TwoTierCache("test", cadence_seconds=3600, max_entries=10)
+        fetcher = Fetcher(delay=0.01)
+        results = await asyncio.gather(*(forecasts.get_or_fetch("a", fetcher) for _ in range(20)))
+        return results, fetcher.calls
+
+    results, calls = asyncio.run(scenario())
+    assert calls == 1
+    assert results == [{"value": 1}] * 20
+
+
+def test_cancelled_caller_does_not_cancel_shared_fetch(clock):
+    async def scenario():
+        forecasts = TwoTierCache("test", cadence_seconds=3600, max_entries=10)
+        fetcher = Fetcher(delay=0.02)
+        first = asyncio.create_task(forecasts.get_or_fetch("a", fetcher))
+        second = asyncio.create_task(forecasts.get_or_fetch("a", fetcher))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        return await second, fetcher.calls
+
+    assert asyncio.run(scenario()) == ({"value": 1}, 1)
+
+
+def test_shared_fetch_runs_at_highest_waiting_priority(clock):
+    priorities = []
+
+    async def fetcher():
+        await asyncio.sleep(0.01)
+        priorities.append(current_priority())
+        return {"value": 1}
+
+    async def background_caller(forecasts):
+        with upstream_priority(BACKGROUND):
+            return await forecasts.get_or_fetch("a", fetcher)
+
+    async def scenario():
+        forecasts = TwoTierCache("test", cadence_seconds=3600, max_entries=10)
+        background = asyncio.create_task(background_caller(forecasts))
+        await asyncio.sleep(0)
+        with upstream_priority(INTERACTIVE):
+            await forecasts.get_or_fetch("a", fetcher)
+        await background
+
+    asyncio.run(scenario())
+    assert priorities == [INTERACTIVE]
+
+
+def test_background_fetch_keeps_its_priority(clock):
+    priorities = []
+
+    async def fetcher():
+        priorities.append(current_priority())
+        return {"value": 1}
+
+    async def scenario():
+        forecasts = TwoTierCache("test", cadence_seconds=3600, max_entries=10)
+        with upstream_priority(BACKGROUND):
+            await asyncio.gather(*(forecasts.get_or_fetch("a", fetcher) for _ in range(3)))
+
+    asyncio.run(scenario())
+    assert priorities == [BACKGROUND]
+
+
+def test_errors_are_not_cached(clock):
+    async def scenario():
+        forecasts = TwoTierCache("test", cadence_seconds=3600, max_entries=10)
+        failing = Fetcher(error=True)
+        error = await forecasts.get_or_fetch("a", failing)
+        value = await forecasts.get_or_fetch("a", Fetcher())
+        return error, value
+
+    assert asyncio.run(scenario()) == ({"error": "falha"}, {"value": 1})
+
+
+def test_lru_evicts_oldest_entries(clock):
+    async def scenario():
+        forecasts = TwoTierCache("test", cadence_seconds=3600, max_entries=2)
+        fetcher = Fetcher()
+        for key in ("a", "b", "c"):
+            await forecasts.get_or_fetch(key, fetcher)
+        return list(forecasts._local)
+
+    assert asyncio.run(scenario()) == ["b", "c"]
+
+
+def test_redis_tier_is_shared_between_processes(clock):
+    async def scenario():
+        redis = fakeredis.aioredis.FakeRedis()
+        first_process = TwoTierCache("test", cadence_seconds=3600, max_entries=10)
+        second_process = TwoTierCache("test", cadence_seconds=3600, max_entries=10)
+        first_process.bind_redis(redis)
+        second_process.bind_redis(redis)
+        fetcher = Fetcher()
+        await first_process.get_or_fetch("a", fetcher)
+        value = await second_process.get_or_fetch("a", fetcher)
+        stored = json.loads(await redis.get("test:v2:a"))
+        return value, fetcher.calls, stored["value"]
+
+    assert asyncio.run(scenario()) == ({"value": 1}, 1, {"value": 1})
+
+
+def test_redis_failure_falls_back_to_fetcher(clock):
+    class BrokenRedis:
+        async def get(self, key):
+            raise ConnectionError("redis fora do ar")
+
+        async def set(self, *args, **kwargs):
+            raise ConnectionError("redis fora do ar")
+
+    async def scenario():
+        forecasts = TwoTierCache("test", cadence_seconds=3600, max_entries=10)
+        forecasts.bind_redis(BrokenRedis())
+        return await forecasts.get_or_fetch("a", Fetcher())
+
+    assert asyncio.run(scenario()) == {"value": 1}
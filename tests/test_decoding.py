@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from app import decoding, logic
+from app.decoding import InvalidPayloadError, decode_daily, decode_forecast
+
+STEP = {
+    "dt": 1_700_000_000,
+    "main": {"temp": 1, "temp_min": 1, "temp_max": 20.5, "humidity": 80, "pressure": 1012},
+    "wind": {"speed": 3, "deg": 120},
+    "weather": [{"id": 800, "description": "céu limpo"}],
+    "clouds": {"all": 0},
+}
+FORECAST = json.dumps({"cod": "200", "list": [STEP, {**STEP, "pop": 0.2}], "city": {"name": "Campinas"}}).encode()
+DAILY = json.dumps({"latitude": -22.9, "daily": {"time": ["2024-01-01", "2024-01-02"], "temperature_2m_max": [30, 31.5], "temperature_2m_min": [20, None]}}).encode()
+
+
+@pytest.fixture(params=["msgspec", "python"])
+def backend(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(decoding, "msgspec", None)
+    elif decoding.msgspec is None:
+        pytest.skip("msgspec não está instalado.")
+    return request.param
+
+
+def test_forecast_keeps_only_used_fields_and_numeric_types(backend):
+    forecast = decode_forecast(FORECAST)
+    assert forecast == {"list": [
+        {"dt": 1_700_000_000, "main": {"temp": 1, "temp_min": 1, "temp_max": 20.5, "humidity": 80}, "wind": {"speed": 3}, "weather": [{"id": 800}], "pop": 0},
+        {"dt": 1_700_000_000, "main": {"temp": 1, "temp_min": 1, "temp_max": 20.5, "humidity": 80}, "wind": {"speed": 3}, "weather": [{"id": 800}], "pop": 0.2},
+    ]}
+    assert type(forecast["list"][0]["main"]["humidity"]) is int
+
+
+def test_messages_use_provider_numbers(backend):
+    frost = logic.find_frost_risk(decode_forecast(FORECAST)["list"], 2)
+    assert "Temperatura mínima de 1°C" in frost["message"]
+
+
+def test_daily(backend):
+    assert decode_daily(DAILY) == {"daily": {"time": ["2024-01-01", "2024-01-02"], "temperature_2m_max": [30, 31.5], "temperature_2m_min": [20, None]}}
+    assert decode_daily(b'{"latitude": -22.9}') == {}
+
+
+@pytest.mark.parametrize("payload", [
+    b"not json",
+    b'{"list": [{"dt": 1}]}',
+    json.dumps({"list": [{**STEP, "main": {**STEP["main"], "temp": "20"}}]}).encode(),
+    json.dumps({"list": [{**STEP, "main": {**STEP["main"], "humidity": True}}]}).encode(),
+])
+def test_invalid_forecast(backend, payload):
+    with pytest.raises(InvalidPayloadError):
+        decode_forecast(payload)
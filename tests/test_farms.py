@@ -0,0 +1,26 @@
+import pytest
+from pydantic import ValidationError
+
+from app.config import Settings
+from app.farms import refresh_job_id
+
+
+def test_refresh_job_id_is_stable_within_a_cycle():
+    assert refresh_job_id("a", 3600, now=7200) == refresh_job_id("a", 3600, now=7200 + 3599)
+    assert refresh_job_id("a", 3600, now=7200) != refresh_job_id("a", 3600, now=7200 + 3600)
+
+
+def test_refresh_job_id_changes_with_config():
+    first = refresh_job_id("a", 3600, {"crop_profile": "soja"}, now=7200)
+    assert first == refresh_job_id("a", 3600, {"crop_profile": "soja"}, now=7200)
+    assert first != refresh_job_id("a", 3600, {"crop_profile": "milho"}, now=7200)
+
+
+@pytest.mark.parametrize("tick", [0, 7, 25, 90])
+def test_refresh_tick_must_divide_an_hour(tick):
+    with pytest.raises(ValidationError):
+        Settings(FARM_REFRESH_TICK_MINUTES=tick)
+
+
+def test_valid_refresh_tick():
+    assert Settings(FARM_REFRESH_TICK_MINUTES=15).FARM_REFRESH_TICK_MINUTES == 15
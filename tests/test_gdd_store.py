@@ -0,0 +1,167 @@
+import asyncio
+import random
+from datetime import date, timedelta
+
+import fakeredis.aioredis
+import pytest
+
+from app import gdd_store, logic
+from app.gdd_store import DailyTemperatureSeries, GDDStore, complete_days
+
+START = date(2024, 1, 1)
+
+
+def make_series(days: int, seed: int = 0) -> DailyTemperatureSeries:
+    rng = random.Random(seed)
+    temp_max = [round(rng.uniform(15, 35), 1) for _ in range(days)]
+    temp_min = [round(t - rng.uniform(5, 15), 1) for t in temp_max]
+    return DailyTemperatureSeries(START, temp_max, temp_min)
+
+
+def daily_data(series: DailyTemperatureSeries, first: int = 0) -> dict:
+    return {"daily": {
+        "time": [(series.start + timedelta(days=i)).isoformat() for i in range(first, len(series))],
+        "temperature_2m_max": series.temp_max[first:],
+        "temperature_2m_min": series.temp_min[first:],
+    }}
+
+
+@pytest.mark.parametrize("offset", [0, 1, 17, 59])
+def test_gdd_matches_calculate_gdd(offset):
+    series = make_series(60)
+    insight = series.gdd_insight(START + timedelta(days=offset), 10.0)
+    expected = logic.calculate_gdd(daily_data(series, offset), 10.0)
+    assert insight["total_gdd"] == pytest.approx(expected["total_gdd"])
+    assert [d["date"] for d in insight["details"]] == [d["date"] for d in expected["details"]]
+    assert [d["gdd_value"] for d in insight["details"]] == pytest.approx([d["gdd_value"] for d in expected["details"]])
+
+
+def test_append_extends_prefix_sums():
+    full = make_series(40)
+    series = DailyTemperatureSeries(START, full.temp_max[:30], full.temp_min[:30])
+    series.prefix_sums(10.0)
+    for day_max, day_min in zip(full.temp_max[30:], full.temp_min[30:]):
+        series.append(day_max, day_min)
+    assert series.end == full.end
+    assert series.prefix_sums(10.0) == pytest.approx(full.prefix_sums(10.0))
+
+
+def test_prepend_and_trim_reset_prefix_sums():
+    full = make_series(40)
+    series = DailyTemperatureSeries(START + timedelta(days=10), full.temp_max[10:], full.temp_min[10:])
+    series.prefix_sums(10.0)
+    series.prepend(START, full.temp_max[:10], full.temp_min[:10])
+    assert series.start == START
+    assert series.prefix_sums(10.0) == pytest.approx(full.prefix_sums(10.0))
+
+    series.trim(START + timedelta(days=5))
+    assert len(series) == 35
+    assert series.prefix_sums(10.0)[-1] == pytest.approx(full.prefix_sums(10.0)[-1] - full.prefix_sums(10.0)[5])
+
+
+def test_covers():
+    series = make_series(10)
+    assert series.end == START + timedelta(days=9)
+    assert series.covers(START, series.end)
+    assert not series.covers(START - timedelta(days=1), series.end)
+    assert not series.covers(START, series.end + timedelta(days=1))
+    assert DailyTemperatureSeries(START).end == START - timedelta(days=1)
+
+
+def test_no_complete_days_since_planting():
+    insight = make_series(10).gdd_insight(START + timedelta(days=10), 10.0)
+    assert insight["gdd_calculated"] is False
+
+
+def test_json_round_trip():
+    series = make_series(5)
+    restored = DailyTemperatureSeries.from_json(series.to_json())
+    assert restored.start == series.start
+    assert (restored.temp_max, restored.temp_min) == (series.temp_max, series.temp_min)
+
+
+def test_complete_days_stops_at_first_gap():
+    data = {"daily": {
+        "time": ["2024-01-01", "2024-01-02", "2024-01-04"],
+        "temperature_2m_max": [30, 31, 32],
+        "temperature_2m_min": [20, 21, 22],
+    }}
+    assert complete_days(data, START) == ([30, 31], [20, 21])
+    data["daily"]["temperature_2m_max"][1] = None
+    assert complete_days(data, START) == ([30], [20])
+
+
+def test_store_fetches_only_missing_days(monkeypatch):
+    calls = []
+
+    async def get_daily_temperatures(lat, lon, since, until):
+        calls.append((since, until))
+        days = (until - since).days + 1
+        return {"daily": {
+            "time": [(since + timedelta(days=i)).isoformat() for i in range(days)],
+            "temperature_2m_max": [30.0] * days,
+            "temperature_2m_min": [20.0] * days,
+        }}
+
+    monkeypatch.setattr(gdd_store.services, "get_daily_temperatures", get_daily_temperatures)
+    yesterday = date.today() - timedelta(days=1)
+
+    async def scenario():
+        store = GDDStore(fakeredis.aioredis.FakeRedis(), grid_deg=0.1, max_days=400, max_entries=10)
+        first = await store.get_series(-22.9, -47.06, yesterday - timedelta(days=20))
+        again = await store.get_series(-22.91, -47.07, yesterday - timedelta(days=10))
+        earlier = await store.get_series(-22.9, -47.06, yesterday - timedelta(days=30))
+        return first, again, earlier
+
+    first, again, earlier = asyncio.run(scenario())
+    assert again is first
+    assert calls == [
+        (yesterday - timedelta(days=20), yesterday),
+        (yesterday - timedelta(days=30), yesterday - timedelta(days=21)),
+    ]
+    assert earlier.start == yesterday - timedelta(days=30) and earlier.end == yesterday
+    assert earlier.gdd_insight(earlier.start, 10.0)["total_gdd"] == pytest.approx(31 * 15.0)
+
+
+def test_store_skips_provider_for_future_planting_date(monkeypatch):
+    async def get_daily_temperatures(lat, lon, since, until):
+        raise AssertionError("o provedor não deve ser chamado")
+
+    monkeypatch.setattr(gdd_store.services, "get_daily_temperatures", get_daily_temperatures)
+    store = GDDStore(fakeredis.aioredis.FakeRedis(), grid_deg=0.1, max_days=400, max_entries=10)
+    series = asyncio.run(store.get_series(-22.9, -47.06, date.today()))
+    assert len(series) == 0
+    assert series.gdd_insight(date.today(), 10.0)["gdd_calculated"] is False
+
+
+def test_store_backs_off_after_failed_fill(monkeypatch, clock):
+    calls = []
+
+    async def get_daily_temperatures(lat, lon, since, until):
+        calls.append((since, until))
+        return {"error": "Erro ao contatar a API de clima: timeout"}
+
+    monkeypatch.setattr(gdd_store.services, "get_daily_temperatures", get_daily_temperatures)
+    since = date.today() - timedelta(days=20)
+
+    async def scenario():
+        store = GDDStore(fakeredis.aioredis.FakeRedis(), grid_deg=0.1, max_days=400, max_entries=10)
+        results = [await store.get_series(-22.9, -47.06, since)]
+        results.append(await store.get_series(-22.9, -47.06, since))
+        clock.now += gdd_store.FAILED_SYNC_RETRY_SECONDS
+        results.append(await store.get_series(-22.9, -47.06, since))
+        return results
+
+    assert asyncio.run(scenario()) == [None, None, None]
+    # Uma busca por tentativa (sem a busca de extensão) e nenhuma durante o intervalo de espera
+    assert len(calls) == 2
+
+
+def test_insight_labels_series_that_starts_after_planting():
+    series = make_series(10)
+    planting_date = START - timedelta(days=30)
+    insight = series.gdd_insight(planting_date, 10.0)
+    assert insight["total_gdd"] == pytest.approx(series.gdd_insight(START, 10.0)["total_gdd"])
+    assert f"desde {START.strftime('%d/%m/%Y')}" in insight["message"]
+    assert f"o plantio foi em {planting_date.strftime('%d/%m/%Y')}" in insight["message"]
+    assert "apenas a partir de" not in series.gdd_insight(START, 10.0)["message"]
@@ -0,0 +1,111 @@
+import asyncio
+import gzip
+
+import pytest
+
+from app import compression, main
+from app.compression import select_encoding
+from app.http_cache import encoded_etag, etag_matches, make_etag
+
+ETAG = make_etag("snapshot", "config")
+LOCATION = {"lat": -22.9, "lon": -47.06}
+
+
+def test_make_etag_is_stable_and_quoted():
+    assert ETAG == make_etag("snapshot", "config")
+    assert ETAG != make_etag("snapshot", "other")
+    assert ETAG.startswith('"') and ETAG.endswith('"')
+
+
+@pytest.mark.parametrize("if_none_match,expected", [
+    (None, False),
+    ("", False),
+    ("*", True),
+    (ETAG, True),
+    (f"W/{ETAG}", True),
+    (f'"other", {ETAG}', True),
+    (encoded_etag(ETAG, "gzip"), True),
+    (encoded_etag(ETAG, "br"), True),
+    ('"other"', False),
+    (ETAG[:-1] + '-deflate"', False),
+])
+def test_etag_matches(if_none_match, expected):
+    assert etag_matches(if_none_match, ETAG) is expected
+
+
+@pytest.mark.parametrize("accept_encoding,expected", [
+    ("gzip", "gzip"),
+    ("gzip;q=0", None),
+    ("identity", None),
+    ("*", "br" if compression.brotli is not None else "gzip"),
+])
+def test_select_encoding(accept_encoding, expected):
+    assert select_encoding(accept_encoding) == expected
+
+
+def test_compressed_response_and_revalidation(client):
+    response = client.post("/insights/", json=LOCATION, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    etag = response.headers["etag"]
+    assert etag.endswith('-gzip"')
+
+    # O ETag da representação comprimida também revalida a resposta sem compressão
+    revalidated = client.post("/insights/", json=LOCATION, headers={"If-None-Match": etag, "Accept-Encoding": "identity"})
+    assert revalidated.status_code == 304
+
+
+def test_not_modified_skips_enqueue_and_snapshot(client, monkeypatch):
+    etag = client.post("/insights/", json=LOCATION).headers["etag"]
+    side_effects = []
+
+    async def enqueue_satellite_analysis(location):
+        side_effects.append("enqueue")
+
+    async def put(*args, **kwargs):
+        side_effects.append("snapshot")
+
+    monkeypatch.setattr(main, "enqueue_satellite_analysis", enqueue_satellite_analysis)
+    monkeypatch.setattr(main.snapshot_store, "put", put)
+    response = client.post("/insights/", json=LOCATION, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    # O 304 traz o mesmo ETag (com o sufixo da codificação) que a resposta 200
+    assert response.headers["etag"] == etag
+    assert side_effects == []
+
+
+def run_middleware(*messages, accept_encoding=b"gzip"):
+    """Passa as mensagens de resposta de uma aplicação ASGI pelo CompressionMiddleware e retorna as enviadas."""
+    async def app(scope, receive, send):
+        for message in messages:
+            await send(message)
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", accept_encoding)]}
+    asyncio.run(compression.CompressionMiddleware(app, minimum_size=100)(scope, None, send))
+    return sent
+
+
+@pytest.mark.parametrize("start,body", [
+    # 304 sem corpo nem Content-Type
+    ({"type": "http.response.start", "status": 304, "headers": [(b"etag", ETAG.encode())]}, b""),
+    # JSON pequeno demais para comprimir
+    ({"type": "http.response.start", "status": 200, "headers": [(b"etag", ETAG.encode()), (b"content-type", b"application/json")]}, b"{}"),
+])
+def test_etag_is_encoded_whenever_an_encoding_is_negotiated(start, body):
+    sent_start = run_middleware(start, {"type": "http.response.body", "body": body})[0]
+    headers = dict(sent_start["headers"])
+    assert headers[b"etag"] == encoded_etag(ETAG, "gzip").encode()
+    assert headers[b"vary"] == b"Accept-Encoding"
+    assert b"content-encoding" not in headers
+
+
+def test_start_without_headers_passes_through():
+    sent = run_middleware({"type": "http.response.start", "status": 204}, {"type": "http.response.body", "body": b""})
+    assert sent[0] == {"type": "http.response.start", "status": 204}
+    assert run_middleware({"type": "http.response.start", "status": 204}, accept_encoding=b"identity")[0]["status"] == 204
@@ -0,0 +1,42 @@
+from datetime import date, timedelta
+
+LOCATION = {"lat": -22.9, "lon": -47.06}
+
+
+def insights(client, **config):
+    response = client.post("/insights/", json={**LOCATION, **config})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_config_in_body_is_applied(client):
+    default = insights(client)
+    planting_date = date.today() - timedelta(days=30)
+    configured = insights(client, planting_date=planting_date.isoformat(), heat_stress_temp_threshold=-50)
+    assert planting_date.strftime("%d/%m/%Y") in configured["gdd_insight"]["message"]
+    assert configured["heat_stress_alert"]["heat_stress_found"]
+    assert configured["heat_stress_alert"] != default["heat_stress_alert"]
+
+
+def test_crop_profile_thresholds_apply(client):
+    default = insights(client)
+    response = client.put("/crop-profiles/estufa", json={"heat_stress_temp_threshold": -50})
+    assert response.status_code == 200
+    profiled = insights(client, crop_profile="estufa")
+    assert profiled["heat_stress_alert"]["heat_stress_found"]
+    assert profiled["heat_stress_alert"] != default["heat_stress_alert"]
+    # Limites informados explicitamente prevalecem sobre os do perfil
+    assert not insights(client, crop_profile="estufa", heat_stress_temp_threshold=200)["heat_stress_alert"]["heat_stress_found"]
+
+
+def test_gdd_falls_back_to_history_when_series_fails(client, weather_calls, monkeypatch):
+    from app import services
+
+    async def get_daily_temperatures(lat, lon, start_date, end_date):
+        return {"error": "Erro ao contatar a API de clima: timeout"}
+
+    monkeypatch.setattr(services, "get_daily_temperatures", get_daily_temperatures)
+    planting_date = date.today() - timedelta(days=30)
+    configured = insights(client, planting_date=planting_date.isoformat())
+    assert weather_calls["historical"] == 1
+    assert configured["gdd_insight"]["gdd_calculated"]
@@ -0,0 +1,32 @@
+import pytest
+
+from app import logic
+from benchmarks.bench_engine import run_individual
+from benchmarks.synthetic import REGIMES, make_forecast
+
+PROFILES = list(logic.CROP_PROFILES)
+
+
+@pytest.mark.parametrize("profile", PROFILES)
+@pytest.mark.parametrize("regime", REGIMES)
+@pytest.mark.parametrize("steps,step_hours", [(0, 3), (1, 3), (2, 3), (2, 1), (40, 3), (120, 1)])
+def test_evaluate_forecast_matches_find_functions(profile, regime, steps, step_hours):
+    forecast_list = make_forecast(steps, step_hours=step_hours, regime=regime)["list"]
+    thresholds = logic.crop_profiles.compile_config({"crop_profile": profile}).thresholds
+    assert logic.evaluate_forecast(logic.normalize_forecast(forecast_list), thresholds) == run_individual(forecast_list, thresholds)
+
+
+# Durações mínimas de 0 h ficam de fora: as funções find_* não tratam janelas vazias (IndexError)
+@pytest.mark.parametrize("overrides", [
+    {"min_window_hours": 1},
+    {"min_window_hours": 6},
+    {"irrigation_min_hours": 1},
+    {"frost_temp_threshold": 40},
+    {"heat_stress_temp_threshold": -50},
+    {"fungal_risk_humidity": 0, "fungal_risk_temp_min": -50, "fungal_risk_temp_max": 60},
+])
+@pytest.mark.parametrize("steps", [0, 1, 2, 40])
+def test_evaluate_forecast_matches_find_functions_at_extreme_thresholds(overrides, steps):
+    forecast_list = make_forecast(steps, regime="mixed")["list"]
+    thresholds = logic.crop_profiles.compile_config(overrides).thresholds
+    assert logic.evaluate_forecast(logic.normalize_forecast(forecast_list), thresholds) == run_individual(forecast_list, thresholds)
@@ -0,0 +1,83 @@
+import math
+import random
+
+import pytest
+
+from app import logic, logic_numpy
+from benchmarks.bench_engine import make_forecast_list
+from benchmarks.synthetic import REGIMES, make_forecast
+
+pytestmark = pytest.mark.skipif(not logic_numpy.is_available(), reason="NumPy não está instalado.")
+
+DEFAULT_THRESHOLDS = logic.crop_profiles.compile_config({}).thresholds
+
+
+def outcome(evaluate, steps, thresholds):
+    """Resultado da avaliação, ou o tipo da exceção (limites degenerados falham igual nos dois backends)."""
+    try:
+        # repr compara também os tipos numéricos (ex.: 20 vs 20.0) e trata NaN como igual a NaN
+        return repr(evaluate(steps, thresholds))
+    except Exception as e:
+        return type(e)
+
+
+def assert_same_result(steps, thresholds):
+    assert outcome(logic_numpy.evaluate_forecast, steps, thresholds) == outcome(logic.evaluate_forecast, steps, thresholds)
+
+
+@pytest.mark.parametrize("regime", REGIMES)
+@pytest.mark.parametrize("steps,step_hours", [(40, 3), (128, 3), (384, 1)])
+def test_parity_on_synthetic_horizons(regime, steps, step_hours):
+    steps = logic.normalize_forecast(make_forecast(steps, step_hours=step_hours, regime=regime)["list"])
+    for profile in logic.CROP_PROFILES.values():
+        assert_same_result(steps, logic.crop_profiles.compile_config(profile).thresholds)
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_parity_on_mixed_thresholds(seed):
+    rng = random.Random(seed)
+    profiles = list(logic.CROP_PROFILES.values())
+    steps = logic.normalize_forecast(make_forecast_list(rng.choice([1, 2, 5, 40, 128]), seed))
+    thresholds = logic.crop_profiles.compile_config({key: rng.choice(profiles)[key] for key in DEFAULT_THRESHOLDS}).thresholds
+    assert_same_result(steps, thresholds)
+
+
+def test_empty_forecast():
+    assert_same_result([], DEFAULT_THRESHOLDS)
+
+
+def test_missing_pop_and_rain():
+    forecast_list = make_forecast_list(40)
+    for step in forecast_list:
+        del step["pop"]
+        step.pop("rain", None)
+    steps = logic.normalize_forecast(forecast_list)
+    assert all(step.pop == 0 for step in steps)
+    assert_same_result(steps, DEFAULT_THRESHOLDS)
+
+
+@pytest.mark.parametrize("field", ["temp", "temp_min", "temp_max", "humidity"])
+def test_nan_values(field):
+    forecast_list = make_forecast_list(40)
+    for step in forecast_list[5:12]:
+        step["main"][field] = math.nan
+    forecast_list[20]["wind"]["speed"] = math.nan
+    assert_same_result(logic.normalize_forecast(forecast_list), DEFAULT_THRESHOLDS)
+
+
+@pytest.mark.parametrize("overrides", [
+    {"min_window_hours": None},
+    {"min_window_hours": 0},
+    {"min_window_hours": -3},
+    {"irrigation_min_hours": 0},
+    {"fungal_risk_temp_min": 20, "fungal_risk_temp_max": 20},
+    {"fungal_risk_humidity": 100},
+])
+def test_python_fallback_cases(overrides):
+    thresholds = {**DEFAULT_THRESHOLDS, **overrides}
+    assert logic_numpy._needs_python_fallback(thresholds)
+    assert_same_result(logic.normalize_forecast(make_forecast_list(40)), thresholds)
+
+
+def test_default_thresholds_use_vectorized_path():
+    assert not logic_numpy._needs_python_fallback(DEFAULT_THRESHOLDS)
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from app import rate_limit
+from app.config import settings
+from app.rate_limit import BACKGROUND, INTERACTIVE, RateLimitExceeded, UpstreamRateLimiter, shared_priority
+
+
+def saturated_limiter(monkeypatch, on_call=None) -> UpstreamRateLimiter:
+    """Limitador cujo balde nunca libera token e sugere sempre 10 ms de espera."""
+    monkeypatch.setitem(settings.UPSTREAM_RATE_LIMITS, "teste", 60)
+    monkeypatch.setattr(settings, "RATE_LIMIT_INTERACTIVE_MAX_WAIT_SECONDS", 0.05)
+    monkeypatch.setattr(settings, "RATE_LIMIT_BACKGROUND_MAX_WAIT_SECONDS", 30.0)
+    calls = []
+
+    async def script(keys, args):
+        calls.append(args)
+        if on_call:
+            on_call(len(calls))
+        return 0, 10
+
+    limiter = UpstreamRateLimiter()
+    limiter._script = script
+    limiter.calls = calls
+    return limiter
+
+
+def test_joined_interactive_caller_shortens_the_wait(monkeypatch):
+    holder = None
+
+    def join(call):
+        if call == 2:
+            holder.join(INTERACTIVE)
+
+    limiter = saturated_limiter(monkeypatch, join)
+
+    async def scenario():
+        nonlocal holder
+        with rate_limit.upstream_priority(BACKGROUND), shared_priority() as holder:
+            await asyncio.wait_for(limiter.acquire("teste"), 5)
+
+    # Em BACKGROUND a espera iria até 30 s; depois do join vale o limite interativo
+    with pytest.raises(RateLimitExceeded):
+        asyncio.run(scenario())
+    assert limiter.calls[0][2] > 0 and limiter.calls[-1][2] == 0
+
+
+def test_max_wait_caps_the_priority_wait(monkeypatch):
+    limiter = saturated_limiter(monkeypatch)
+
+    async def scenario():
+        with rate_limit.upstream_priority(BACKGROUND):
+            await asyncio.wait_for(limiter.acquire("teste", max_wait=0.05), 5)
+
+    with pytest.raises(RateLimitExceeded):
+        asyncio.run(scenario())
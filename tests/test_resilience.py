@@ -0,0 +1,121 @@
+import asyncio
+
+from app.cache import TwoTierCache
+from app.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def test_breaker_opens_after_consecutive_failures(monotonic):
+    breaker = CircuitBreaker("test", failure_threshold=3, recovery_seconds=30)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_success_resets_failure_count(monotonic):
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_seconds=30)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_allows_a_single_probe(monotonic):
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_seconds=30)
+    breaker.record_failure()
+    monotonic.now += 29
+    assert not breaker.allow()
+    monotonic.now += 1
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+
+def test_probe_result_closes_or_reopens(monotonic):
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_seconds=30)
+    breaker.record_failure()
+    monotonic.now += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    monotonic.now += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_released_probe_can_be_retried(monotonic):
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_seconds=30)
+    breaker.record_failure()
+    monotonic.now += 30
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_stale_value_served_while_refreshing(clock):
+    calls = []
+
+    async def fetcher():
+        calls.append(clock.now)
+        await asyncio.sleep(0.01)
+        return {"value": len(calls)}
+
+    async def scenario():
+        forecasts = TwoTierCache("test", cadence_seconds=3600, max_entries=10, stale_seconds=3600)
+        await forecasts.get_or_fetch("a", fetcher)
+        fetched_at = clock.now
+        clock.now += 3600
+        stale = await forecasts.get_or_fetch("a", fetcher)
+        await asyncio.sleep(0.02)
+        fresh = await forecasts.get_or_fetch("a", fetcher)
+        return stale, fetched_at, fresh
+
+    stale, fetched_at, fresh = asyncio.run(scenario())
+    assert stale == {"value": 1, "stale": True, "fetched_at": int(fetched_at)}
+    assert fresh == {"value": 2}
+    assert len(calls) == 2
+
+
+def test_stale_value_served_when_provider_fails(clock):
+    calls = []
+
+    async def fetcher():
+        calls.append(clock.now)
+        return {"value": 1} if len(calls) == 1 else {"error": "fora do ar"}
+
+    async def scenario():
+        forecasts = TwoTierCache("test", cadence_seconds=3600, max_entries=10, stale_seconds=3600, refresh_attempts=2, retry_backoff_seconds=0)
+        await forecasts.get_or_fetch("a", fetcher)
+        clock.now += 3600
+        first = await forecasts.get_or_fetch("a", fetcher)
+        await asyncio.sleep(0.01)
+        # A atualização em segundo plano tentou 'refresh_attempts' vezes e falhou: o valor antigo continua servido
+        attempts = len(calls) - 1
+        second = await forecasts.get_or_fetch("a", fetcher)
+        return first, attempts, second
+
+    first, attempts, second = asyncio.run(scenario())
+    assert first == {"value": 1, "stale": True, "fetched_at": 1_700_000_000}
+    assert attempts == 2
+    assert second == first
+
+
+def test_entries_past_stale_window_are_dropped(clock):
+    async def fetcher():
+        return {"error": "fora do ar"}
+
+    async def scenario():
+        forecasts = TwoTierCache("test", cadence_seconds=3600, max_entries=10, stale_seconds=600)
+        forecasts._set_local("a", {"value": 1}, clock.now, clock.now + 60)
+        clock.now += 60 + 600
+        return await forecasts.get_or_fetch("a", fetcher)
+
+    assert asyncio.run(scenario()) == {"error": "fora do ar"}
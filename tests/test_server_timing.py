@@ -0,0 +1,23 @@
+def server_timing(response):
+    stages = {}
+    for entry in response.headers["server-timing"].split(", "):
+        name, duration = entry.split(";dur=")
+        stages[name] = float(duration)
+    return stages
+
+
+def test_insights_report_serialization_and_framework_separately(client):
+    response = client.post("/insights/", json={"lat": -22.9, "lon": -47.06})
+    assert response.status_code == 200
+    stages = server_timing(response)
+    assert {"handler", "serialization", "framework", "total"} <= set(stages)
+    # A codificação é medida dentro do handler; o restante da requisição fica em 'framework'
+    assert stages["serialization"] <= stages["handler"]
+    assert abs(stages["handler"] + stages["framework"] - stages["total"]) < 0.05
+
+
+def test_endpoints_without_direct_encoding_have_no_serialization_stage(client):
+    response = client.post("/insights/batch", json={"items": [{"location": {"lat": -22.9, "lon": -47.06}}]})
+    assert response.status_code == 200
+    stages = server_timing(response)
+    assert "framework" in stages and "serialization" not in stages
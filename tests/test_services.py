@@ -0,0 +1,76 @@
+import asyncio
+from datetime import date
+
+import httpx
+import pytest
+
+from app import services
+from app.decoding import InvalidPayloadError
+from app.rate_limit import RateLimitExceeded
+from app.resilience import CircuitBreaker
+
+
+def status_error(code: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", "https://example.test")
+    return httpx.HTTPStatusError("erro", request=request, response=httpx.Response(code, request=request))
+
+
+FAILURES = {
+    "invalid": InvalidPayloadError("campo ausente"),
+    "unavailable": services.ProviderUnavailableError("openweather"),
+    "rate_limited": RateLimitExceeded("openweather"),
+    "timeout": asyncio.TimeoutError(),
+    "status": status_error(503),
+    "unexpected": RuntimeError("falha"),
+}
+
+FETCHES = {
+    "forecast": (lambda: services.fetch_forecast_data(-22.9, -47.06), services.FORECAST_ERRORS),
+    "historical": (lambda: services.get_historical_weather_data(-22.9, -47.06), services.HISTORICAL_ERRORS),
+    "daily": (lambda: services.get_daily_temperatures(-22.9, -47.06, date(2024, 1, 1), date(2024, 1, 10)), services.DAILY_ERRORS),
+}
+
+
+def run_failing(monkeypatch, fetch, error):
+    async def call_provider(*args):
+        raise error
+
+    monkeypatch.setattr(services, "call_provider", call_provider)
+    return asyncio.run(fetch())
+
+
+@pytest.mark.parametrize("name", FETCHES)
+@pytest.mark.parametrize("failure", FAILURES)
+def test_failures_become_provider_messages(monkeypatch, name, failure):
+    fetch, errors = FETCHES[name]
+    expected = getattr(errors, failure)
+    if failure == "status":
+        expected = expected.format(status=503)
+    assert run_failing(monkeypatch, fetch, FAILURES[failure]) == {"error": expected}
+
+
+def test_forecast_unauthorized_message(monkeypatch):
+    fetch, errors = FETCHES["forecast"]
+    assert run_failing(monkeypatch, fetch, status_error(401)) == {"error": errors.unauthorized}
+    fetch, errors = FETCHES["historical"]
+    assert run_failing(monkeypatch, fetch, status_error(401)) == {"error": errors.status.format(status=401)}
+
+
+def test_rate_limit_wait_counts_against_budget(monkeypatch):
+    waits = []
+
+    async def acquire(provider, max_wait=None):
+        waits.append(max_wait)
+        await asyncio.sleep(0.1)
+
+    class SlowClient:
+        async def get(self, url, params):
+            await asyncio.sleep(0.1)
+
+    monkeypatch.setattr(services.upstream_rate_limiter, "acquire", acquire)
+    monkeypatch.setattr(services.upstream_clients, "get", lambda provider: SlowClient())
+    monkeypatch.setitem(services.provider_breakers, "openweather", CircuitBreaker("openweather", 5, 30))
+    # Sozinhas, a espera e a chamada caberiam no orçamento; somadas, não
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(services.call_provider("openweather", "https://example.test", {}, 0.15))
+    assert waits == [0.15]
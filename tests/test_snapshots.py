@@ -0,0 +1,20 @@
+from datetime import date, timedelta
+
+from app import main
+
+
+def test_recompute_is_not_affected_by_later_gdd_updates(client):
+    planting_date = (date.today() - timedelta(days=30)).isoformat()
+    response = client.post("/insights/", json={"lat": -22.9, "lon": -47.06, "planting_date": planting_date})
+    assert response.status_code == 200
+    first = response.json()
+    assert first["gdd_insight"]["gdd_calculated"]
+
+    # O GDDStore estende a série da localização depois que o snapshot foi gravado
+    for series in main.gdd_store._local.values():
+        for _ in range(10):
+            series.append(40.0, 30.0)
+
+    recomputed = client.post("/insights/recompute", json={"snapshot_id": first["snapshot_id"], "config": {"planting_date": planting_date}})
+    assert recomputed.status_code == 200
+    assert recomputed.json()["gdd_insight"] == first["gdd_insight"]
@@ -0,0 +1,43 @@
+import asyncio
+
+import fakeredis.aioredis
+import pytest
+
+from app import satellite, worker
+from app.ndvi_store import NDVIStore, decode_record, encode_record
+
+POINTS = [(-22.9, -47.06), (-23.0, -47.1)]
+SCENE = {"scene_id": "20240101T000000_T23KKP", "cloudy_pixel_percentage": 4.5, "time_start": 1_704_067_200_000}
+
+
+def test_record_round_trip_keeps_thumbnail_url():
+    record = decode_record(encode_record(0.42, 4.5, SCENE["time_start"], "https://earthengine.test/thumb"))
+    assert record["ndvi_value"] == pytest.approx(0.42)
+    assert record["image_url"] == "https://earthengine.test/thumb"
+    # Registros antigos, sem a URL
+    assert decode_record(encode_record(0.42, 4.5, SCENE["time_start"]))["image_url"] is None
+
+
+def test_ndvi_store_hit_skips_earth_engine(monkeypatch):
+    calls = []
+
+    async def run_ee(ctx, fn, *args):
+        calls.append(fn.__name__)
+        if fn is satellite.find_best_scenes:
+            return [SCENE for _ in args[0]]
+        if fn is satellite.reduce_scene_ndvi:
+            return [0.5 for _ in args[1]]
+        return f"https://earthengine.test/thumb/{args[1]}"
+
+    monkeypatch.setattr(worker, "run_ee", run_ee)
+    ctx = {"ndvi_store": NDVIStore(fakeredis.aioredis.FakeRedis(), ttl_seconds=3600)}
+
+    async def scenario():
+        first = await worker.compute_ndvi_batch(ctx, POINTS)
+        calls.clear()
+        return first, await worker.compute_ndvi_batch(ctx, POINTS)
+
+    first, again = asyncio.run(scenario())
+    assert calls == ["find_best_scenes"]
+    assert again == first
+    assert [result["image_url"] for result in again] == [f"https://earthengine.test/thumb/{lat}" for lat, _ in POINTS]